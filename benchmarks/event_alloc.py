@@ -0,0 +1,115 @@
+"""
+Measures memory allocated per processed line when creating the per-hook events in CloudBot.process
+
+Compares the current Event implementation against a copy of the old one, which copied every field from the base event
+into a new instance __dict__ for each hook.
+
+Usage:
+    PYTHONPATH=. python benchmarks/event_alloc.py [hook_count] [line_count]
+"""
+
+import sys
+import tracemalloc
+
+from cloudbot.event import Event, EventType
+
+
+class LegacyEvent:
+    """
+    The old Event field handling, kept here for comparison
+    """
+
+    def __init__(self, *, bot=None, hook=None, conn=None, base_event=None, event_type=EventType.other, content=None,
+                 content_raw=None, target=None, channel=None, nick=None, user=None, host=None, mask=None, irc_raw=None,
+                 irc_prefix=None, irc_command=None, irc_paramlist=None, irc_ctcp_text=None, force=False):
+        self.db = None
+        self.db_executor = None
+        self.bot = bot
+        self.conn = conn
+        self.hook = hook
+        if base_event is not None:
+            if self.bot is None and base_event.bot is not None:
+                self.bot = base_event.bot
+            if self.conn is None and base_event.conn is not None:
+                self.conn = base_event.conn
+            if self.hook is None and base_event.hook is not None:
+                self.hook = base_event.hook
+
+            self.type = base_event.type
+            self.content = base_event.content
+            self.content_raw = base_event.content_raw
+            self.target = base_event.target
+            self.chan = base_event.chan
+            self.nick = base_event.nick
+            self.user = base_event.user
+            self.host = base_event.host
+            self.mask = base_event.mask
+            self.irc_raw = base_event.irc_raw
+            self.irc_prefix = base_event.irc_prefix
+            self.irc_command = base_event.irc_command
+            self.irc_paramlist = base_event.irc_paramlist
+            self.irc_ctcp_text = base_event.irc_ctcp_text
+            self.force = base_event.force
+        else:
+            self.type = event_type
+            self.content = content
+            self.content_raw = content_raw
+            self.target = target
+            self.chan = channel
+            self.nick = nick
+            self.user = user
+            self.host = host
+            self.mask = mask
+            self.irc_raw = irc_raw
+            self.irc_prefix = irc_prefix
+            self.irc_command = irc_command
+            self.irc_paramlist = irc_paramlist
+            self.irc_ctcp_text = irc_ctcp_text
+            self.force = force
+
+
+def process_lines(event_cls, hook_count, line_count):
+    """
+    Creates a base event for each line, then a derived event for each hook, keeping them alive like a running
+    dispatch would
+    """
+    hooks = [object() for _ in range(hook_count)]
+    lines = []
+    for i in range(line_count):
+        base = event_cls(
+            bot=None, conn=None, event_type=EventType.message, content="line {}".format(i), content_raw="line",
+            channel="#channel", nick="nick", user="user", host="host", mask="nick!user@host",
+            irc_raw="PRIVMSG #channel :line", irc_prefix="nick!user@host", irc_command="PRIVMSG",
+            irc_paramlist=["#channel", "line"]
+        )
+        lines.append([event_cls(hook=hook, base_event=base) for hook in hooks])
+
+    return lines
+
+
+def measure(event_cls, hook_count, line_count):
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    lines = process_lines(event_cls, hook_count, line_count)
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = snapshot_after.compare_to(snapshot_before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    count = sum(stat.count_diff for stat in stats)
+    del lines
+    return size / line_count, count / line_count
+
+
+def main():
+    hook_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    print("Events for {} lines with {} hooks each".format(line_count, hook_count))
+    for name, event_cls in (("before (dict copy)", LegacyEvent), ("after (shared slots)", Event)):
+        size, count = measure(event_cls, hook_count, line_count)
+        print("{:>22}: {:8.1f} bytes/line, {:6.1f} allocations/line".format(name, size, count))
+
+
+if __name__ == "__main__":
+    main()
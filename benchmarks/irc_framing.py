@@ -0,0 +1,100 @@
+"""
+Measures how long _IrcProtocol takes to split a large burst of server data into lines
+
+A burst like a large NAMES/WHO reply, a netsplit or ZNC playback often arrives in a handful of very large chunks.
+This feeds a generated burst of increasing size through the protocol's line framer, and through a copy of the old
+framer which re-split the remaining buffer for every line, so the timings show linear vs quadratic growth.
+
+Usage:
+    PYTHONPATH=. python benchmarks/irc_framing.py [max_megabytes] [chunk_kilobytes]
+"""
+
+import sys
+import time
+
+from cloudbot.clients.irc import _IrcProtocol
+
+BURST_LINES = (
+    b":irc.example.net 353 CloudBot = #channel :@op +voice user1 user2 user3 user4 user5 user6 user7 user8\r\n",
+    b":nick!user@host.example.com QUIT :irc.example.net irc.other.example.net\r\n",
+    b":nick!user@host.example.com PRIVMSG #channel :[12:34:56] some playback from the bouncer\r\n",
+    b":irc.example.net 352 CloudBot #channel user host.example.com irc.example.net nick H :0 Real Name\r\n",
+)
+
+
+class _FramingProtocol(_IrcProtocol):
+    """
+    _IrcProtocol with line handling replaced by a counter, so only the framing is measured
+    """
+
+    def __init__(self):
+        # Skip _IrcProtocol.__init__, the framer only needs the input buffer
+        self._input_buffer = bytearray()
+        self.lines = 0
+
+    def _handle_line(self, line_data):
+        self.lines += 1
+
+
+class _LegacyFramingProtocol(_FramingProtocol):
+    """
+    The old framing from _IrcProtocol.data_received, kept here for comparison
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._input_buffer = b""
+
+    def data_received(self, data):
+        self._input_buffer += data
+
+        while b"\r\n" in self._input_buffer:
+            line_data, self._input_buffer = self._input_buffer.split(b"\r\n", 1)
+            self._handle_line(line_data)
+
+
+def make_burst(size):
+    """
+    :type size: int
+    :rtype: bytes
+    """
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = BURST_LINES[i % len(BURST_LINES)]
+        lines.append(line)
+        total += len(line)
+        i += 1
+
+    return b"".join(lines)
+
+
+def feed(protocol, burst, chunk_size):
+    start = time.perf_counter()
+    for i in range(0, len(burst), chunk_size):
+        protocol.data_received(burst[i:i + chunk_size])
+
+    return time.perf_counter() - start
+
+
+def main():
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    chunk_size = (int(sys.argv[2]) if len(sys.argv) > 2 else 1024) * 1024
+
+    print("Chunk size: {} KiB".format(chunk_size // 1024))
+    print("{:>8} {:>10} {:>12} {:>12}".format("MiB", "lines", "legacy (s)", "current (s)"))
+    size_mb = 1
+    while size_mb <= max_mb:
+        burst = make_burst(size_mb * 1024 * 1024)
+        legacy = _LegacyFramingProtocol()
+        current = _FramingProtocol()
+        legacy_time = feed(legacy, burst, chunk_size)
+        current_time = feed(current, burst, chunk_size)
+        assert legacy.lines == current.lines
+        print("{:>8} {:>10} {:>12.3f} {:>12.3f}".format(size_mb, current.lines, legacy_time, current_time))
+        size_mb *= 2
+
+
+if __name__ == "__main__":
+    main()
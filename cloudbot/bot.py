@@ -9,7 +9,9 @@ import time
 from functools import partial
 from pathlib import Path
 
+import sqlalchemy.event
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.schema import MetaData
@@ -22,6 +24,9 @@ from cloudbot.hook import Action
 from cloudbot.plugin import PluginManager
 from cloudbot.reloader import PluginReloader, ConfigReloader
 from cloudbot.util import database, async_util
+from cloudbot.util.async_db import AsyncDatabase
+from cloudbot.util.db_pool import DatabaseWorkerPool
+from cloudbot.util.executors import ExecutorRegistry
 
 try:
     from cloudbot.web.main import WebInterface
@@ -42,41 +47,153 @@ def clean_name(n):
     return re.sub('[^A-Za-z0-9_]+', '', n.replace(" ", "_"))
 
 
-def get_cmd_regex_match(event):
-    conn = event.conn
-    is_pm = event.chan.lower() == event.nick.lower()
-    command_prefix = re.escape(conn.config.get('command_prefix', '.'))
-    conn_nick = re.escape(event.conn.nick)
-    match = re.search(
-        r"""
-        ^
-        # Prefix or nick
-        (?:
-            (?P<prefix>[""" + command_prefix + r"""])""" + ('?' if is_pm else '') + r"""
-            |
-            """ + conn_nick + r"""[,;:]+\s+
-        )
-        (?P<command>\w+)  # Command
-        (?:$|\s+)
-        (?P<text>.*)     # Text
-        """,
-        event.content,
-        re.IGNORECASE | re.VERBOSE
-    )
-    if not match:
+# PRAGMAs set on each new SQLite connection for each database_profile
+SQLITE_PROFILES = {
+    "default": {},
+    # Write-ahead logging with fewer fsyncs, at the cost of possibly losing the last commits on power loss
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+    },
+}
+
+
+def set_sqlite_profile(engine, profile):
+    """
+    Sets up an SQLite engine to apply the PRAGMAs for a database profile to each new connection
+    :param engine: The SQLite engine
+    :param profile: The name of a profile in SQLITE_PROFILES, or a dict of PRAGMA names and values
+    :type engine: sqlalchemy.engine.Engine
+    :type profile: str | dict
+    """
+    if isinstance(profile, dict):
+        pragmas = profile
+    else:
+        try:
+            pragmas = SQLITE_PROFILES[profile]
+        except LookupError:
+            logger.warning("Unknown database profile '%s', using the default", profile)
+            return
+
+    if not pragmas:
+        return
+
+    statements = ["PRAGMA {}={}".format(name, value) for name, value in pragmas.items()]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+
+        cursor.close()
+
+    sqlalchemy.event.listen(engine, "connect", on_connect)
+
+
+class CommandMatcher:
+    """
+    Compiled command matching for a single connection, built from its command prefix and nick
+
+    The matcher is only valid for the prefix and nick it was built with, use `is_current()` to see if it needs to be
+    rebuilt (eg. after a NICK change or a config reload).
+
+    :type prefix: str
+    :type nick: str
+    """
+
+    __slots__ = ('prefix', 'nick', '_prefix_chars', '_nick_lower', '_cmd_re', '_pm_cmd_re', '_inline_re')
+
+    def __init__(self, prefix, nick):
+        """
+        :type prefix: str
+        :type nick: str
+        """
+        self.prefix = prefix
+        self.nick = nick
+        # the patterns ignore case, so the pre-checks compare lower-cased characters
+        self._prefix_chars = frozenset(prefix.lower())
+        self._nick_lower = nick.lower()
+
+        command_prefix = re.escape(prefix)
+        conn_nick = re.escape(nick)
+        self._cmd_re = self._compile_cmd_re(command_prefix, conn_nick, prefix_optional=False)
+        # The prefix is optional in PMs
+        self._pm_cmd_re = self._compile_cmd_re(command_prefix, conn_nick, prefix_optional=True)
+
         # Inline command, with double prefix character (can still be at start of line)
-        match = re.search(
+        self._inline_re = re.compile(
             r"""
             (?:^|\s+)
-            (?P<prefix>[""" + command_prefix  + r"""]){2}
+            (?P<prefix>[""" + command_prefix + r"""]){2}
             (?P<command>\w+)
             (?:$|\s+)
             (?P<text>.*)
             """,
-            event.content,
             re.IGNORECASE | re.VERBOSE
         )
-    return match
+
+    @staticmethod
+    def _compile_cmd_re(command_prefix, conn_nick, prefix_optional):
+        return re.compile(
+            r"""
+            ^
+            # Prefix or nick
+            (?:
+                (?P<prefix>[""" + command_prefix + r"""])""" + ('?' if prefix_optional else '') + r"""
+                |
+                """ + conn_nick + r"""[,;:]+\s+
+            )
+            (?P<command>\w+)  # Command
+            (?:$|\s+)
+            (?P<text>.*)     # Text
+            """,
+            re.IGNORECASE | re.VERBOSE
+        )
+
+    def is_current(self, prefix, nick):
+        """
+        Returns whether this matcher was built for the given prefix and nick
+        :type prefix: str
+        :type nick: str
+        :rtype: bool
+        """
+        return self.prefix == prefix and self.nick == nick
+
+    def match(self, content, is_pm=False):
+        """
+        Matches a line of text against the command patterns, returning the match object or None
+
+        Lines which can't possibly contain a command are rejected before any regex is run.
+        :type content: str
+        :type is_pm: bool
+        :rtype: re.__Match
+        """
+        if not content:
+            return None
+
+        content_lower = content.lower()
+        if is_pm:
+            match = self._pm_cmd_re.search(content)
+        elif content_lower[0] in self._prefix_chars or content_lower.startswith(self._nick_lower):
+            match = self._cmd_re.search(content)
+        else:
+            match = None
+
+        if match:
+            return match
+
+        if any(char in content_lower for char in self._prefix_chars):
+            return self._inline_re.search(content)
+
+        return None
+
+
+def get_cmd_regex_match(event):
+    conn = event.conn
+    is_pm = event.chan.lower() == event.nick.lower()
+    matcher = event.bot.get_command_matcher(conn)
+    return matcher.match(event.content, is_pm)
 
 
 class CloudBot:
@@ -91,6 +208,9 @@ class CloudBot:
     :type db_engine: sqlalchemy.engine.Engine
     :type db_factory: sqlalchemy.orm.session.sessionmaker
     :type db_session: sqlalchemy.orm.scoping.scoped_session
+    :type db_pool: DatabaseWorkerPool
+    :type executors: ExecutorRegistry
+    :type async_db: AsyncDatabase
     :type db_metadata: sqlalchemy.sql.schema.MetaData
     :type loop: asyncio.events.AbstractEventLoop
     :type stopped_future: asyncio.Future
@@ -109,6 +229,9 @@ class CloudBot:
         # stores each bot server connection
         self.connections = {}
 
+        # compiled command matchers for each connection, see get_command_matcher()
+        self._command_matchers = {}
+
         # for plugins
         self.logger = logger
 
@@ -134,11 +257,27 @@ class CloudBot:
         self.user_agent = self.config.get('user_agent', 'CloudBot/3.0 - CloudBot Refresh '
                                                         '<https://github.com/CloudBotIRC/CloudBot/>')
 
+        # thread pools for threaded hooks, sized by the "executors" config
+        self.executors = ExecutorRegistry(self.config.get("executors"))
+
         # setup db
         db_path = self.config.get('database', 'sqlite:///cloudbot.db')
-        self.db_engine = create_engine(db_path)
+        is_sqlite = make_url(db_path).drivername.split('+')[0] == 'sqlite'
+        engine_args = {}
+        db_pool_size = self.config.get('database_pool_size')
+        if db_pool_size is not None and not is_sqlite:
+            # SQLite uses its own connection pools, which don't take a size
+            engine_args['pool_size'] = db_pool_size
+
+        self.db_engine = create_engine(db_path, **engine_args)
+        if is_sqlite:
+            set_sqlite_profile(self.db_engine, self.config.get('database_profile', 'default'))
         self.db_factory = sessionmaker(bind=self.db_engine)
         self.db_session = scoped_session(self.db_factory)
+        # worker threads for coroutine hooks which use the database
+        self.db_pool = DatabaseWorkerPool(self.loop, self.db_session, self.config.get('database_workers', 8))
+        # for coroutine hooks which only need to run a few statements
+        self.async_db = AsyncDatabase(self.db_engine, self.db_pool)
         self.db_metadata = MetaData()
         self.db_base = declarative_base(metadata=self.db_metadata, bind=self.db_engine)
 
@@ -182,6 +321,8 @@ class CloudBot:
         # Wait till the bot stops. The stopped_future will be set to True to restart, False otherwise
         restart = self.loop.run_until_complete(self.stopped_future)
         self.loop.run_until_complete(self.plugin_manager.unload_all())
+        self.db_pool.shutdown()
+        self.executors.shutdown()
         self.loop.close()
         return restart
 
@@ -262,6 +403,21 @@ class CloudBot:
         # Run a manual garbage collection cycle, to clean up any unused objects created during initialization
         gc.collect()
 
+    def get_command_matcher(self, conn):
+        """
+        Returns the compiled command matcher for a connection, rebuilding it if the prefix or nick has changed
+        :type conn: cloudbot.client.Client
+        :rtype: CommandMatcher
+        """
+        prefix = conn.config.get('command_prefix', '.')
+        nick = conn.nick
+        matcher = self._command_matchers.get(conn.name)
+        if matcher is None or not matcher.is_current(prefix, nick):
+            matcher = CommandMatcher(prefix, nick)
+            self._command_matchers[conn.name] = matcher
+
+        return matcher
+
     def load_clients(self):
         """
         Load all clients from the "clients" directory
@@ -344,18 +500,26 @@ class CloudBot:
                     matched_command = True
                 else:
                     potential_matches = {}
-                    for alias, hook in self.plugin_manager.commands.items():
-                        if alias.startswith(command):
-                            # only list commands the user has permissions for
-                            if not event.check_permissions(hook.permissions, notice=False):
-                                continue
-                            # plugin + function name groups aliases
-                            key = hook.plugin.title + hook.function_name
-                            if key not in potential_matches:
-                                # First item is always the hook
-                                potential_matches[key] = [hook]
-                            potential_matches[key].append(alias)
-##
+                    for alias, hook in self.plugin_manager.find_commands(command):
+                        # plugin + function name groups aliases
+                        key = hook.plugin.title + hook.function_name
+                        if key not in potential_matches:
+                            # First item is always the hook
+                            potential_matches[key] = [hook]
+                        potential_matches[key].append(alias)
+
+                    # only list commands the user has permissions for
+                    for key, aliases in list(potential_matches.items()):
+                        hook = aliases[0]
+                        if not hook.permissions:
+                            continue
+
+                        # permission hooks are launched with the event, so it needs the hook being checked
+                        perm_event = Event(hook=hook, base_event=event)
+                        allowed = yield from perm_event.check_permissions(*hook.permissions, notice=False)
+                        if not allowed:
+                            del potential_matches[key]
+
                     if potential_matches:
                         matched_command = True
                         if len(potential_matches) == 1:
@@ -369,7 +533,8 @@ class CloudBot:
         if event.type in (EventType.message, EventType.action):
             # Regex hooks
             regex_matched = False
-            for regex, regex_hook in self.plugin_manager.regex_hooks:
+            # Only run the regexes which could possibly match this line
+            for regex, regex_hook in self.plugin_manager.regex_hooks.candidates(event.content):
                 if not regex_hook.run_on_cmd and matched_command:
                     continue
 
@@ -4,6 +4,7 @@ import logging
 import random
 
 from cloudbot.permissions import PermissionManager
+from cloudbot.policy import SievePolicy
 
 logger = logging.getLogger("cloudbot")
 
@@ -31,6 +32,7 @@ class Client:
     :type vars: dict
     :type history: dict[str, list[tuple]]
     :type permissions: PermissionManager
+    :type sieve_policy: SievePolicy
     """
 
     _type = None
@@ -63,6 +65,9 @@ class Client:
         # create permissions manager
         self.permissions = PermissionManager(self)
 
+        # compile the acls, disabled commands and rate limits used by sieves
+        self.sieve_policy = SievePolicy(self)
+
         # for plugins to abuse
         self.memory = collections.defaultdict()
 
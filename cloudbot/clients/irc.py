@@ -3,14 +3,18 @@ import logging
 import random
 import re
 import ssl
+import time
 from _ssl import PROTOCOL_SSLv23
+from collections import deque
 from functools import partial
 from ssl import SSLContext
 
 from cloudbot.client import Client, client
 from cloudbot.event import Event, EventType, IrcOutEvent
 from cloudbot.util import async_util, colors
+from cloudbot.util.line_decoder import LineDecoder
 from cloudbot.util.parsers.irc import Message
+from cloudbot.util.tokenbucket import TokenBucket
 
 logger = logging.getLogger("cloudbot")
 
@@ -32,17 +36,136 @@ irc_command_to_event_type = {
     "NOTICE": EventType.notice
 }
 
+# Commands that are sent straight away, without waiting for the flood control
+IMMEDIATE_COMMANDS = {"PING", "PONG", "CAP", "AUTHENTICATE", "PASS", "NICK", "USER", "QUIT"}
 
-def decode(bytestring):
+# Commands which are sent after all other queued commands
+LOW_PRIORITY_COMMANDS = {"PRIVMSG", "NOTICE"}
+
+# Queries which give the same answer however many times they're sent, so a copy of one already waiting in the queue
+# can be dropped. Commands which change state aren't included, as dropping one could skip a change made in between,
+# eg. JOIN, PART, JOIN.
+COALESCED_COMMANDS = {"WHO", "WHOIS", "WHOWAS", "NAMES", "LIST", "ISON", "USERHOST"}
+
+
+class SendQueue:
     """
-    Tries to decode a bytestring using multiple encoding formats
+    Queues outgoing lines for a connection, pacing them with a token bucket to avoid being disconnected for flooding
+
+    Lines are split in to lanes by their command, registration and PING/PONG lines are sent immediately, and other
+    commands (JOIN, MODE, etc.) are sent before any queued PRIVMSG or NOTICE lines. A query (see COALESCED_COMMANDS)
+    that is identical to one already waiting in the queue is dropped.
+
+    :type conn: IrcClient
+    :type enabled: bool
     """
-    for codec in ('utf-8', 'iso-8859-1', 'shift_jis', 'cp1252'):
-        try:
-            return bytestring.decode(codec)
-        except UnicodeDecodeError:
-            continue
-    return bytestring.decode('utf-8', errors='ignore')
+
+    def __init__(self, conn, config):
+        """
+        :type conn: IrcClient
+        :type config: dict
+        """
+        self.conn = conn
+        self.enabled = config.get("enabled", True)
+        self._bucket = TokenBucket(config.get("burst", 5), config.get("rate", 1.0))
+        # normal and low priority lanes, each containing (line, log, queued time)
+        self._lanes = (deque(), deque())
+        # queued lines which can be coalesced
+        self._pending = set()
+        self._task = None
+
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self):
+        """
+        The number of lines waiting to be sent
+        :rtype: int
+        """
+        return sum(map(len, self._lanes))
+
+    def stats(self):
+        """
+        :rtype: dict[str, int | float]
+        """
+        return {
+            "depth": self.depth,
+            "sent": self.sent_count,
+            "coalesced": self.coalesced_count,
+            "average_wait": self.total_wait / self.sent_count if self.sent_count else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    def clear(self):
+        """
+        Drops all queued lines, eg. when reconnecting
+        """
+        for lane in self._lanes:
+            lane.clear()
+
+        self._pending.clear()
+
+    def put(self, line, log=True):
+        """
+        Queues a line to be sent. This is *not* threadsafe
+        :type line: str
+        :type log: bool
+        """
+        command = line.split(None, 1)[0].upper() if line else ""
+        if not self.enabled or command in IMMEDIATE_COMMANDS:
+            self._write(line, log)
+            return
+
+        coalesce = command in COALESCED_COMMANDS
+        if coalesce and line in self._pending:
+            self.coalesced_count += 1
+            return
+
+        if not self.depth and self._bucket.consume(1):
+            # nothing is waiting and we're within the limit, no need to queue this line
+            self.sent_count += 1
+            self._write(line, log)
+            return
+
+        lane = self._lanes[1] if command in LOW_PRIORITY_COMMANDS else self._lanes[0]
+        lane.append((line, log, time.time()))
+        if coalesce:
+            self._pending.add(line)
+
+        if self._task is None or self._task.done():
+            self._task = async_util.wrap_future(self._run(), loop=self.conn.loop)
+
+    def _write(self, line, log):
+        async_util.wrap_future(self.conn._protocol.send(line, log=log), loop=self.conn.loop)
+
+    @asyncio.coroutine
+    def _run(self):
+        bucket = self._bucket
+        while True:
+            lane = next((lane for lane in self._lanes if lane), None)
+            if lane is None:
+                return
+
+            if not bucket.consume(1):
+                yield from asyncio.sleep((1 - bucket.tokens) / bucket.fill_rate)
+                # check the lanes again, a higher priority line may have been queued while we waited
+                continue
+
+            line, log, queued_time = lane.popleft()
+            self._pending.discard(line)
+
+            wait = time.time() - queued_time
+            self.sent_count += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+            try:
+                yield from self.conn._protocol.send(line, log=log)
+            except Exception:
+                logger.exception("[%s] Error occurred while sending queued line %r", self.conn.name, line)
 
 
 @client("irc")
@@ -76,6 +199,16 @@ class IrcClient(Client):
             local_bind = False
 
         self.local_bind = local_bind
+
+        # paces outgoing lines to avoid flooding off the server
+        self.send_queue = SendQueue(self, config.get('flood_control', {}))
+
+        # remembers which users send lines that aren't UTF-8
+        self.decoder = LineDecoder(
+            fallback=config.get('fallback_encoding', 'iso-8859-1'),
+            per_sender=config.get('per_sender_encoding', True)
+        )
+
         # create SSL context
         if self.use_ssl:
             self.ssl_context = SSLContext(PROTOCOL_SSLv23)
@@ -149,6 +282,9 @@ class IrcClient(Client):
 
         self._active = True
 
+        # don't send lines left over from the previous connection
+        self.send_queue.clear()
+
         optional_params = {}
         if self.local_bind:
             optional_params["local_addr"] = self.local_bind
@@ -263,7 +399,7 @@ class IrcClient(Client):
         :type line: str
         :type log: bool
         """
-        async_util.wrap_future(self._protocol.send(line, log=log), loop=self.loop)
+        self.send_queue.put(line, log=log)
 
     @property
     def connected(self):
@@ -278,7 +414,7 @@ class _IrcProtocol(asyncio.Protocol):
     :type loop: asyncio.events.AbstractEventLoop
     :type conn: IrcClient
     :type bot: cloudbot.bot.CloudBot
-    :type _input_buffer: bytes
+    :type _input_buffer: bytearray
     :type _connected: bool
     :type _transport: asyncio.transports.Transport
     :type _connected_future: asyncio.Future
@@ -293,7 +429,7 @@ class _IrcProtocol(asyncio.Protocol):
         self.conn = conn
 
         # input buffer
-        self._input_buffer = b""
+        self._input_buffer = bytearray()
 
         # connected
         self._connected = False
@@ -344,14 +480,20 @@ class _IrcProtocol(asyncio.Protocol):
                 raise ValueError("Attempted to send data to a closed connection")
 
         old_line = line
-        filtered = bool(self.bot.plugin_manager.out_sieves)
+        plugin_manager = self.bot.plugin_manager
+        filtered = bool(plugin_manager.out_sieve_chain)
 
-        for out_sieve in self.bot.plugin_manager.out_sieves:
-            event = IrcOutEvent(
-                bot=self.bot, hook=out_sieve, conn=self.conn, irc_raw=line
-            )
+        for out_sieve in plugin_manager.out_sieve_chain:
+            if isinstance(out_sieve, tuple):
+                # a group of inline sieves, run directly
+                ok, new_line = plugin_manager.run_inline_out_sieves(out_sieve, self.conn, line)
+            else:
+                event = IrcOutEvent(
+                    bot=self.bot, hook=out_sieve, conn=self.conn, irc_raw=line
+                )
+
+                ok, new_line = yield from plugin_manager.internal_launch(out_sieve, event)
 
-            ok, new_line = yield from self.bot.plugin_manager.internal_launch(out_sieve, event)
             if not ok:
                 logger.warning("Error occurred in outgoing sieve, falling back to old behavior")
                 logger.debug("Line was: %s", line)
@@ -380,105 +522,128 @@ class _IrcProtocol(asyncio.Protocol):
         self._transport.write(line)
 
     def data_received(self, data):
-        self._input_buffer += data
+        buffer = self._input_buffer
+        buffer += data
+
+        # Scan forward through the buffer for line endings, and only remove the processed lines once we're done.
+        # Lines are normally terminated by \r\n, but accept a bare \n as well.
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
 
-        while b"\r\n" in self._input_buffer:
-            line_data, self._input_buffer = self._input_buffer.split(b"\r\n", 1)
-            line = decode(line_data)
+            line_end = end
+            if line_end > start and buffer[line_end - 1] == 0x0D:
+                line_end -= 1
 
-            try:
-                message = Message.parse(line)
-            except Exception:
-                logger.exception(
-                    "[%s] Error occurred while parsing IRC line '%s' from %s",
-                    self.conn.name, line, self.conn.describe_server()
-                )
-                continue
+            line_data = buffer[start:line_end]
+            start = end + 1
+            self._handle_line(line_data)
 
-            command = message.command
-            command_params = message.parameters
+        if start:
+            del buffer[:start]
 
-            # Reply to pings immediately
+    def _handle_line(self, line_data):
+        """
+        Parses and dispatches a single line received from the server
+        :type line_data: bytes | bytearray
+        """
+        line = self.conn.decoder.decode(line_data)
 
-            if command == "PING":
-                self.conn.send("PONG " + command_params[-1], log=False)
+        try:
+            message = Message.parse(line)
+        except Exception:
+            logger.exception(
+                "[%s] Error occurred while parsing IRC line '%s' from %s",
+                self.conn.name, line, self.conn.describe_server()
+            )
+            return
 
-            # Parse the command and params
+        command = message.command
+        command_params = message.parameters
 
-            # Content
-            if command_params.has_trail:
-                content_raw = command_params[-1]
-                content = irc_clean(content_raw)
-            else:
-                content_raw = None
-                content = None
+        # Reply to pings immediately
+
+        if command == "PING":
+            self.conn.send("PONG " + command_params[-1], log=False)
+
+        # Parse the command and params
+
+        # Content
+        if command_params.has_trail:
+            content_raw = command_params[-1]
+            content = irc_clean(content_raw)
+        else:
+            content_raw = None
+            content = None
+
+        # Event type
+        if command in irc_command_to_event_type:
+            event_type = irc_command_to_event_type[command]
+        else:
+            event_type = EventType.other
 
-            # Event type
-            if command in irc_command_to_event_type:
-                event_type = irc_command_to_event_type[command]
+        # Target (for KICK, INVITE)
+        if event_type is EventType.kick:
+            target = command_params[1]
+        elif command == "INVITE":
+            target = command_params[0]
+        else:
+            # TODO: Find more commands which give a target
+            target = None
+
+        # Parse for CTCP
+        if event_type is EventType.message and content_raw.count("\x01") >= 2 and content_raw.startswith("\x01"):
+            # Remove the first \x01, then rsplit to remove the last one, and ignore text after the last \x01
+            ctcp_text = content_raw[1:].rsplit("\x01", 1)[0]
+            ctcp_text_split = ctcp_text.split(None, 1)
+            if ctcp_text_split[0] == "ACTION":
+                # this is a CTCP ACTION, set event_type and content accordingly
+                event_type = EventType.action
+                content = ctcp_text_split[1]
             else:
+                # this shouldn't be considered a regular message
                 event_type = EventType.other
+        else:
+            ctcp_text = None
 
-            # Target (for KICK, INVITE)
-            if event_type is EventType.kick:
-                target = command_params[1]
+        # Channel
+        channel = None
+        if command_params:
+            if command in ["NOTICE", "PRIVMSG", "KICK", "JOIN", "PART", "MODE"]:
+                channel = command_params[0]
             elif command == "INVITE":
-                target = command_params[0]
-            else:
-                # TODO: Find more commands which give a target
-                target = None
-
-            # Parse for CTCP
-            if event_type is EventType.message and content_raw.count("\x01") >= 2 and content_raw.startswith("\x01"):
-                # Remove the first \x01, then rsplit to remove the last one, and ignore text after the last \x01
-                ctcp_text = content_raw[1:].rsplit("\x01", 1)[0]
-                ctcp_text_split = ctcp_text.split(None, 1)
-                if ctcp_text_split[0] == "ACTION":
-                    # this is a CTCP ACTION, set event_type and content accordingly
-                    event_type = EventType.action
-                    content = ctcp_text_split[1]
-                else:
-                    # this shouldn't be considered a regular message
-                    event_type = EventType.other
-            else:
-                ctcp_text = None
-
-            # Channel
-            channel = None
-            if command_params:
-                if command in ["NOTICE", "PRIVMSG", "KICK", "JOIN", "PART", "MODE"]:
-                    channel = command_params[0]
-                elif command == "INVITE":
-                    channel = command_params[1]
-                elif len(command_params) > 2 or not (command_params.has_trail and len(command_params) == 1):
-                    channel = command_params[0]
-
-            prefix = message.prefix
-
-            nick = prefix.nick
-            user = prefix.user
-            host = prefix.host
-            mask = prefix.mask
-
-            if channel:
-                # TODO Migrate plugins to accept the original case of the channel
-                channel = channel.lower()
-
-                channel = channel.split()[0]  # Just in case there is more data
-
-                if channel == self.conn.nick.lower():
-                    channel = nick.lower()
-
-            # Set up parsed message
-            # TODO: Do we really want to send the raw `prefix` and `command_params` here?
-            event = Event(
-                bot=self.bot, conn=self.conn, event_type=event_type, content_raw=content_raw, content=content,
-                target=target, channel=channel, nick=nick, user=user, host=host, mask=mask, irc_raw=line,
-                irc_prefix=mask, irc_command=command, irc_paramlist=command_params, irc_ctcp_text=ctcp_text
-            )
+                channel = command_params[1]
+            elif len(command_params) > 2 or not (command_params.has_trail and len(command_params) == 1):
+                channel = command_params[0]
+
+        prefix = message.prefix
+
+        nick = prefix.nick
+        user = prefix.user
+        host = prefix.host
+        mask = prefix.mask
+
+        if channel:
+            # TODO Migrate plugins to accept the original case of the channel
+            channel = channel.lower()
+
+            channel = channel.split()[0]  # Just in case there is more data
+
+            if channel == self.conn.nick.lower():
+                channel = nick.lower()
+
+        # Set up parsed message
+        # TODO: Do we really want to send the raw `prefix` and `command_params` here?
+        event = Event(
+            bot=self.bot, conn=self.conn, event_type=event_type, content_raw=content_raw, content=content,
+            target=target, channel=channel, nick=nick, user=user, host=host, mask=mask, irc_raw=line,
+            irc_prefix=mask, irc_command=command, irc_paramlist=command_params, irc_ctcp_text=ctcp_text
+        )
 
-            # handle the message, async
-            async_util.wrap_future(self.bot.process(event), loop=self.loop)
+        # handle the message, async
+        async_util.wrap_future(self.bot.process(event), loop=self.loop)
 
     @property
     def connected(self):
@@ -51,10 +51,11 @@ class Config(OrderedDict):
         self.update(data)
         logger.debug("Config loaded from file.")
 
-        # reload permissions
+        # reload permissions and sieve policies
         if self.bot.connections:
             for connection in self.bot.connections.values():
                 connection.permissions.reload()
+                connection.sieve_policy.reload()
 
         # reload theme
         cloudbot.util.colors.set_theme(self.get("theme"))
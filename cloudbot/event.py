@@ -1,10 +1,10 @@
 import asyncio
-import concurrent.futures
 import enum
 import logging
 import sys
 import warnings
 from functools import partial
+from operator import attrgetter
 
 from cloudbot.util.parsers.irc import Message
 
@@ -23,6 +23,45 @@ class EventType(enum.Enum):
     other = 6
 
 
+class _EventData:
+    """
+    The line-specific fields of an event, shared between an event and all the events derived from it
+    """
+
+    __slots__ = (
+        'type', 'content', 'content_raw', 'target', 'chan', 'nick', 'user', 'host', 'mask', 'irc_raw', 'irc_prefix',
+        'irc_command', 'irc_paramlist', 'irc_ctcp_text', 'force', 'line_cache'
+    )
+
+    def copy(self):
+        """
+        Copies the fields, but not the line cache, as the copy is about to be changed and cached results may depend on
+        the changed field
+        :rtype: _EventData
+        """
+        data = _EventData()
+        for name in self.__slots__:
+            setattr(data, name, getattr(self, name))
+
+        data.line_cache = None
+        return data
+
+
+def _data_property(name):
+    """
+    Creates a property which reads the field from the event's shared data, copying the data before it's modified
+    :type name: str
+    """
+    def _set(self, value):
+        if not self._owns_data:
+            self._data = self._data.copy()
+            self._owns_data = True
+
+        setattr(self._data, name, value)
+
+    return property(attrgetter('_data.' + name), _set)
+
+
 class Event:
     """
     :type bot: cloudbot.bot.CloudBot
@@ -37,7 +76,7 @@ class Event:
     :type host: str
     :type mask: str
     :type db: sqlalchemy.orm.Session
-    :type db_executor: concurrent.futures.ThreadPoolExecutor
+    :type db_executor: concurrent.futures.ThreadPoolExecutor | None
     :type irc_raw: str
     :type irc_prefix: str
     :type irc_command: str
@@ -46,6 +85,24 @@ class Event:
     :type force: bool
     """
 
+    __slots__ = ('bot', 'conn', 'hook', 'db', 'db_executor', '_db_refs', '_data', '_owns_data')
+
+    type = _data_property('type')
+    content = _data_property('content')
+    content_raw = _data_property('content_raw')
+    target = _data_property('target')
+    chan = _data_property('chan')
+    nick = _data_property('nick')
+    user = _data_property('user')
+    host = _data_property('host')
+    mask = _data_property('mask')
+    irc_raw = _data_property('irc_raw')
+    irc_prefix = _data_property('irc_prefix')
+    irc_command = _data_property('irc_command')
+    irc_paramlist = _data_property('irc_paramlist')
+    irc_ctcp_text = _data_property('irc_ctcp_text')
+    force = _data_property('force')
+
     def __init__(self, *, bot=None, hook=None, conn=None, base_event=None, event_type=EventType.other, content=None,
                  content_raw=None, target=None, channel=None, nick=None, user=None, host=None, mask=None, irc_raw=None,
                  irc_prefix=None, irc_command=None, irc_paramlist=None, irc_ctcp_text=None, force=False):
@@ -95,6 +152,8 @@ class Event:
         """
         self.db = None
         self.db_executor = None
+        # how many nested prepare() calls are sharing the checked out database worker
+        self._db_refs = 0
         self.bot = bot
         self.conn = conn
         self.hook = hook
@@ -107,41 +166,33 @@ class Event:
             if self.hook is None and base_event.hook is not None:
                 self.hook = base_event.hook
 
-            # If base_event is provided, don't check these parameters, just inherit
-            self.type = base_event.type
-            self.content = base_event.content
-            self.content_raw = base_event.content_raw
-            self.target = base_event.target
-            self.chan = base_event.chan
-            self.nick = base_event.nick
-            self.user = base_event.user
-            self.host = base_event.host
-            self.mask = base_event.mask
-            # clients-specific parameters
-            self.irc_raw = base_event.irc_raw
-            self.irc_prefix = base_event.irc_prefix
-            self.irc_command = base_event.irc_command
-            self.irc_paramlist = base_event.irc_paramlist
-            self.irc_ctcp_text = base_event.irc_ctcp_text
-            self.force = base_event.force
+            # If base_event is provided, don't check these parameters, just share the base event's data.
+            # Whichever event modifies the data first will make its own copy.
+            self._data = base_event._data
+            self._owns_data = False
+            base_event._owns_data = False
         else:
             # Since base_event wasn't provided, we can take these parameters
-            self.type = event_type
-            self.content = content
-            self.content_raw = content_raw
-            self.target = target
-            self.chan = channel
-            self.nick = nick
-            self.user = user
-            self.host = host
-            self.mask = mask
+            data = _EventData()
+            data.type = event_type
+            data.content = content
+            data.content_raw = content_raw
+            data.target = target
+            data.chan = channel
+            data.nick = nick
+            data.user = user
+            data.host = host
+            data.mask = mask
             # clients-specific parameters
-            self.irc_raw = irc_raw
-            self.irc_prefix = irc_prefix
-            self.irc_command = irc_command
-            self.irc_paramlist = irc_paramlist
-            self.irc_ctcp_text = irc_ctcp_text
-            self.force = force
+            data.irc_raw = irc_raw
+            data.irc_prefix = irc_prefix
+            data.irc_command = irc_command
+            data.irc_paramlist = irc_paramlist
+            data.irc_ctcp_text = irc_ctcp_text
+            data.force = force
+            data.line_cache = None
+            self._data = data
+            self._owns_data = True
 
     @asyncio.coroutine
     def prepare(self):
@@ -157,13 +208,17 @@ class Event:
         if self.hook is None:
             raise ValueError("event.hook is required to prepare an event")
 
-        if "db" in self.hook.required_args:
+        if self.db_executor is not None:
+            # this event is already running a hook with a database worker, eg. a perm hook launched from inside a
+            # command. Share that worker, as waiting for another could deadlock once every worker is held.
+            self._db_refs += 1
+            self.bot.db_pool.bind(self.db_executor)
+        elif "db" in self.hook.required_args:
             # logger.debug("Opening database session for {}:threaded=False".format(self.hook.description))
 
-            # we're running a coroutine hook with a db, so initialise an executor pool
-            self.db_executor = concurrent.futures.ThreadPoolExecutor(1)
-            # be sure to initialize the db in the database executor, so it will be accessible in that thread.
-            self.db = yield from self.async_call(self.bot.db_session)
+            # we're running a coroutine hook with a db, so check out a database worker. The session is created on the
+            # worker's thread, and async_call() will run everything on that thread until the event is closed.
+            self.db_executor, self.db = yield from self.bot.db_pool.checkout()
 
     def prepare_threaded(self):
         """
@@ -196,11 +251,17 @@ class Event:
         if self.hook is None:
             raise ValueError("event.hook is required to close an event")
 
-        if self.db is not None:
+        if self._db_refs:
+            # a nested hook is done with the shared worker, the outer hook still needs it
+            self._db_refs -= 1
+            self.bot.db_pool.unbind()
+        elif self.db_executor is not None:
             # logger.debug("Closing database session for {}:threaded=False".format(self.hook.description))
             # be sure the close the database in the database executor, as it is only accessable in that one thread
-            yield from self.async_call(self.db.close)
+            db, db_executor = self.db, self.db_executor
             self.db = None
+            self.db_executor = None
+            yield from self.bot.db_pool.release(db_executor, db)
 
     def close_threaded(self):
         """
@@ -225,6 +286,21 @@ class Event:
         """
         return self
 
+    @property
+    def line_cache(self):
+        """
+        A dict shared between this event and all events derived from the same base event.
+
+        Sieves can use this to store results that are the same for every hook triggered by a line, eg. whether the
+        sender is ignored. An event which changes any of its fields gets a new, empty cache.
+        :rtype: dict
+        """
+        data = self._data
+        if data.line_cache is None:
+            data.line_cache = {}
+
+        return data.line_cache
+
     @property
     def loop(self):
         """
@@ -362,6 +438,8 @@ class Event:
     def async_call(self, func, *args, **kwargs):
         if self.db_executor is not None:
             executor = self.db_executor
+        elif self.hook is not None:
+            executor = self.bot.executors.get(self.hook.executor)
         else:
             executor = None
 
@@ -409,6 +487,8 @@ class CommandEvent(Event):
     :type triggered_command: str
     """
 
+    __slots__ = ('text', 'doc', 'triggered_command', 'triggered_prefix')
+
     def __init__(self, *, bot=None, hook, text, triggered_command, cmd_prefix, conn=None, base_event=None,
                  event_type=None, content=None, content_raw=None, target=None, channel=None, nick=None, user=None,
                  host=None, mask=None, irc_raw=None, irc_prefix=None, irc_command=None, irc_paramlist=None, force=False):
@@ -454,6 +534,8 @@ class RegexEvent(Event):
     :type match: re.__Match
     """
 
+    __slots__ = ('match',)
+
     def __init__(self, *, bot=None, hook, match, conn=None, base_event=None, event_type=None, content=None, content_raw=None,
                  target=None, channel=None, nick=None, user=None, host=None, mask=None, irc_raw=None, irc_prefix=None,
                  irc_command=None, irc_paramlist=None, force=False):
@@ -468,6 +550,8 @@ class RegexEvent(Event):
 
 
 class CapEvent(Event):
+    __slots__ = ('cap', 'cap_param')
+
     def __init__(self, *args, cap, cap_param=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.cap = cap
@@ -475,6 +559,8 @@ class CapEvent(Event):
 
 
 class IrcOutEvent(Event):
+    __slots__ = ('parsed_line',)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.parsed_line = None
@@ -505,7 +591,23 @@ class IrcOutEvent(Event):
         return str(self.irc_raw)
 
 
+class BatchEvent(Event):
+    """
+    Passed to singlethread hooks with `batch` set. Hook arguments other than `events` come from the first event.
+
+    :type events: list[cloudbot.event.Event]
+    """
+
+    __slots__ = ('events',)
+
+    def __init__(self, *args, events, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = events
+
+
 class PostHookEvent(Event):
+    __slots__ = ('launched_hook', 'launched_event', 'result', 'error')
+
     def __init__(self, *args, launched_hook=None, launched_event=None, result=None, error=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.launched_hook = launched_hook
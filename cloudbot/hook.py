@@ -26,6 +26,14 @@ class Action(Enum):
     CONTINUE = 2  # Normal execution of all hooks
 
 
+@unique
+class Overflow(Enum):
+    """Defines what to do when a hook's wait queue (max_queue) is full"""
+    DROP_NEWEST = 0  # Drop the new event
+    DROP_OLDEST = 1  # Drop the event which has waited longest, and queue the new one
+    BUSY = 2  # Drop the new event, and tell the user the hook is busy
+
+
 class _Hook:
     """
     :type function: function
@@ -1,5 +1,7 @@
+import fnmatch
 import logging
-from fnmatch import fnmatch
+import re
+from functools import lru_cache
 
 logger = logging.getLogger("cloudbot")
 
@@ -7,6 +9,57 @@ logger = logging.getLogger("cloudbot")
 # it's disabled by default, see has_perm_mask()
 backdoor = None
 
+_wildcard_chars = frozenset('*?[')
+
+
+def _translate(mask):
+    regex = fnmatch.translate(mask)
+    if regex.endswith('(?ms)'):
+        # Python < 3.6 puts the flags at the end, which can't be combined with other patterns
+        regex = regex[:-5]
+
+    return regex
+
+
+class MaskMatcher:
+    """
+    A compiled set of lower-case user masks
+
+    Masks without wildcards are checked with a set lookup, the rest with a single combined regex. Matching is the
+    same as calling fnmatch() with each mask.
+    """
+
+    __slots__ = ('literals', 'regex')
+
+    def __init__(self, masks):
+        """
+        :type masks: collections.Iterable[str]
+        """
+        literals = set()
+        wildcards = []
+        for mask in masks:
+            if _wildcard_chars.isdisjoint(mask):
+                literals.add(mask)
+            else:
+                wildcards.append(mask)
+
+        self.literals = frozenset(literals)
+        if wildcards:
+            self.regex = re.compile('|'.join('(?:{})'.format(_translate(mask)) for mask in wildcards), re.DOTALL)
+        else:
+            self.regex = None
+
+    def matches(self, user_mask):
+        """
+        :param user_mask: The lower-case mask to check
+        :type user_mask: str
+        :rtype: bool
+        """
+        if user_mask in self.literals:
+            return True
+
+        return self.regex is not None and self.regex.match(user_mask) is not None
+
 
 class PermissionManager(object):
     """
@@ -15,6 +68,10 @@ class PermissionManager(object):
     :type group_perms: dict[str, list[str]]
     :type group_users: dict[str, list[str]]
     :type perm_users: dict[str, list[str]]
+    :type perm_matchers: dict[str, MaskMatcher]
+    :type group_matchers: dict[str, MaskMatcher]
+    :type checks: int
+    :type allowed: int
     """
 
     def __init__(self, conn):
@@ -30,6 +87,15 @@ class PermissionManager(object):
         self.group_perms = {}
         self.group_users = {}
         self.perm_users = {}
+        self.perm_matchers = {}
+        self.group_matchers = {}
+
+        # counters
+        self.checks = 0
+        self.allowed = 0
+
+        # (user_mask, perm) -> bool, cleared on reload
+        self._check_perm = lru_cache(maxsize=1024)(self._match_perm)
 
         self.reload()
 
@@ -60,10 +126,27 @@ class PermissionManager(object):
                     self.perm_users[perm] = []
                 self.perm_users[perm].extend(users)
 
+        self.perm_matchers = {perm: MaskMatcher(users) for perm, users in self.perm_users.items()}
+        self.group_matchers = {group: MaskMatcher(users) for group, users in self.group_users.items()}
+        self._check_perm.cache_clear()
+
         logger.debug("[{}|permissions] Group permissions: {}".format(self.name, self.group_perms))
         logger.debug("[{}|permissions] Group users: {}".format(self.name, self.group_users))
         logger.debug("[{}|permissions] Permission users: {}".format(self.name, self.perm_users))
 
+    def _match_perm(self, user_mask, perm):
+        """
+        :param user_mask: The lower-case user mask
+        :param perm: The lower-case permission
+        :rtype: bool
+        """
+        matcher = self.perm_matchers.get(perm)
+        if matcher is None:
+            # no one has access
+            return False
+
+        return matcher.matches(user_mask)
+
     def has_perm_mask(self, user_mask, perm, notice=True):
         """
         :type user_mask: str
@@ -72,22 +155,32 @@ class PermissionManager(object):
         """
 
         if backdoor:
-            if fnmatch(user_mask.lower(), backdoor.lower()):
+            if fnmatch.fnmatch(user_mask.lower(), backdoor.lower()):
                 return True
 
-        if not perm.lower() in self.perm_users:
-            # no one has access
+        self.checks += 1
+        if not self._check_perm(user_mask.lower(), perm.lower()):
             return False
 
-        allowed_users = self.perm_users[perm.lower()]
+        self.allowed += 1
+        if notice:
+            logger.info("[{}|permissions] Allowed user {} access to {}".format(self.name, user_mask, perm))
 
-        for allowed_mask in allowed_users:
-            if fnmatch(user_mask.lower(), allowed_mask):
-                if notice:
-                    logger.info("[{}|permissions] Allowed user {} access to {}".format(self.name, user_mask, perm))
-                return True
+        return True
 
-        return False
+    def stats(self):
+        """
+        Gets the permission check counters, and the hit rate of the result cache
+        :rtype: dict[str, int]
+        """
+        cache_info = self._check_perm.cache_info()
+        return {
+            'checks': self.checks,
+            'allowed': self.allowed,
+            'cache_hits': cache_info.hits,
+            'cache_misses': cache_info.misses,
+            'cache_size': cache_info.currsize,
+        }
 
     def get_groups(self):
         return set().union(self.group_perms.keys(), self.group_users.keys())
@@ -111,25 +204,16 @@ class PermissionManager(object):
         :type user_mask: str
         :rtype: list[str]
         """
-        permissions = set()
-        for permission, users in self.perm_users.items():
-            for mask_to_check in users:
-                if fnmatch(user_mask.lower(), mask_to_check):
-                    permissions.add(permission)
-        return permissions
+        user_mask = user_mask.lower()
+        return {permission for permission, matcher in self.perm_matchers.items() if matcher.matches(user_mask)}
 
     def get_user_groups(self, user_mask):
         """
         :type user_mask: str
         :rtype: list[str]
         """
-        groups = []
-        for group, users in self.group_users.items():
-            for mask_to_check in users:
-                if fnmatch(user_mask.lower(), mask_to_check):
-                    groups.append(group)
-                    continue
-        return groups
+        user_mask = user_mask.lower()
+        return [group for group, matcher in self.group_matchers.items() if matcher.matches(user_mask)]
 
     def group_exists(self, group):
         """
@@ -146,13 +230,11 @@ class PermissionManager(object):
         :type user_mask: str
         :rtype: bool
         """
-        users = self.group_users.get(group.lower())
-        if not users:
+        matcher = self.group_matchers.get(group.lower())
+        if matcher is None:
             return False
-        for mask_to_check in users:
-            if fnmatch(user_mask.lower(), mask_to_check):
-                return True
-        return False
+
+        return matcher.matches(user_mask.lower())
 
     def remove_group_user(self, group, user_mask):
         """
@@ -168,7 +250,7 @@ class PermissionManager(object):
         config_groups = self.config.get("permissions", {})
 
         for mask_to_check in list(self.group_users[group.lower()]):
-            if fnmatch(user_mask.lower(), mask_to_check):
+            if fnmatch.fnmatch(user_mask.lower(), mask_to_check):
                 masks_removed.append(mask_to_check)
                 # We're going to act like the group keys are all lowercase.
                 # The user has been warned (above) if they aren't.
@@ -6,22 +6,37 @@ import re
 import sys
 import time
 import warnings
-from collections import defaultdict
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
 from functools import partial
 from itertools import chain
 from operator import attrgetter
 from pathlib import Path
-from weakref import WeakValueDictionary
+from weakref import WeakKeyDictionary, WeakValueDictionary
 
 import sqlalchemy
 
-from cloudbot.event import Event, PostHookEvent
-from cloudbot.hook import Priority, Action
+from cloudbot.event import Event, PostHookEvent, BatchEvent
+from cloudbot.hook import Priority, Action, Overflow
 from cloudbot.util import database, async_util
+from cloudbot.util.concurrency import ConcurrencyLimit, QueueWorker
+from cloudbot.util.executors import DEFAULT_POOL
 from cloudbot.util.func_utils import call_with_args
+from cloudbot.util.parsers.irc import Message
+from cloudbot.util.regex_dispatch import RegexDispatcher
 
 logger = logging.getLogger("cloudbot")
 
+# The data passed to inline post hooks after a hook or sieve finishes
+HookResult = namedtuple('HookResult', 'bot conn launched_hook launched_event result error')
+
+# The arguments available to irc_out hooks run as part of the inline out sieve chain
+INLINE_OUT_ARGS = frozenset(('bot', 'conn', 'hook', 'irc_raw', 'line', 'parsed_line', 'logger', 'loop'))
+
+# How many events may wait for a singlethread hook which doesn't set max_queue. Unloading a plugin runs everything
+# still queued, so this also bounds how long that can take.
+DEFAULT_SINGLETHREAD_QUEUE = 1000
+
 
 def find_hooks(parent, module):
     """
@@ -60,6 +75,22 @@ def find_tables(code):
     return tables
 
 
+def create_indexes(table, engine):
+    """
+    Creates the indexes declared for an existing table which aren't in the database yet
+
+    Plugins declare indexes with `sqlalchemy.Index` alongside their Table definitions. They are created with the
+    table, but indexes added to a plugin after its table was created need to be added separately.
+    :type table: sqlalchemy.Table
+    :type engine: sqlalchemy.engine.Engine
+    """
+    existing = {index['name'] for index in sqlalchemy.inspect(engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            logger.info("Creating index %s on %s", index.name, table.name)
+            index.create(engine)
+
+
 class PluginManager:
     """
     PluginManager is the core of CloudBot plugin loading.
@@ -77,11 +108,14 @@ class PluginManager:
     :type bot: cloudbot.bot.CloudBot
     :type plugins: dict[str, Plugin]
     :type commands: dict[str, CommandHook]
+    :type _command_aliases: list[str]
     :type raw_triggers: dict[str, list[RawHook]]
     :type catch_all_triggers: list[RawHook]
     :type event_type_hooks: dict[cloudbot.event.EventType, list[EventHook]]
-    :type regex_hooks: list[(re.__Regex, RegexHook)]
+    :type regex_hooks: RegexDispatcher
     :type sieves: list[SieveHook]
+    :type out_sieves: list[IrcOutHook]
+    :type out_sieve_chain: list[IrcOutHook | tuple[IrcOutHook]]
     """
 
     def __init__(self, bot):
@@ -94,17 +128,26 @@ class PluginManager:
         self.plugins = {}
         self._plugin_name_map = WeakValueDictionary()
         self.commands = {}
+        # sorted list of all registered command aliases, used for prefix lookups
+        self._command_aliases = []
         self.raw_triggers = {}
         self.catch_all_triggers = []
         self.event_type_hooks = {}
-        self.regex_hooks = []
+        self.regex_hooks = RegexDispatcher()
         self.sieves = []
         self.cap_hooks = {"on_available": defaultdict(list), "on_ack": defaultdict(list)}
         self.connect_hooks = []
         self.out_sieves = []
+        # out_sieves with consecutive inline hooks grouped into tuples, see _compile_out_sieves()
+        self.out_sieve_chain = []
         self.hook_hooks = defaultdict(list)
         self.perm_hooks = defaultdict(list)
-        self._hook_waiting_queues = {}
+        # concurrency limits for hooks with max_concurrency set, see _get_concurrency_limit()
+        self._hook_limits = WeakKeyDictionary()
+        # workers for singlethread hooks, see _get_hook_worker()
+        self._hook_workers = WeakKeyDictionary()
+        # run and error counts for inline sieves, which don't go through internal_launch(), sieve description -> counts
+        self.inline_sieve_stats = defaultdict(lambda: {'runs': 0, 'errors': 0})
 
     def find_plugin(self, title):
         """
@@ -114,6 +157,25 @@ class PluginManager:
         """
         return self._plugin_name_map.get(title)
 
+    def find_commands(self, prefix):
+        """
+        Finds all registered command aliases starting with the given prefix
+        :param prefix: The partial command name to look up
+        :return: A list of (alias, hook) tuples, sorted by alias
+        :type prefix: str
+        :rtype: list[(str, CommandHook)]
+        """
+        aliases = self._command_aliases
+        matches = []
+        for i in range(bisect_left(aliases, prefix), len(aliases)):
+            alias = aliases[i]
+            if not alias.startswith(prefix):
+                break
+
+            matches.append((alias, self.commands[alias]))
+
+        return matches
+
     @asyncio.coroutine
     def load_all(self, plugin_dir):
         """
@@ -224,6 +286,7 @@ class PluginManager:
                         "Ignoring new assignment.".format(plugin.title, alias, self.commands[alias].plugin.title))
                 else:
                     self.commands[alias] = command_hook
+                    insort(self._command_aliases, alias)
             self._log_hook(command_hook)
 
         # register raw hooks
@@ -268,7 +331,10 @@ class PluginManager:
             self._log_hook(out_hook)
 
         for post_hook in plugin.hooks["post_hook"]:
-            self.hook_hooks["post"].append(post_hook)
+            if post_hook.inline:
+                self.hook_hooks["inline_post"].append(post_hook)
+            else:
+                self.hook_hooks["post"].append(post_hook)
             self._log_hook(post_hook)
 
         for perm_hook in plugin.hooks["perm_check"]:
@@ -290,6 +356,8 @@ class PluginManager:
         for lst in lists_of_hooks:
             lst.sort(key=attrgetter("priority"))
 
+        self._compile_out_sieves()
+
         # we don't need this anymore
         del plugin.hooks["on_start"]
 
@@ -335,6 +403,7 @@ class PluginManager:
                 if alias in self.commands and self.commands[alias] == command_hook:
                     # we need to make sure that there wasn't a conflict, so we don't delete another plugin's command
                     del self.commands[alias]
+                    del self._command_aliases[bisect_left(self._command_aliases, alias)]
 
         # unregister raw hooks
         for raw_hook in plugin.hooks["irc_raw"]:
@@ -371,13 +440,30 @@ class PluginManager:
         for out_hook in plugin.hooks["irc_out"]:
             self.out_sieves.remove(out_hook)
 
+        self._compile_out_sieves()
+
         for post_hook in plugin.hooks["post_hook"]:
-            self.hook_hooks["post"].remove(post_hook)
+            if post_hook.inline:
+                self.hook_hooks["inline_post"].remove(post_hook)
+            else:
+                self.hook_hooks["post"].remove(post_hook)
 
         for perm_hook in plugin.hooks["perm_check"]:
             for perm in perm_hook.perms:
                 self.perm_hooks[perm].remove(perm_hook)
 
+        # Let singlethread hooks finish their queued events. Every hook is marked first, as stopping a worker yields
+        # and events which arrive meanwhile mustn't start a new one.
+        for hook_list in plugin.hooks.values():
+            for _hook in hook_list:
+                _hook.unloaded = True
+
+        for hook_list in plugin.hooks.values():
+            for _hook in hook_list:
+                worker = self._hook_workers.pop(_hook, None)
+                if worker is not None:
+                    yield from worker.stop()
+
         # Run on_stop hooks
         for on_stop_hook in plugin.hooks["on_stop"]:
             event = Event(bot=self.bot, hook=on_stop_hook)
@@ -408,6 +494,9 @@ class PluginManager:
 
         :type hook: Hook
         """
+        if hook.threaded and hook.executor not in self.bot.executors:
+            logger.warning("Unknown executor '%s' for %s, using '%s'", hook.executor, hook.description, DEFAULT_POOL)
+
         if self.bot.config.get("logging", {}).get("show_plugin_loading", True):
             logger.info("Loaded {}".format(hook))
             logger.debug("Loaded {}".format(repr(hook)))
@@ -446,7 +535,8 @@ class PluginManager:
         :return: a tuple of (ok, result) where ok is a boolean that determines if the hook ran without error and result is the result from the hook
         """
         if hook.threaded:
-            coro = self.bot.loop.run_in_executor(None, self._execute_hook_threaded, hook, event)
+            executor = self.bot.executors.get(hook.executor)
+            coro = self.bot.loop.run_in_executor(executor, self._execute_hook_threaded, hook, event)
         else:
             coro = self._execute_hook_sync(hook, event)
 
@@ -482,6 +572,120 @@ class PluginManager:
         else:
             error = out
 
+        yield from self._run_post_hooks(hook, event, result, error)
+
+        return ok
+
+    def _compile_out_sieves(self):
+        """
+        Rebuilds out_sieve_chain from the sorted out_sieves, grouping runs of inline hooks so they can be applied to a
+        line in a single call to run_inline_out_sieves()
+        """
+        out_sieve_chain = []
+        inline_hooks = []
+        for out_hook in self.out_sieves:
+            if out_hook.inline:
+                inline_hooks.append(out_hook)
+                continue
+
+            if inline_hooks:
+                out_sieve_chain.append(tuple(inline_hooks))
+                inline_hooks = []
+
+            out_sieve_chain.append(out_hook)
+
+        if inline_hooks:
+            out_sieve_chain.append(tuple(inline_hooks))
+
+        self.out_sieve_chain = out_sieve_chain
+
+    def run_inline_out_sieves(self, out_hooks, conn, line):
+        """
+        Runs a group of inline irc_out hooks on an outgoing line, directly in the event loop
+
+        The line is only parsed when a hook asks for `parsed_line`, and the parsed Message is shared by the following
+        hooks until one of them changes the line.
+
+        :param out_hooks: The hooks to run, in order
+        :param conn: The connection the line is being sent to
+        :param line: The outgoing line
+        :return: A tuple of (ok, line), ok will be False if one of the hooks errored. Processing stops early if a hook
+                 returns an empty line.
+        :type out_hooks: tuple[IrcOutHook]
+        :type conn: cloudbot.client.Client
+        :type line: str | bytes
+        :rtype: (bool, str | bytes | None)
+        """
+        args = {'bot': self.bot, 'conn': conn, 'logger': logger, 'loop': self.bot.loop}
+        parsed_line = None
+        parsed_from = None
+        for out_hook in out_hooks:
+            args['hook'] = out_hook
+            args['irc_raw'] = line
+            args['line'] = str(line)
+            if out_hook.needs_parsed_line:
+                if parsed_from is not line:
+                    try:
+                        parsed_line = Message.parse(args['line'])
+                    except Exception:
+                        logger.exception("Unable to parse line requested by hook %s", out_hook)
+                        parsed_line = None
+
+                    parsed_from = line
+
+                args['parsed_line'] = parsed_line
+
+            try:
+                new_line = out_hook.function(*[args[arg] for arg in out_hook.required_args])
+            except Exception:
+                logger.exception("Error in hook {}".format(out_hook.description))
+                return False, line
+
+            if new_line is not None and not isinstance(new_line, bytes):
+                if new_line is parsed_line:
+                    # The hook modified the shared Message, it is still valid for the new line
+                    new_line = str(new_line)
+                    parsed_from = new_line
+                else:
+                    new_line = str(new_line)
+
+            line = new_line
+            if not line:
+                break
+
+        return True, line
+
+    def _run_inline_post_hooks(self, hook, event, result, error):
+        """
+        Runs all inline post hooks directly, passing them a HookResult
+
+        :type hook: cloudbot.plugin.Hook
+        :type event: cloudbot.event.Event
+        """
+        inline_hooks = self.hook_hooks["inline_post"]
+        if not inline_hooks:
+            return
+
+        record = HookResult(event.bot, event.conn, hook, event, result, error)
+        for post_hook in inline_hooks:
+            try:
+                post_hook.function(*[getattr(record, arg) for arg in post_hook.required_args])
+            except Exception:
+                logger.exception("Error in hook {}".format(post_hook.description))
+
+    @asyncio.coroutine
+    def _run_post_hooks(self, hook, event, result, error):
+        """
+        Runs all post hooks for a finished hook or sieve
+
+        :type hook: cloudbot.plugin.Hook
+        :type event: cloudbot.event.Event
+        """
+        self._run_inline_post_hooks(hook, event, result, error)
+
+        if not self.hook_hooks["post"]:
+            return
+
         post_event = partial(
             PostHookEvent, launched_hook=hook, launched_event=event, bot=event.bot,
             conn=event.conn, result=result, error=error
@@ -491,40 +695,50 @@ class PluginManager:
             if success and res is False:
                 break
 
-        return ok
-
     @asyncio.coroutine
     def _sieve(self, sieve, event, hook):
         """
-        :type sieve: cloudbot.plugin.Hook
+        :type sieve: cloudbot.plugin.SieveHook
         :type event: cloudbot.event.Event
         :type hook: cloudbot.plugin.Hook
         :rtype: cloudbot.event.Event
         """
-        if sieve.threaded:
-            coro = self.bot.loop.run_in_executor(None, sieve.function, self.bot, event, hook)
+        result, error = None, None
+        if sieve.inline:
+            # Inline sieves are run directly, without creating a task or using the executor
+            stats = self.inline_sieve_stats[sieve.description]
+            stats['runs'] += 1
+            try:
+                if sieve.threaded:
+                    result = sieve.function(self.bot, event, hook)
+                else:
+                    result = yield from sieve.function(self.bot, event, hook)
+            except Exception:
+                logger.exception("Error running sieve {} on {}:".format(sieve.description, hook.description))
+                stats['errors'] += 1
+                error = sys.exc_info()
+            else:
+                # Inline sieves only launch the full post hooks if they error
+                self._run_inline_post_hooks(sieve, event, result, error)
+                return result
         else:
-            coro = sieve.function(self.bot, event, hook)
+            if sieve.threaded:
+                executor = self.bot.executors.get(sieve.executor)
+                coro = self.bot.loop.run_in_executor(executor, sieve.function, self.bot, event, hook)
+            else:
+                coro = sieve.function(self.bot, event, hook)
 
-        result, error = None, None
-        task = async_util.wrap_future(coro)
-        sieve.plugin.tasks.append(task)
-        try:
-            result = yield from task
-        except Exception:
-            logger.exception("Error running sieve {} on {}:".format(sieve.description, hook.description))
-            error = sys.exc_info()
+            task = async_util.wrap_future(coro)
+            sieve.plugin.tasks.append(task)
+            try:
+                result = yield from task
+            except Exception:
+                logger.exception("Error running sieve {} on {}:".format(sieve.description, hook.description))
+                error = sys.exc_info()
 
-        sieve.plugin.tasks.remove(task)
+            sieve.plugin.tasks.remove(task)
 
-        post_event = partial(
-            PostHookEvent, launched_hook=sieve, launched_event=event, bot=event.bot,
-            conn=event.conn, result=result, error=error
-        )
-        for post_hook in self.hook_hooks["post"]:
-            success, res = yield from self.internal_launch(post_hook, post_event(hook=post_hook))
-            if success and res is False:
-                break
+        yield from self._run_post_hooks(sieve, event, result, error)
 
         return result
 
@@ -539,12 +753,82 @@ class PluginManager:
             yield from self.launch(hook, event)
             yield from asyncio.sleep(interval)
 
+    def _get_concurrency_limit(self, hook):
+        """
+        :type hook: cloudbot.plugin.Hook
+        :rtype: ConcurrencyLimit | None
+        """
+        if hook.max_concurrency is None:
+            return None
+
+        try:
+            return self._hook_limits[hook]
+        except KeyError:
+            limit = ConcurrencyLimit(self.bot.loop, hook.max_concurrency, hook.max_queue,
+                                     drop_oldest=hook.overflow is Overflow.DROP_OLDEST)
+            self._hook_limits[hook] = limit
+            return limit
+
+    def _get_hook_worker(self, hook):
+        """
+        :type hook: cloudbot.plugin.Hook
+        :rtype: QueueWorker | None
+        """
+        try:
+            return self._hook_workers[hook]
+        except KeyError:
+            if hook.unloaded:
+                return None
+
+            max_queue = DEFAULT_SINGLETHREAD_QUEUE if hook.max_queue is None else hook.max_queue
+            worker = QueueWorker(
+                self.bot.loop, partial(self._run_queued, hook), max_queue,
+                drop_oldest=hook.overflow is Overflow.DROP_OLDEST, batch_size=hook.batch,
+                on_shed=partial(self._shed_event, hook)
+            )
+            self._hook_workers[hook] = worker
+            return worker
+
+    @asyncio.coroutine
+    def _run_queued(self, hook, events):
+        """
+        Runs a singlethread hook with the events queued by its worker
+
+        :type hook: cloudbot.plugin.Hook
+        :type events: cloudbot.event.Event | list[cloudbot.event.Event]
+        """
+        if hook.batch is None:
+            yield from self._execute_hook(hook, events)
+        else:
+            yield from self._execute_hook(hook, BatchEvent(hook=hook, base_event=events[0], events=events))
+
+    def _shed_event(self, hook, event):
+        """
+        Handles an event dropped because the hook's wait queue was full
+
+        :type hook: cloudbot.plugin.Hook
+        :type event: cloudbot.event.Event
+        """
+        logger.debug("Wait queue for %s is full, dropping event", hook.description)
+        if hook.overflow is Overflow.BUSY and event.chan is not None and event.nick is not None:
+            event.reply("Sorry, I'm busy right now. Try again in a bit.")
+
+    def concurrency_stats(self):
+        """
+        Gets the queued and shed counts for every hook with a concurrency limit or a singlethread worker
+        :rtype: dict[str, dict]
+        """
+        stats = {hook.description: limit.stats() for hook, limit in self._hook_limits.items()}
+        stats.update((hook.description, worker.stats()) for hook, worker in self._hook_workers.items())
+        return stats
+
     @asyncio.coroutine
     def launch(self, hook, event):
         """
         Dispatch a given event to a given hook using a given bot object.
 
-        Returns False if the hook didn't run successfully, and True if it ran successfully.
+        Returns False if the hook didn't run successfully, and True if it ran successfully. Events for singlethread
+        hooks other than periodic ones are queued for the hook's worker, so True only means the event was queued.
 
         :type event: cloudbot.event.Event | cloudbot.event.CommandEvent
         :type hook: cloudbot.plugin.Hook | cloudbot.plugin.CommandHook
@@ -558,42 +842,35 @@ class PluginManager:
                     return False
                 hook = event.hook
 
-        if hook.single_thread:
-            # There should only be one running instance of this hook, so let's wait for the last event to be processed
-            # before starting this one.
-
-            key = (hook.plugin.title, hook.function_name)
-            if key in self._hook_waiting_queues:
-                queue = self._hook_waiting_queues[key]
-                if queue is None:
-                    # there's a hook running, but the queue hasn't been created yet, since there's only one hook
-                    queue = asyncio.Queue()
-                    self._hook_waiting_queues[key] = queue
-                assert isinstance(queue, asyncio.Queue)
-                # create a future to represent this task
-                future = async_util.create_future(self.bot.loop)
-                queue.put_nowait(future)
-                # wait until the last task is completed
-                yield from future
-            else:
-                # set to None to signify that this hook is running, but there's no need to create a full queue
-                # in case there are no more hooks that will wait
-                self._hook_waiting_queues[key] = None
+        # periodic hooks are already run one at a time by _start_periodic(), and queueing them would let a slow hook's
+        # runs pile up in the worker instead of delaying the next one
+        if hook.single_thread and hook.type not in ("on_start", "on_stop", "periodic"):
+            # Hand the event to the hook's worker, which runs one at a time. The result isn't waited for.
+            worker = self._get_hook_worker(hook)
+            if worker is None:
+                logger.debug("%s was unloaded, dropping event", hook.description)
+                return False
 
-            # Run the plugin with the message, and wait for it to finish
-            result = yield from self._execute_hook(hook, event)
+            if not worker.submit(event):
+                self._shed_event(hook, event)
+                return False
 
-            queue = self._hook_waiting_queues[key]
-            if queue is None or queue.empty():
-                # We're the last task in the queue, we can delete it now.
-                del self._hook_waiting_queues[key]
-            else:
-                # set the result for the next task's future, so they can execute
-                next_future = yield from queue.get()
-                next_future.set_result(None)
-        else:
+            return True
+
+        limit = self._get_concurrency_limit(hook)
+        if limit is None:
             # Run the plugin with the message, and wait for it to finish
             result = yield from self._execute_hook(hook, event)
+        else:
+            # Wait for a free slot, or give up if the hook's wait queue is full
+            if not (yield from limit.acquire()):
+                self._shed_event(hook, event)
+                return False
+
+            try:
+                result = yield from self._execute_hook(hook, event)
+            finally:
+                limit.release()
 
         # Return the result
         return result
@@ -641,7 +918,10 @@ class Plugin:
 
             for table in self.tables:
                 if not (yield from bot.loop.run_in_executor(None, table.exists, bot.db_engine)):
+                    # this also creates the table's indexes
                     yield from bot.loop.run_in_executor(None, table.create, bot.db_engine)
+                elif table.indexes:
+                    yield from bot.loop.run_in_executor(None, create_indexes, table, bot.db_engine)
 
     def unregister_tables(self, bot):
         """
@@ -668,6 +948,8 @@ class Hook:
     :type threaded: bool
     :type permissions: list[str]
     :type single_thread: bool
+    :type executor: str
+    :type unloaded: bool
     """
 
     def __init__(self, _type, plugin, func_hook):
@@ -703,6 +985,19 @@ class Hook:
         self.single_thread = func_hook.kwargs.pop("singlethread", False)
         self.action = func_hook.kwargs.pop("action", Action.CONTINUE)
         self.priority = func_hook.kwargs.pop("priority", Priority.NORMAL)
+        # how many invocations may run at once, and how many may wait, see PluginManager._get_concurrency_limit()
+        self.max_concurrency = func_hook.kwargs.pop("max_concurrency", None)
+        self.max_queue = func_hook.kwargs.pop("max_queue", None)
+        self.overflow = func_hook.kwargs.pop("overflow", Overflow.DROP_NEWEST)
+        # singlethread hooks with batch set get an `events` list of up to this many queued events per call
+        self.batch = func_hook.kwargs.pop("batch", None)
+        if self.batch is not None and not self.single_thread:
+            logger.warning("%s sets batch without singlethread, ignoring", self.description)
+            self.batch = None
+        # the named thread pool threaded hooks run in, see cloudbot.util.executors
+        self.executor = func_hook.kwargs.pop("executor", "db" if "db" in self.required_args else DEFAULT_POOL)
+        # set once the hook's plugin starts unloading, so late events don't start a new worker for it
+        self.unloaded = False
 
         clients = func_hook.kwargs.pop("clients", [])
 
@@ -828,15 +1123,23 @@ class RawHook(Hook):
 
 
 class SieveHook(Hook):
+    """
+    :type inline: bool
+    """
+
     def __init__(self, plugin, sieve_hook):
         """
         :type plugin: Plugin
         :type sieve_hook: cloudbot.util.hook._SieveHook
         """
+        # Inline sieves run directly in the event loop, without a task or executor, and only trigger post hooks on
+        # error. Only use this for sieves that are quick and never block.
+        self.inline = sieve_hook.kwargs.pop("inline", False)
+
         super().__init__("sieve", plugin, sieve_hook)
 
     def __repr__(self):
-        return "Sieve[{}]".format(Hook.__repr__(self))
+        return "Sieve[inline: {}, {}]".format(self.inline, Hook.__repr__(self))
 
     def __str__(self):
         return "sieve {} from {}".format(self.function_name, self.plugin.file_name)
@@ -928,22 +1231,65 @@ class OnConnectHook(Hook):
 
 
 class IrcOutHook(Hook):
+    """
+    :type inline: bool
+    :type needs_parsed_line: bool
+    """
+
     def __init__(self, plugin, out_hook):
+        # Plain function irc_out hooks are run inline by default, as part of a single synchronous chain in the event
+        # loop. Pass inline=False to run a slow hook in the executor with a full IrcOutEvent instead.
+        inline = out_hook.kwargs.pop("inline", None)
+
         super().__init__("irc_out", plugin, out_hook)
 
+        self.inline = inline is not False
+        self.needs_parsed_line = "parsed_line" in self.required_args
+        if self.inline:
+            invalid_args = set(self.required_args) - INLINE_OUT_ARGS
+            if invalid_args:
+                if inline:
+                    logger.warning("Inline irc_out hook %s requires unsupported arguments %s, running it as a normal "
+                                   "irc_out hook", self.description, sorted(invalid_args))
+                self.inline = False
+            elif not self.threaded:
+                if inline:
+                    logger.warning("Inline irc_out hook %s is a coroutine, running it as a normal irc_out hook",
+                                   self.description)
+                self.inline = False
+
     def __repr__(self):
-        return "Irc_Out[{}]".format(Hook.__repr__(self))
+        return "Irc_Out[inline: {}, {}]".format(self.inline, Hook.__repr__(self))
 
     def __str__(self):
         return "irc_out {} from {}".format(self.function_name, self.plugin.file_name)
 
 
 class PostHookHook(Hook):
+    """
+    :type inline: bool
+    """
+
     def __init__(self, plugin, out_hook):
+        # Inline post hooks are called directly in the event loop with the fields of a HookResult, instead of being
+        # launched as a task with a full PostHookEvent. Their return value is ignored.
+        self.inline = out_hook.kwargs.pop("inline", False)
+
         super().__init__("post_hook", plugin, out_hook)
 
+        if self.inline:
+            invalid_args = set(self.required_args) - set(HookResult._fields)
+            if invalid_args:
+                logger.warning("Inline post hook %s requires non-HookResult arguments %s, running it as a normal "
+                               "post hook", self.description, sorted(invalid_args))
+                self.inline = False
+            elif not self.threaded:
+                logger.warning("Inline post hook %s is a coroutine, running it as a normal post hook",
+                               self.description)
+                self.inline = False
+
     def __repr__(self):
-        return "Post_hook[{}]".format(Hook.__repr__(self))
+        return "Post_hook[inline: {}, {}]".format(self.inline, Hook.__repr__(self))
 
     def __str__(self):
         return "post_hook {} from {}".format(self.function_name, self.plugin.file_name)
@@ -0,0 +1,99 @@
+import logging
+from collections import namedtuple
+
+from cloudbot.util.ratelimit import LEVELS, Limit
+
+logger = logging.getLogger("cloudbot")
+
+# Channel restrictions for a single hook, from the connection's "acls" config.
+# deny_except and allow_except are frozensets of lower-case channel names, or None if not set.
+HookAcl = namedtuple('HookAcl', 'deny_except allow_except')
+
+RateLimit = namedtuple('RateLimit', 'tokens restore_rate message_cost strict')
+
+
+class SievePolicy:
+    """
+    The hook restrictions from a connection's config, compiled once for use by sieves
+
+    :type name: str
+    :type config: dict[str, ?]
+    :type acls: dict[str, HookAcl]
+    :type disabled_commands: frozenset[str]
+    :type ratelimit: RateLimit
+    :type limits: tuple[tuple[str, Limit]]
+    """
+
+    def __init__(self, conn):
+        """
+        :type conn: cloudbot.client.Client
+        """
+        self.name = conn.name
+        self.config = conn.config
+
+        self.acls = {}
+        self.disabled_commands = frozenset()
+        self.ratelimit = None
+        self.limits = ()
+
+        self.reload()
+
+    def reload(self):
+        logger.debug("[{}|policy] Reloading sieve policy for {}.".format(self.name, self.name))
+        acls = {}
+        for hook_name, acl in self.config.get('acls', {}).items():
+            if not acl:
+                continue
+
+            deny_except = acl.get('deny-except')
+            allow_except = acl.get('allow-except')
+            acls[hook_name] = HookAcl(
+                frozenset(map(str.lower, deny_except)) if deny_except is not None else None,
+                frozenset(map(str.lower, allow_except)) if allow_except is not None else None,
+            )
+
+        self.acls = acls
+        self.disabled_commands = frozenset(self.config.get('disabled_commands', []))
+
+        ratelimit = self.config.get('ratelimit', {})
+        self.ratelimit = RateLimit(
+            ratelimit.get('tokens', 17.5),
+            ratelimit.get('restore_rate', 2.5),
+            ratelimit.get('message_cost', 5),
+            ratelimit.get('strict', True),
+        )
+
+        # The top level settings limit each user, the other levels are only limited if they are configured
+        limits = [("user", Limit(self.ratelimit.tokens, self.ratelimit.restore_rate, self.ratelimit.message_cost))]
+        for level in LEVELS[1:]:
+            level_config = ratelimit.get(level)
+            if level_config:
+                limits.append((level, Limit(
+                    level_config.get('tokens', self.ratelimit.tokens),
+                    level_config.get('restore_rate', self.ratelimit.restore_rate),
+                    level_config.get('message_cost', self.ratelimit.message_cost),
+                )))
+
+        self.limits = tuple(limits)
+
+    def is_allowed_in(self, hook_name, chan):
+        """
+        Checks the ACL for a hook against a channel
+        :param hook_name: The function name of the hook
+        :param chan: The channel the hook was triggered in
+        :type hook_name: str
+        :type chan: str
+        :rtype: bool
+        """
+        acl = self.acls.get(hook_name)
+        if acl is None:
+            return True
+
+        chan = chan.lower()
+        if acl.deny_except is not None and chan not in acl.deny_except:
+            return False
+
+        if acl.allow_except is not None and chan in acl.allow_except:
+            return False
+
+        return True
@@ -0,0 +1,98 @@
+"""
+A coroutine friendly interface to the bot's database
+
+Coroutine hooks can use `bot.async_db` to run single statements without taking a `db` session argument, for example
+`rows = yield from bot.async_db.fetch(table.select())`. Each statement runs on a free DatabaseWorkerPool worker using a
+connection from the engine's pool, so no new threads are created and no session is kept open between statements.
+
+A hook which also takes `db` already holds a worker, so its statements run on that worker rather than waiting for a
+second one, which could never come if the hook held the last free worker.
+"""
+
+import asyncio
+from functools import lru_cache
+
+from sqlalchemy import text
+from sqlalchemy.util import LRUCache
+
+
+@lru_cache(maxsize=256)
+def _text(query):
+    """
+    Caches the TextClause for a plain SQL string, so repeated queries reuse their compiled form
+    :type query: str
+    :rtype: sqlalchemy.sql.elements.TextClause
+    """
+    return text(query)
+
+
+class AsyncDatabase:
+    """
+    :type engine: sqlalchemy.engine.Engine
+    :type pool: cloudbot.util.db_pool.DatabaseWorkerPool
+    """
+
+    def __init__(self, engine, pool, statement_cache_size=500):
+        """
+        :param engine: The engine to run statements on
+        :param pool: The worker pool to run statements in
+        :param statement_cache_size: How many compiled statements to keep
+        :type engine: sqlalchemy.engine.Engine
+        :type pool: cloudbot.util.db_pool.DatabaseWorkerPool
+        :type statement_cache_size: int
+        """
+        # Compiled statements are cached, so queries built once at the module level are only compiled once
+        self.engine = engine.execution_options(compiled_cache=LRUCache(statement_cache_size))
+        self.pool = pool
+
+    @staticmethod
+    def _prepare(query):
+        if isinstance(query, str):
+            return _text(query)
+
+        return query
+
+    def _fetch(self, query, params, one):
+        with self.engine.connect() as conn:
+            result = conn.execute(query, params) if params else conn.execute(query)
+            if one:
+                row = result.fetchone()
+                result.close()
+                return row
+
+            return result.fetchall()
+
+    def _execute(self, query, params):
+        with self.engine.begin() as conn:
+            result = conn.execute(query, params) if params else conn.execute(query)
+            return result.rowcount
+
+    @asyncio.coroutine
+    def fetch(self, query, **params):
+        """
+        Runs a query and returns all of its rows
+        :param query: The SQLAlchemy statement or SQL string to run
+        :param params: Bound parameters for the query
+        :rtype: list
+        """
+        return (yield from self.pool.run(self._fetch, self._prepare(query), params, False))
+
+    @asyncio.coroutine
+    def fetchone(self, query, **params):
+        """
+        Runs a query and returns its first row, or None if there are no rows
+        :param query: The SQLAlchemy statement or SQL string to run
+        :param params: Bound parameters for the query
+        """
+        return (yield from self.pool.run(self._fetch, self._prepare(query), params, True))
+
+    @asyncio.coroutine
+    def execute(self, query, **params):
+        """
+        Runs a statement in its own transaction, committing it if it succeeds
+        :param query: The SQLAlchemy statement or SQL string to run
+        :param params: Bound parameters for the statement
+        :return: The number of rows matched by the statement
+        :rtype: int
+        """
+        return (yield from self.pool.run(self._execute, self._prepare(query), params))
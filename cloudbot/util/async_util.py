@@ -26,12 +26,12 @@ def wrap_future(fut, *, loop=None):
 
 
 @asyncio.coroutine
-def run_func(loop, func, *args, **kwargs):
+def run_func(loop, func, *args, executor=None, **kwargs):
     part = partial(func, *args, **kwargs)
     if asyncio.iscoroutine(func) or asyncio.iscoroutinefunction(func):
         return (yield from part())
     else:
-        return (yield from loop.run_in_executor(None, part))
+        return (yield from loop.run_in_executor(executor, part))
 
 
 @asyncio.coroutine
@@ -62,6 +62,18 @@ def run_coroutine_threadsafe(coro, loop):
         asyncio.run_coroutine_threadsafe(coro, loop)
 
 
+def current_task(loop=None):
+    """
+    Gets the task currently running in a loop, or None if called outside of a task
+    :type loop: asyncio.AbstractEventLoop
+    :rtype: asyncio.Task | None
+    """
+    if sys.version_info < (3, 7, 0):
+        return asyncio.Task.current_task(loop=loop)
+
+    return asyncio.current_task(loop=loop)
+
+
 def create_future(loop=None):
     if loop is None:
         loop = asyncio.get_event_loop()
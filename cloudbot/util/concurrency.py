@@ -0,0 +1,283 @@
+"""
+Bounded concurrency for hooks
+
+A ConcurrencyLimit lets a fixed number of invocations run at once, and holds the rest in a wait queue which can also be
+bounded. When the queue is full, either the new invocation or the one which has waited longest is shed.
+
+A QueueWorker runs one invocation at a time from a single long-lived coroutine, optionally handing it several queued
+items at once. It is used for singlethread hooks.
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+from cloudbot.util import async_util
+
+logger = logging.getLogger("cloudbot")
+
+
+class ConcurrencyLimit:
+    """
+    :type limit: int
+    :type max_queue: int | None
+    :type drop_oldest: bool
+    :type running: int
+    :type shed_newest: int
+    :type shed_oldest: int
+    :type max_queue_depth: int
+    """
+
+    def __init__(self, loop, limit, max_queue=None, drop_oldest=False):
+        """
+        :param loop: The event loop the limit is used from
+        :param limit: How many invocations may run at once
+        :param max_queue: How many invocations may wait for a free slot, or None for no limit
+        :param drop_oldest: Whether to shed the longest waiting invocation instead of the new one when the queue is full
+        :type loop: asyncio.AbstractEventLoop
+        :type limit: int
+        :type max_queue: int | None
+        :type drop_oldest: bool
+        """
+        self.loop = loop
+        self.limit = limit
+        self.max_queue = max_queue
+        self.drop_oldest = drop_oldest
+
+        self.running = 0
+        self._waiters = deque()
+
+        # counters
+        self.shed_newest = 0
+        self.shed_oldest = 0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self):
+        """
+        :rtype: int
+        """
+        return len(self._waiters)
+
+    @property
+    def shed(self):
+        """
+        The total number of invocations dropped because the queue was full
+        :rtype: int
+        """
+        return self.shed_newest + self.shed_oldest
+
+    @asyncio.coroutine
+    def acquire(self):
+        """
+        Waits for a free slot
+        :return: True if the caller may run and must call release() after, False if it was shed
+        :rtype: bool
+        """
+        if self.running < self.limit and not self._waiters:
+            self.running += 1
+            return True
+
+        if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+            if not self.drop_oldest or not self._drop_oldest():
+                self.shed_newest += 1
+                return False
+
+            self.shed_oldest += 1
+
+        waiter = async_util.create_future(self.loop)
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            return (yield from waiter)
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled() and waiter.result():
+                # we were handed a slot, pass it on
+                self.release()
+
+            raise
+
+    def _drop_oldest(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(False)
+                return True
+
+        return False
+
+    def release(self):
+        """
+        Frees a slot, handing it straight to the next waiter if there is one
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # the slot passes to the waiter, so running stays the same
+                waiter.set_result(True)
+                return
+
+        self.running -= 1
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'limit': self.limit,
+            'running': self.running,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'shed_newest': self.shed_newest,
+            'shed_oldest': self.shed_oldest,
+        }
+
+
+class QueueWorker:
+    """
+    :type max_queue: int | None
+    :type drop_oldest: bool
+    :type batch_size: int | None
+    :type processed: int
+    :type batches: int
+    :type shed_newest: int
+    :type shed_oldest: int
+    :type max_queue_depth: int
+    """
+
+    def __init__(self, loop, handler, max_queue=None, drop_oldest=False, batch_size=None, on_shed=None):
+        """
+        :param loop: The event loop to run the worker in
+        :param handler: The coroutine function to call with each item, or with a list of items if batch_size is set
+        :param max_queue: How many items may wait to be handled, or None for no limit
+        :param drop_oldest: Whether to shed the longest waiting item instead of the new one when the queue is full
+        :param batch_size: The most items to pass to handler at once, or None to pass them one at a time
+        :param on_shed: A function called with each item dropped by drop_oldest
+        :type loop: asyncio.AbstractEventLoop
+        :type max_queue: int | None
+        :type drop_oldest: bool
+        :type batch_size: int | None
+        """
+        self.loop = loop
+        self.handler = handler
+        self.max_queue = max_queue
+        self.drop_oldest = drop_oldest
+        self.batch_size = batch_size
+        self.on_shed = on_shed
+
+        self._queue = deque()
+        # only set while the worker is waiting for items, so there's no allocation per item
+        self._wakeup = None
+        self._stopping = False
+        self._task = None
+
+        # counters
+        self.processed = 0
+        self.batches = 0
+        self.shed_newest = 0
+        self.shed_oldest = 0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self):
+        """
+        :rtype: int
+        """
+        return len(self._queue)
+
+    @property
+    def shed(self):
+        """
+        :rtype: int
+        """
+        return self.shed_newest + self.shed_oldest
+
+    def submit(self, item):
+        """
+        Queues an item for the worker, starting it if needed
+        :return: False if the item was shed because the queue was full
+        :rtype: bool
+        """
+        if self._stopping:
+            return False
+
+        if self.max_queue is not None and len(self._queue) >= self.max_queue:
+            if not self.drop_oldest or not self._queue:
+                self.shed_newest += 1
+                return False
+
+            dropped = self._queue.popleft()
+            self.shed_oldest += 1
+            if self.on_shed is not None:
+                self.on_shed(dropped)
+
+        self._queue.append(item)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+        if self._task is None:
+            self._task = async_util.wrap_future(self._run(), loop=self.loop)
+        elif self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+        return True
+
+    def _next_batch(self):
+        if self.batch_size is None:
+            return self._queue.popleft()
+
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+
+        return batch
+
+    @asyncio.coroutine
+    def _run(self):
+        while True:
+            while self._queue:
+                items = self._next_batch()
+                self.batches += 1
+                self.processed += 1 if self.batch_size is None else len(items)
+                try:
+                    yield from self.handler(items)
+                except Exception:
+                    # keep the worker alive for the rest of the queue
+                    logger.exception("Error in queue worker handler %r", self.handler)
+
+            if self._stopping:
+                return
+
+            self._wakeup = async_util.create_future(self.loop)
+            try:
+                yield from self._wakeup
+            finally:
+                self._wakeup = None
+
+    @asyncio.coroutine
+    def stop(self):
+        """
+        Stops accepting items, and waits for the queued items to be handled
+        """
+        self._stopping = True
+        if self._task is None:
+            return
+
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+        yield from self._task
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'processed': self.processed,
+            'batches': self.batches,
+            'shed_newest': self.shed_newest,
+            'shed_oldest': self.shed_oldest,
+        }
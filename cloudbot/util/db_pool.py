@@ -0,0 +1,193 @@
+"""
+A bounded pool of long-lived database worker threads for coroutine hooks
+
+SQLAlchemy sessions, and SQLite connections in particular, must only be used from the thread they were created on. A
+coroutine hook that takes `db` checks out one of these workers for as long as it runs. All of its database calls go
+through that worker's thread, which keeps its scoped session between checkouts.
+
+A checked out worker is bound to the task that checked it out, and run() calls from that task use it instead of waiting
+for another worker. Without this, a hook holding the last free worker would wait on itself forever.
+"""
+
+import asyncio
+import concurrent.futures
+import time
+from collections import deque
+from functools import partial
+
+from cloudbot.util import async_util
+
+
+class DatabaseWorkerPool:
+    """
+    :type loop: asyncio.AbstractEventLoop
+    :type size: int
+    :type checkouts: int
+    :type total_checkout_time: float
+    :type max_checkout_time: float
+    :type max_queue_depth: int
+    """
+
+    def __init__(self, loop, session, size=8):
+        """
+        :param loop: The event loop the pool is used from
+        :param session: The scoped session factory, called on a worker thread to get that thread's session
+        :param size: The maximum number of worker threads
+        :type loop: asyncio.AbstractEventLoop
+        :type session: sqlalchemy.orm.scoping.scoped_session
+        :type size: int
+        """
+        self.loop = loop
+        self.size = size
+        self._session = session
+        # ThreadPoolExecutor only starts its thread on the first submit, so unused workers don't cost a thread
+        self._workers = [concurrent.futures.ThreadPoolExecutor(1) for _ in range(size)]
+        self._idle = deque(self._workers)
+        self._waiters = deque()
+        # task -> the worker it holds, see bind()
+        self._task_workers = {}
+
+        # gauges
+        self.checkouts = 0
+        self.total_checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self):
+        """
+        The number of hooks currently waiting for a free worker
+        :rtype: int
+        """
+        return len(self._waiters)
+
+    @property
+    def in_use(self):
+        """
+        The number of workers currently checked out
+        :rtype: int
+        """
+        return self.size - len(self._idle)
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'size': self.size,
+            'in_use': self.in_use,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'checkouts': self.checkouts,
+            'avg_checkout_time': self.total_checkout_time / self.checkouts if self.checkouts else 0.0,
+            'max_checkout_time': self.max_checkout_time,
+        }
+
+    @asyncio.coroutine
+    def _get_worker(self):
+        if self._idle and not self._waiters:
+            return self._idle.popleft()
+
+        waiter = async_util.create_future(self.loop)
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            return (yield from waiter)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # we were handed a worker just before being cancelled, pass it on
+                self._put_worker(waiter.result())
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+            raise
+
+    def _put_worker(self, worker):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+
+        self._idle.append(worker)
+
+    def bind(self, worker):
+        """
+        Binds a checked out worker to the current task, so run() calls from the task use it
+        :type worker: concurrent.futures.ThreadPoolExecutor
+        """
+        task = async_util.current_task(self.loop)
+        if task is not None:
+            self._task_workers[task] = worker
+
+    def unbind(self):
+        """
+        Removes the worker bound to the current task, if any
+        """
+        self._task_workers.pop(async_util.current_task(self.loop), None)
+
+    @asyncio.coroutine
+    def run(self, func, *args):
+        """
+        Runs a function on a free worker, without checking out a session
+
+        If the current task already holds a worker, the function runs on that worker instead.
+        :param func: The function to run
+        :param args: The arguments to pass to func
+        :return: The return value of func
+        """
+        worker = self._task_workers.get(async_util.current_task(self.loop))
+        if worker is not None:
+            return (yield from self.loop.run_in_executor(worker, partial(func, *args)))
+
+        worker = yield from self._get_worker()
+        try:
+            return (yield from self.loop.run_in_executor(worker, partial(func, *args)))
+        finally:
+            self._put_worker(worker)
+
+    @asyncio.coroutine
+    def checkout(self):
+        """
+        Waits for a free worker and gets its session, binding the worker to the current task
+        :return: A tuple of (worker, session). All use of the session must happen on the worker, and both must be
+                 passed back to release() when done
+        :rtype: (concurrent.futures.ThreadPoolExecutor, sqlalchemy.orm.Session)
+        """
+        start = time.perf_counter()
+        worker = yield from self._get_worker()
+        try:
+            session = yield from self.loop.run_in_executor(worker, self._session)
+        except BaseException:
+            self._put_worker(worker)
+            raise
+
+        self.bind(worker)
+        checkout_time = time.perf_counter() - start
+        self.checkouts += 1
+        self.total_checkout_time += checkout_time
+        self.max_checkout_time = max(self.max_checkout_time, checkout_time)
+        return worker, session
+
+    @asyncio.coroutine
+    def release(self, worker, session):
+        """
+        Closes a session on its worker, and returns the worker to the pool
+        :type worker: concurrent.futures.ThreadPoolExecutor
+        :type session: sqlalchemy.orm.Session
+        """
+        self.unbind()
+        try:
+            yield from self.loop.run_in_executor(worker, session.close)
+        finally:
+            self._put_worker(worker)
+
+    def shutdown(self):
+        """
+        Stops all worker threads, without waiting for running calls to finish
+        """
+        for worker in self._workers:
+            worker.shutdown(wait=False)
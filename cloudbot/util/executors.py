@@ -0,0 +1,155 @@
+"""
+Named thread pools for threaded hooks and other blocking calls
+
+Each pool is a ThreadPoolExecutor that also records how many calls are waiting for a thread and how long they waited,
+so a slow set of hooks can be given their own pool instead of starving every other threaded hook.
+"""
+
+import concurrent.futures
+import logging
+import os
+import time
+from functools import partial
+from threading import Lock
+
+logger = logging.getLogger("cloudbot")
+
+DEFAULT_POOL = "io"
+
+DEFAULT_SIZES = {
+    # network calls and most threaded hooks
+    "io": 16,
+    # slow HTTP hooks, like link titles and lastfm, kept apart so they can't take every thread in "io"
+    "web": 8,
+    # threaded hooks which take a database session. These shared the default pool before, so this is the same size
+    # as "io" to avoid queueing them behind each other; lower it along with "database_pool_size" on a small server
+    "db": 16,
+    # hooks which mostly compute, more threads than cores doesn't help them
+    "cpu": os.cpu_count() or 1,
+}
+
+
+class TrackedExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    :type name: str
+    :type size: int
+    :type submitted: int
+    :type started: int
+    :type completed: int
+    :type total_wait: float
+    :type max_wait: float
+    :type total_run: float
+    """
+
+    def __init__(self, name, size):
+        """
+        :type name: str
+        :type size: int
+        """
+        super().__init__(size)
+        self.name = name
+        self.size = size
+
+        self._stats_lock = Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _run_tracked(self, submit_time, fn, *args, **kwargs):
+        start = time.perf_counter()
+        wait = start - submit_time
+        with self._stats_lock:
+            self.started += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            run_time = time.perf_counter() - start
+            with self._stats_lock:
+                self.completed += 1
+                self.total_run += run_time
+
+    def submit(self, fn, *args, **kwargs):
+        with self._stats_lock:
+            self.submitted += 1
+
+        return super().submit(partial(self._run_tracked, time.perf_counter(), fn), *args, **kwargs)
+
+    @property
+    def queue_length(self):
+        """
+        The number of calls waiting for a free thread
+        :rtype: int
+        """
+        return self.submitted - self.started
+
+    @property
+    def running(self):
+        """
+        The number of calls currently running
+        :rtype: int
+        """
+        return self.started - self.completed
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        with self._stats_lock:
+            return {
+                'size': self.size,
+                'queue_length': self.submitted - self.started,
+                'running': self.started - self.completed,
+                'completed': self.completed,
+                'avg_wait': self.total_wait / self.started if self.started else 0.0,
+                'max_wait': self.max_wait,
+                'avg_run': self.total_run / self.completed if self.completed else 0.0,
+            }
+
+
+class ExecutorRegistry:
+    """
+    The named thread pools owned by the bot
+
+    :type executors: dict[str, TrackedExecutor]
+    """
+
+    def __init__(self, sizes=None):
+        """
+        :param sizes: Pool names mapped to their number of threads, merged over DEFAULT_SIZES
+        :type sizes: dict[str, int]
+        """
+        _sizes = dict(DEFAULT_SIZES)
+        if sizes:
+            _sizes.update(sizes)
+
+        self.executors = {name: TrackedExecutor(name, size) for name, size in _sizes.items()}
+
+    def __contains__(self, name):
+        return name in self.executors
+
+    def get(self, name):
+        """
+        Gets a pool by name, falling back to the default pool if it doesn't exist
+        :type name: str
+        :rtype: TrackedExecutor
+        """
+        try:
+            return self.executors[name]
+        except KeyError:
+            return self.executors[DEFAULT_POOL]
+
+    def stats(self):
+        """
+        :rtype: dict[str, dict]
+        """
+        return {name: executor.stats() for name, executor in self.executors.items()}
+
+    def shutdown(self, wait=True):
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
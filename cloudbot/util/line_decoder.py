@@ -0,0 +1,98 @@
+"""
+Line decoding for incoming IRC data
+
+Most lines are plain ASCII or UTF-8, but some clients still send a legacy 8-bit encoding. LineDecoder remembers which
+senders have sent non-UTF-8 lines, so their later lines can be decoded without first failing to decode as UTF-8.
+"""
+
+import re
+from collections import OrderedDict
+
+_non_ascii_re = re.compile(b'[\x80-\xff]')
+
+# A UTF-8 lead byte followed by a continuation byte, which is very unlikely in legacy 8-bit text
+_utf8_sequence_re = re.compile(b'[\xc2-\xf4][\x80-\xbf]')
+
+
+def get_sender(line_data):
+    """
+    Gets the raw prefix nick from a line, without fully parsing it
+    :type line_data: bytes | bytearray
+    :rtype: bytes | None
+    """
+    start = 0
+    if line_data[:1] == b'@':
+        # skip IRCv3 message tags
+        start = line_data.find(b' ') + 1
+        if not start:
+            return None
+
+    if line_data[start:start + 1] != b':':
+        return None
+
+    end = line_data.find(b' ', start)
+    if end < 0:
+        end = len(line_data)
+
+    nick_end = line_data.find(b'!', start, end)
+    if nick_end >= 0:
+        end = nick_end
+
+    return bytes(line_data[start + 1:end])
+
+
+class LineDecoder:
+    """
+    Decodes lines from a single connection, keeping track of senders that use the fallback encoding
+
+    :type fallback: str
+    :type per_sender: bool
+    :type max_senders: int
+    """
+
+    def __init__(self, fallback='iso-8859-1', per_sender=True, max_senders=1024):
+        """
+        :param fallback: The encoding to use for lines which aren't valid UTF-8
+        :param per_sender: Whether to track the encoding for each sender, rather than for the whole connection
+        :param max_senders: The maximum number of fallback senders to remember
+        :type fallback: str
+        :type per_sender: bool
+        :type max_senders: int
+        """
+        self.fallback = fallback
+        self.per_sender = per_sender
+        self.max_senders = max_senders
+        self._fallback_senders = OrderedDict()
+
+    def _remember(self, sender):
+        senders = self._fallback_senders
+        if sender in senders:
+            senders.move_to_end(sender)
+        else:
+            senders[sender] = True
+            if len(senders) > self.max_senders:
+                senders.popitem(last=False)
+
+    def decode(self, line_data):
+        """
+        :type line_data: bytes | bytearray
+        :rtype: str
+        """
+        if not _non_ascii_re.search(line_data):
+            # Plain ASCII, no need to guess
+            return line_data.decode('ascii')
+
+        sender = get_sender(line_data) if self.per_sender else None
+        if sender in self._fallback_senders and not _utf8_sequence_re.search(line_data):
+            # This sender has used the fallback encoding before, and this line doesn't look like UTF-8
+            self._fallback_senders.move_to_end(sender)
+            return line_data.decode(self.fallback, 'replace')
+
+        try:
+            text = line_data.decode('utf-8')
+        except UnicodeDecodeError:
+            self._remember(sender)
+            return line_data.decode(self.fallback, 'replace')
+
+        self._fallback_senders.pop(sender, None)
+        return text
@@ -0,0 +1,191 @@
+"""
+ratelimit.py
+
+Hierarchical token bucket rate limiting, used by the core sieve to limit commands per user, channel, network and hook.
+
+Buckets are only created when a key is first seen, and are expired lazily: each bucket sits in one slot of a timing
+wheel, and the slots which have passed are cleared whenever the limiter is used, so no full scan of the buckets is
+ever needed.
+"""
+
+from collections import namedtuple
+from time import time
+
+# The levels a limit can apply to, from most to least specific
+LEVELS = ("user", "channel", "network", "hook")
+
+Limit = namedtuple('Limit', 'capacity fill_rate cost')
+
+
+class Bucket:
+    """
+    A single token bucket, the capacity and fill rate come from the Limit it's checked against
+
+    :type tokens: float
+    :type timestamp: float
+    :type slot: int
+    """
+
+    __slots__ = ('tokens', 'timestamp', 'slot')
+
+    def __init__(self, tokens, timestamp):
+        self.tokens = tokens
+        self.timestamp = timestamp
+        self.slot = None
+
+    def refill(self, limit, now):
+        """
+        :type limit: Limit
+        :type now: float
+        """
+        if self.tokens < limit.capacity:
+            self.tokens = min(limit.capacity, self.tokens + (limit.fill_rate * (now - self.timestamp)))
+
+        self.timestamp = now
+
+
+class RateLimiter:
+    """
+    :type ttl: float
+    :type resolution: float
+    :type buckets: dict[tuple[str, str], Bucket]
+    :type wheel: list[set[tuple[str, str]]]
+    :type refused: dict[str, int]
+    :type expired: int
+    """
+
+    def __init__(self, ttl=600, resolution=10):
+        """
+        :param ttl: How long, in seconds, an unused bucket is kept for
+        :param resolution: The width of each slot in the timing wheel, in seconds
+        :type ttl: float
+        :type resolution: float
+        """
+        self.ttl = ttl
+        self.resolution = resolution
+        self.buckets = {}
+        self.wheel = [set() for _ in range(int(ttl // resolution) + 2)]
+        self._tick = None
+        self.refused = dict.fromkeys(LEVELS, 0)
+        self.expired = 0
+
+    def _slot_for(self, timestamp):
+        return int(timestamp // self.resolution)
+
+    def _schedule(self, key, bucket):
+        tick = self._slot_for(bucket.timestamp + self.ttl)
+        if bucket.slot == tick:
+            return
+
+        if bucket.slot is not None:
+            self.wheel[bucket.slot % len(self.wheel)].discard(key)
+
+        bucket.slot = tick
+        self.wheel[tick % len(self.wheel)].add(key)
+
+    def expire(self, now=None):
+        """
+        Removes the buckets in every slot of the wheel which has passed since the last call
+        :type now: float
+        """
+        if now is None:
+            now = time()
+
+        tick = self._slot_for(now)
+        if self._tick is None:
+            self._tick = tick
+            return
+
+        # Never walk the wheel more than once around
+        start = max(self._tick, tick - len(self.wheel))
+        for _tick in range(start, tick):
+            slot = self.wheel[_tick % len(self.wheel)]
+            for key in slot:
+                del self.buckets[key]
+
+            self.expired += len(slot)
+            slot.clear()
+
+        self._tick = tick
+
+    def _get_bucket(self, level, key, limit, now):
+        bucket_key = (level, key)
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self.buckets[bucket_key] = Bucket(float(limit.capacity), now)
+        else:
+            bucket.refill(limit, now)
+
+        return bucket_key, bucket
+
+    def consume(self, limits, now=None):
+        """
+        Takes tokens from the bucket for each level, only if every level has enough tokens
+        :param limits: (level, key, limit) for each level to check
+        :return: None if allowed, otherwise the first level which didn't have enough tokens
+        :type limits: collections.Iterable[tuple[str, str, Limit]]
+        :type now: float
+        :rtype: str | None
+        """
+        if now is None:
+            now = time()
+
+        self.expire(now)
+
+        checked = []
+        refused = None
+        for level, key, limit in limits:
+            bucket_key, bucket = self._get_bucket(level, key, limit, now)
+            self._schedule(bucket_key, bucket)
+            if refused is None and bucket.tokens < limit.cost:
+                refused = level
+
+            checked.append((bucket, limit))
+
+        if refused is not None:
+            self.refused[refused] += 1
+            return refused
+
+        for bucket, limit in checked:
+            bucket.tokens -= limit.cost
+
+        return None
+
+    def empty(self, level, key):
+        """
+        Sets the tokens for a bucket to zero
+        :type level: str
+        :type key: str
+        """
+        bucket = self.buckets.get((level, key))
+        if bucket is not None:
+            bucket.tokens = 0.0
+
+    def get_tokens(self, level, key, limit, now=None):
+        """
+        :return: The current tokens for a bucket, or None if it isn't being tracked
+        :type level: str
+        :type key: str
+        :type limit: Limit
+        :type now: float
+        :rtype: float | None
+        """
+        if now is None:
+            now = time()
+
+        bucket = self.buckets.get((level, key))
+        if bucket is None:
+            return None
+
+        bucket.refill(limit, now)
+        return bucket.tokens
+
+    def stats(self):
+        """
+        :rtype: dict[str, int]
+        """
+        counts = dict.fromkeys(LEVELS, 0)
+        for level, _ in self.buckets:
+            counts[level] += 1
+
+        return counts
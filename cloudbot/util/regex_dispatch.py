@@ -0,0 +1,212 @@
+"""
+Regex dispatch - Pre-filters regex hooks using literal strings extracted from their patterns
+
+Most lines of chat don't match any regex hook, so before running a pattern we check whether the text contains at least
+one of the literal strings that every match of that pattern must contain. Patterns we can't extract literals from are
+always run.
+"""
+
+import re
+import sys
+
+if sys.version_info < (3, 11):
+    import sre_parse
+else:
+    from re import _parser as sre_parse
+
+# With re.IGNORECASE these characters also match non-ASCII characters that `str.lower()` doesn't map back to them,
+# so they can't be used when comparing against lower-cased text
+_UNSAFE_IGNORECASE_CHARS = frozenset("iIsS")
+
+_REPEAT_OPS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEAT_OPS.add(sre_parse.POSSESSIVE_REPEAT)
+
+
+def _best(first, second):
+    """
+    Picks the more selective of two sets of literals, preferring longer strings
+    :type first: frozenset[str] | None
+    :type second: frozenset[str] | None
+    :rtype: frozenset[str] | None
+    """
+    if first is None:
+        return second
+
+    if second is None:
+        return first
+
+    first_key = (min(map(len, first)), -len(first))
+    second_key = (min(map(len, second)), -len(second))
+    return second if second_key > first_key else first
+
+
+def _extract(parsed, ignorecase):
+    """
+    Finds a set of strings, at least one of which must be in any text matched by the parsed pattern
+    :type parsed: sre_parse.SubPattern | list
+    :type ignorecase: bool
+    :rtype: frozenset[str] | None
+    """
+    best = None
+    run = []
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            char = chr(av)
+            if not ignorecase:
+                run.append(char)
+                continue
+
+            if ord(char) < 128 and char not in _UNSAFE_IGNORECASE_CHARS:
+                run.append(char.lower())
+                continue
+
+        if run:
+            best = _best(best, frozenset(("".join(run),)))
+            run = []
+
+        found = None
+        if op is sre_parse.SUBPATTERN:
+            sub_ignorecase = ignorecase
+            if len(av) == 4:
+                # (group, add_flags, del_flags, pattern) on 3.6+
+                if av[1] & sre_parse.SRE_FLAG_IGNORECASE:
+                    sub_ignorecase = True
+                elif av[2] & sre_parse.SRE_FLAG_IGNORECASE:
+                    sub_ignorecase = False
+
+            found = _extract(av[-1], sub_ignorecase)
+        elif op is sre_parse.BRANCH:
+            branches = [_extract(branch, ignorecase) for branch in av[1]]
+            if all(branches):
+                found = frozenset().union(*branches)
+        elif op in _REPEAT_OPS:
+            min_count, _, item = av
+            if min_count >= 1:
+                found = _extract(item, ignorecase)
+        elif getattr(sre_parse, "ATOMIC_GROUP", None) is op:
+            found = _extract(av, ignorecase)
+
+        best = _best(best, found)
+
+    if run:
+        best = _best(best, frozenset(("".join(run),)))
+
+    return best
+
+
+def required_literals(regex):
+    """
+    Extracts the literal strings from a regex which any match must contain at least one of
+    :param regex: The compiled regex
+    :return: A tuple of (literals, ignorecase), literals will be None if no literals could be extracted. If ignorecase
+             is True, the literals are lower-case and should be checked against lower-cased text.
+    :type regex: re.__Regex
+    :rtype: (frozenset[str] | None, bool)
+    """
+    pattern = getattr(regex, "pattern", None)
+    if not isinstance(pattern, str):
+        return None, False
+
+    try:
+        parsed = sre_parse.parse(pattern, regex.flags)
+    except Exception:
+        return None, False
+
+    # regex.flags includes any global inline flags, eg. (?i)
+    ignorecase = bool(regex.flags & re.IGNORECASE)
+    literals = _extract(parsed, ignorecase)
+    if literals is not None and not all(literals):
+        literals = None
+
+    return literals, ignorecase
+
+
+class RegexDispatcher:
+    """
+    A list-like container of (regex, hook) pairs which can skip pairs whose regex can't possibly match a given text
+
+    Pairs are kept in the order they were added (or sorted to), and `candidates()` preserves that order.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._literals = frozenset()
+        self._ignorecase_literals = frozenset()
+
+    def _update_literals(self):
+        literals = set()
+        ignorecase_literals = set()
+        for _, _, entry_literals, ignorecase in self._entries:
+            if entry_literals is None:
+                continue
+
+            if ignorecase:
+                ignorecase_literals.update(entry_literals)
+            else:
+                literals.update(entry_literals)
+
+        self._literals = frozenset(literals)
+        self._ignorecase_literals = frozenset(ignorecase_literals)
+
+    def append(self, pair):
+        """
+        :type pair: (re.__Regex, cloudbot.plugin.RegexHook)
+        """
+        regex, hook = pair
+        literals, ignorecase = required_literals(regex)
+        self._entries.append((regex, hook, literals, ignorecase))
+        self._update_literals()
+
+    def remove(self, pair):
+        """
+        :type pair: (re.__Regex, cloudbot.plugin.RegexHook)
+        """
+        for i, entry in enumerate(self._entries):
+            if entry[:2] == pair:
+                del self._entries[i]
+                break
+        else:
+            raise ValueError("{!r} not in RegexDispatcher".format(pair))
+
+        self._update_literals()
+
+    def sort(self, *, key=None, reverse=False):
+        """
+        Sorts the (regex, hook) pairs, `key` is called with each pair as for list.sort()
+        """
+        if key is None:
+            def entry_key(entry):
+                return entry[:2]
+        else:
+            def entry_key(entry):
+                return key(entry[:2])
+
+        self._entries.sort(key=entry_key, reverse=reverse)
+
+    def candidates(self, text):
+        """
+        Yields every (regex, hook) pair which may match the text, in order
+        :type text: str
+        :rtype: collections.Iterable[(re.__Regex, cloudbot.plugin.RegexHook)]
+        """
+        hits = {literal for literal in self._literals if literal in text}
+        if self._ignorecase_literals:
+            lowered = text.lower()
+            ignorecase_hits = {literal for literal in self._ignorecase_literals if literal in lowered}
+        else:
+            ignorecase_hits = set()
+
+        for regex, hook, literals, ignorecase in self._entries:
+            if literals is None or not literals.isdisjoint(ignorecase_hits if ignorecase else hits):
+                yield regex, hook
+
+    def __iter__(self):
+        return ((regex, hook) for regex, hook, _, _ in self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
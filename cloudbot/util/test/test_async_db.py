@@ -0,0 +1,78 @@
+import asyncio
+
+from sqlalchemy import create_engine, Table, Column, String, Integer, MetaData
+
+from cloudbot.util.async_db import AsyncDatabase
+from cloudbot.util.db_pool import DatabaseWorkerPool
+
+metadata = MetaData()
+
+table = Table(
+    'test',
+    metadata,
+    Column('name', String),
+    Column('value', Integer),
+)
+
+
+def test_async_db(tmpdir):
+    loop = asyncio.new_event_loop()
+    engine = create_engine('sqlite:///' + str(tmpdir.join('test.db')))
+    metadata.create_all(engine)
+    pool = DatabaseWorkerPool(loop, None, 2)
+    db = AsyncDatabase(engine, pool)
+
+    @asyncio.coroutine
+    def run():
+        yield from db.execute(table.insert().values(name='foo', value=1))
+        yield from db.execute(table.insert().values(name='bar', value=2))
+        count = yield from db.execute(table.update().values(value=3).where(table.c.name == 'bar'))
+        rows = yield from db.fetch(table.select().order_by(table.c.name))
+        row = yield from db.fetchone("SELECT value FROM test WHERE name = :name", name='foo')
+        missing = yield from db.fetchone(table.select().where(table.c.name == 'baz'))
+        return count, rows, row, missing
+
+    try:
+        count, rows, row, missing = loop.run_until_complete(run())
+    finally:
+        pool.shutdown()
+        loop.close()
+
+    assert count == 1
+    assert [tuple(r) for r in rows] == [('bar', 3), ('foo', 1)]
+    assert row[0] == 1
+    assert missing is None
+
+
+class MockSession:
+    def close(self):
+        pass
+
+
+def test_async_db_in_db_hook(tmpdir):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    engine = create_engine('sqlite:///' + str(tmpdir.join('test.db')))
+    metadata.create_all(engine)
+    pool = DatabaseWorkerPool(loop, MockSession, 1)
+    db = AsyncDatabase(engine, pool)
+
+    @asyncio.coroutine
+    def run():
+        # like a coroutine hook taking db, which holds the only worker while it runs
+        worker, session = yield from pool.checkout()
+        try:
+            yield from db.execute(table.insert().values(name='foo', value=1))
+            return (yield from db.fetchone(table.select()))
+        finally:
+            yield from pool.release(worker, session)
+
+    try:
+        row = loop.run_until_complete(asyncio.wait_for(run(), 1))
+    finally:
+        pool.shutdown()
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    assert tuple(row) == ('foo', 1)
+    assert pool.in_use == 0
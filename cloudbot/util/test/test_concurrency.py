@@ -0,0 +1,154 @@
+import asyncio
+
+from cloudbot.util import async_util
+from cloudbot.util.concurrency import ConcurrencyLimit, QueueWorker
+
+
+def run_all(limit, count, delay=0.01):
+    loop = limit.loop
+    started = []
+
+    @asyncio.coroutine
+    def use(i):
+        if not (yield from limit.acquire()):
+            return False
+
+        try:
+            started.append(i)
+            assert limit.running <= limit.limit
+            yield from asyncio.sleep(delay)
+        finally:
+            limit.release()
+
+        return True
+
+    @asyncio.coroutine
+    def launch_all():
+        tasks = []
+        for i in range(count):
+            tasks.append(async_util.wrap_future(use(i)))
+            # let each task reach acquire() before the next is created
+            yield from asyncio.sleep(0)
+
+        return (yield from asyncio.gather(*tasks))
+
+    return loop.run_until_complete(launch_all()), started
+
+
+def make_limit(*args, **kwargs):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return ConcurrencyLimit(loop, *args, **kwargs)
+
+
+def close(limit):
+    limit.loop.close()
+    asyncio.set_event_loop(None)
+
+
+def test_unbounded_queue():
+    limit = make_limit(2)
+    try:
+        results, started = run_all(limit, 6)
+    finally:
+        close(limit)
+
+    assert all(results)
+    assert started == list(range(6))
+    assert limit.max_queue_depth == 4
+    assert limit.running == 0
+    assert limit.shed == 0
+
+
+def test_drop_newest():
+    limit = make_limit(1, max_queue=2)
+    try:
+        results, started = run_all(limit, 5)
+    finally:
+        close(limit)
+
+    assert results == [True, True, True, False, False]
+    assert started == [0, 1, 2]
+    assert limit.shed_newest == 2
+    assert limit.running == 0
+
+
+def test_drop_oldest():
+    limit = make_limit(1, max_queue=2, drop_oldest=True)
+    try:
+        results, started = run_all(limit, 5)
+    finally:
+        close(limit)
+
+    assert results == [True, False, False, True, True]
+    assert started == [0, 3, 4]
+    assert limit.shed_oldest == 2
+    assert limit.running == 0
+
+
+def run_worker(worker, items):
+    @asyncio.coroutine
+    def submit_all():
+        results = [worker.submit(item) for item in items]
+        yield from worker.stop()
+        return results
+
+    return worker.loop.run_until_complete(submit_all())
+
+
+def make_worker(**kwargs):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    handled = []
+
+    @asyncio.coroutine
+    def handler(item):
+        yield from asyncio.sleep(0)
+        handled.append(item)
+
+    return QueueWorker(loop, handler, **kwargs), handled
+
+
+def test_worker_order():
+    worker, handled = make_worker()
+    try:
+        assert all(run_worker(worker, range(5)))
+    finally:
+        close(worker)
+
+    assert handled == [0, 1, 2, 3, 4]
+    assert worker.batches == 5
+    assert not worker.submit(5)
+
+
+def test_worker_batch():
+    worker, handled = make_worker(batch_size=2)
+    try:
+        run_worker(worker, range(5))
+    finally:
+        close(worker)
+
+    assert handled == [[0, 1], [2, 3], [4]]
+    assert worker.processed == 5
+
+
+def test_worker_bounded():
+    dropped = []
+    worker, handled = make_worker(max_queue=2, drop_oldest=True, on_shed=dropped.append)
+    try:
+        assert all(run_worker(worker, range(5)))
+    finally:
+        close(worker)
+
+    assert handled == [3, 4]
+    assert dropped == [0, 1, 2]
+    assert worker.shed_oldest == 3
+
+    worker, handled = make_worker(max_queue=2)
+    try:
+        assert run_worker(worker, range(5)) == [True, True, False, False, False]
+    finally:
+        close(worker)
+
+    assert handled == [0, 1]
+    assert worker.shed_newest == 3
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+
+from cloudbot.util import async_util
+from cloudbot.util.db_pool import DatabaseWorkerPool
+
+
+class MockSession:
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.closed = 0
+
+    def close(self):
+        assert threading.current_thread() is self.thread
+        self.closed += 1
+
+
+def make_pool(loop, size):
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = MockSession()
+
+        return local.session
+
+    return DatabaseWorkerPool(loop, session, size)
+
+
+def test_session_reuse():
+    loop = asyncio.new_event_loop()
+    pool = make_pool(loop, 1)
+
+    @asyncio.coroutine
+    def run():
+        worker, session = yield from pool.checkout()
+        yield from pool.release(worker, session)
+        worker2, session2 = yield from pool.checkout()
+        yield from pool.release(worker2, session2)
+        return session, session2
+
+    try:
+        first, second = loop.run_until_complete(run())
+    finally:
+        pool.shutdown()
+        loop.close()
+
+    assert first is second
+    assert first.closed == 2
+    assert pool.checkouts == 2
+    assert pool.in_use == 0
+
+
+def test_bounded():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    pool = make_pool(loop, 2)
+    depths = []
+
+    @asyncio.coroutine
+    def use():
+        worker, session = yield from pool.checkout()
+        depths.append(pool.queue_depth)
+        yield from asyncio.sleep(0.01)
+        yield from pool.release(worker, session)
+        return session.thread
+
+    try:
+        threads = loop.run_until_complete(asyncio.gather(*[use() for _ in range(5)]))
+    finally:
+        pool.shutdown()
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    assert len(set(threads)) == 2
+    assert pool.max_queue_depth == 3
+    assert pool.queue_depth == 0
+    assert pool.in_use == 0
+    assert max(depths) <= 3
+
+
+def test_run_uses_held_worker():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    pool = make_pool(loop, 1)
+
+    @asyncio.coroutine
+    def run():
+        worker, session = yield from pool.checkout()
+        try:
+            # the only worker is held by this task, so this would time out if it needed a free one
+            thread = yield from pool.run(threading.current_thread)
+        finally:
+            yield from pool.release(worker, session)
+
+        return session.thread, thread
+
+    try:
+        session_thread, thread = loop.run_until_complete(asyncio.wait_for(run(), 1))
+    finally:
+        pool.shutdown()
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    assert session_thread is thread
+    assert pool.in_use == 0
+    assert not pool._task_workers
+
+
+class MockHook:
+    required_args = ["db"]
+    description = "test:hook"
+
+
+class MockBot:
+    def __init__(self, pool):
+        self.db_pool = pool
+
+
+def test_nested_event_shares_worker():
+    from cloudbot.event import Event
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    pool = make_pool(loop, 1)
+    event = Event(bot=MockBot(pool), hook=MockHook())
+
+    @asyncio.coroutine
+    def nested():
+        # like a perm hook launched in its own task with the outer hook's event
+        yield from event.prepare()
+        try:
+            db = event.db
+            yield from pool.run(lambda: None)
+        finally:
+            yield from event.close()
+
+        return db
+
+    @asyncio.coroutine
+    def run():
+        yield from event.prepare()
+        outer_db = event.db
+        try:
+            inner_db = yield from async_util.wrap_future(nested(), loop=loop)
+            assert event.db is outer_db
+            assert pool.in_use == 1
+        finally:
+            yield from event.close()
+
+        return outer_db, inner_db
+
+    try:
+        outer_db, inner_db = loop.run_until_complete(asyncio.wait_for(run(), 1))
+    finally:
+        pool.shutdown()
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    assert outer_db is inner_db
+    assert outer_db.closed == 1
+    assert event.db is None
+    assert pool.in_use == 0
+    assert pool.checkouts == 1
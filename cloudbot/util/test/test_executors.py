@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from cloudbot.util.executors import ExecutorRegistry, TrackedExecutor, DEFAULT_POOL, DEFAULT_SIZES
+
+
+def test_registry():
+    executors = ExecutorRegistry({"io": 2, "http": 3})
+    try:
+        assert executors.get("io").size == 2
+        assert executors.get("http").size == 3
+        assert "db" in executors
+        assert "missing" not in executors
+        assert executors.get("missing") is executors.get(DEFAULT_POOL)
+    finally:
+        executors.shutdown()
+
+
+def test_default_sizes():
+    executors = ExecutorRegistry()
+    try:
+        assert set(executors.executors) == {"io", "web", "db", "cpu"}
+        assert executors.get("web").size == DEFAULT_SIZES["web"]
+        # database hooks shouldn't get fewer threads than they had in the shared pool
+        assert executors.get("db").size >= executors.get("io").size
+        assert set(executors.stats()) == set(executors.executors)
+    finally:
+        executors.shutdown()
+
+
+def test_tracking():
+    executor = TrackedExecutor("test", 1)
+    event = threading.Event()
+    try:
+        first = executor.submit(event.wait)
+        second = executor.submit(lambda: 5)
+        assert executor.queue_length >= 1
+
+        event.set()
+        assert first.result(1)
+        assert second.result(1) == 5
+        stats = executor.stats()
+        assert stats['completed'] == 2
+        assert stats['queue_length'] == 0
+        assert stats['running'] == 0
+        assert stats['max_wait'] > 0
+    finally:
+        executor.shutdown()
+
+
+def test_run_in_executor():
+    loop = asyncio.new_event_loop()
+    executor = TrackedExecutor("test", 2)
+    try:
+        assert loop.run_until_complete(loop.run_in_executor(executor, sum, [1, 2])) == 3
+        assert executor.completed == 1
+    finally:
+        executor.shutdown()
+        loop.close()
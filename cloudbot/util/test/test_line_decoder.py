@@ -0,0 +1,48 @@
+from cloudbot.util.line_decoder import LineDecoder, get_sender
+
+
+def test_get_sender():
+    assert get_sender(b":nick!user@host PRIVMSG #chan :hi") == b"nick"
+    assert get_sender(b"@time=2018-01-01T00:00:00Z :nick!user@host PRIVMSG #chan :hi") == b"nick"
+    assert get_sender(b":irc.example.net 001 bot :Welcome") == b"irc.example.net"
+    assert get_sender(b"PING :irc.example.net") is None
+    assert get_sender(b"@tags-only") is None
+
+
+def test_decode_ascii():
+    decoder = LineDecoder()
+    assert decoder.decode(b":nick!user@host PRIVMSG #chan :hi") == ":nick!user@host PRIVMSG #chan :hi"
+    assert decoder.decode(bytearray(b"PING :server")) == "PING :server"
+
+
+def test_decode_utf8():
+    decoder = LineDecoder()
+    line = ":nick!user@host PRIVMSG #chan :café ☃"
+    assert decoder.decode(line.encode("utf-8")) == line
+
+
+def test_decode_fallback_sender():
+    decoder = LineDecoder()
+    line = ":old!user@host PRIVMSG #chan :café"
+    assert decoder.decode(line.encode("iso-8859-1")) == line
+    # the sender is remembered, and later lines still decode correctly
+    assert decoder.decode(line.encode("iso-8859-1")) == line
+
+    # the same sender switching to UTF-8 is still detected
+    utf8_line = ":old!user@host PRIVMSG #chan :café ☃"
+    assert decoder.decode(utf8_line.encode("utf-8")) == utf8_line
+
+
+def test_decode_fallback_encoding():
+    decoder = LineDecoder(fallback="cp1252")
+    line = ":old!user@host PRIVMSG #chan :€5"
+    assert decoder.decode(line.encode("cp1252")) == line
+
+
+# noinspection PyProtectedMember
+def test_max_senders():
+    decoder = LineDecoder(max_senders=2)
+    for nick in ("a", "b", "c"):
+        decoder.decode(":{}!u@h PRIVMSG #chan :é".format(nick).encode("iso-8859-1"))
+
+    assert list(decoder._fallback_senders) == [b"b", b"c"]
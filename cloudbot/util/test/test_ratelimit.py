@@ -0,0 +1,51 @@
+from cloudbot.util.ratelimit import RateLimiter, Limit
+
+USER = Limit(10, 1, 5)
+CHANNEL = Limit(15, 1, 5)
+
+
+def test_consume():
+    limiter = RateLimiter()
+    limits = [("user", "a", USER)]
+    assert limiter.consume(limits, now=0) is None
+    assert limiter.consume(limits, now=0) is None
+    assert limiter.consume(limits, now=0) == "user"
+    assert limiter.refused["user"] == 1
+
+    # refills at 1 token per second
+    assert limiter.consume(limits, now=5) is None
+    assert limiter.get_tokens("user", "a", USER, now=5) == 0
+
+
+def test_hierarchy():
+    limiter = RateLimiter()
+    assert limiter.consume([("user", "a", USER), ("channel", "#c", CHANNEL)], now=0) is None
+    assert limiter.consume([("user", "b", USER), ("channel", "#c", CHANNEL)], now=0) is None
+    assert limiter.consume([("user", "c", USER), ("channel", "#c", CHANNEL)], now=0) is None
+    assert limiter.consume([("user", "d", USER), ("channel", "#c", CHANNEL)], now=0) == "channel"
+
+    # a refused check doesn't take tokens from any level
+    assert limiter.get_tokens("user", "d", USER, now=0) == 10
+    assert limiter.stats() == {"user": 4, "channel": 1, "network": 0, "hook": 0}
+
+
+def test_expire():
+    limiter = RateLimiter(ttl=60, resolution=10)
+    limiter.consume([("user", "a", USER)], now=0)
+    limiter.consume([("user", "b", USER)], now=30)
+    limiter.expire(now=65)
+    assert limiter.stats()["user"] == 2
+
+    limiter.expire(now=75)
+    assert ("user", "a") not in limiter.buckets
+    assert ("user", "b") in limiter.buckets
+
+    # using a bucket pushes its expiry back
+    limiter.consume([("user", "b", USER)], now=80)
+    limiter.expire(now=100)
+    assert ("user", "b") in limiter.buckets
+
+    limiter.expire(now=1000)
+    assert not limiter.buckets
+    assert limiter.expired == 2
+    assert all(not slot for slot in limiter.wheel)
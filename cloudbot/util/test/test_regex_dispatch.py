@@ -0,0 +1,86 @@
+import re
+
+from cloudbot.util.regex_dispatch import required_literals, RegexDispatcher
+
+PATTERNS = [
+    re.compile(r'https?://(?:\w+)\.speedtest\.net/(?:my-)?result/(d?/?[0-9]+)', re.I),
+    re.compile(r"https?://(?:tools\.ietf\.org/\w+/|www\.rfc-editor\.org/\w+/)rfc(\d+){,4}"),
+    re.compile(r'(?:youtube.*?(?:v=|/v/)|youtu\.be/|yooouuutuuube.*?id=)([-_a-zA-Z0-9]+)', re.I),
+    re.compile(r'^\?(.+)', re.I),
+    re.compile(r'^.*\+\+$'),
+    re.compile(r'\\o/', re.IGNORECASE),
+    re.compile(r'(?i)twitch\.tv/(\w+)'),
+    re.compile(r'\d+'),
+]
+
+TEXTS = [
+    "hello world",
+    "check out https://www.YOUTUBE.com/watch?v=dQw4w9WgXcQ",
+    "http://www.speedtest.net/my-result/12345",
+    "https://tools.ietf.org/html/rfc2812",
+    "?factoid",
+    "cloudbot++",
+    "\\o/ yay",
+    "TWITCH.TV/someone",
+    "numbers 123",
+    "\u017fome text with a long s and \u0130 dotted i",
+]
+
+
+def test_required_literals():
+    assert required_literals(re.compile(r'foo\d+bar')) == (frozenset(["foo"]), False)
+    assert required_literals(re.compile(r'foo|barbaz')) == (frozenset(["foo", "barbaz"]), False)
+    assert required_literals(re.compile(r'(?i)HTTP://')) == (frozenset(["http://"]), True)
+    assert required_literals(re.compile(r'(?:ab)+c')) == (frozenset(["ab"]), False)
+
+
+def test_required_literals_none():
+    assert required_literals(re.compile(r'\w+')) == (None, False)
+    assert required_literals(re.compile(r'foo|\d')) == (None, False)
+    assert required_literals(re.compile(r'(?:foo)?\d')) == (None, False)
+    assert required_literals(re.compile(b'foo')) == (None, False)
+
+
+def test_ignorecase_unsafe_chars():
+    # 's' matches U+017F (long s) with re.I, but '\u017f'.lower() is not 's'
+    literals, ignorecase = required_literals(re.compile(r'ssh', re.I))
+    assert ignorecase
+    assert literals == frozenset(["h"])
+
+
+def test_candidates_superset():
+    dispatcher = RegexDispatcher()
+    for i, pattern in enumerate(PATTERNS):
+        dispatcher.append((pattern, i))
+
+    for text in TEXTS:
+        candidates = [hook for _, hook in dispatcher.candidates(text)]
+        matching = [i for i, pattern in enumerate(PATTERNS) if pattern.search(text)]
+        assert set(matching) <= set(candidates)
+        # order is preserved
+        assert candidates == sorted(candidates)
+
+
+def test_candidates_filtered():
+    dispatcher = RegexDispatcher()
+    for i, pattern in enumerate(PATTERNS):
+        dispatcher.append((pattern, i))
+
+    # only the pattern without any literals is left to run
+    assert [hook for _, hook in dispatcher.candidates("hello world")] == [7]
+
+
+def test_list_interface():
+    dispatcher = RegexDispatcher()
+    first = (re.compile("foo"), 2)
+    second = (re.compile("bar"), 1)
+    dispatcher.append(first)
+    dispatcher.append(second)
+    assert len(dispatcher) == 2
+
+    dispatcher.sort(key=lambda pair: pair[1])
+    assert list(dispatcher) == [second, first]
+
+    dispatcher.remove(second)
+    assert list(dispatcher) == [first]
+    assert [hook for _, hook in dispatcher.candidates("bar")] == []
@@ -0,0 +1,180 @@
+from threading import Lock
+
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, LOAD_ATTEMPTS, initial_check_delay
+
+
+class MockResult:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class MockDB:
+    def __init__(self, rows=(), rowcount=1):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.queries = []
+        self.commits = 0
+
+    def execute(self, query):
+        self.queries.append(query)
+        return MockResult(self.rowcount)
+
+    def commit(self):
+        self.commits += 1
+
+
+def make_cache():
+    data = []
+
+    def install(rows):
+        data[:] = rows
+
+    return data, WriteThroughCache("test", lambda db: list(db.rows), install, lambda: sorted(data))
+
+
+def test_write():
+    data, cache = make_cache()
+    db = MockDB(['a'])
+    cache.load(db)
+    assert data == ['a']
+
+    res = cache.write(db, 'insert', apply=lambda: data.append('b'))
+    assert res.rowcount == 1
+    assert db.queries == ['insert']
+    assert db.commits == 1
+    assert data == ['a', 'b']
+
+
+def test_upsert():
+    data, cache = make_cache()
+    db = MockDB(rowcount=0)
+    cache.upsert(db, 'update', 'insert')
+    assert db.queries == ['update', 'insert']
+
+    db = MockDB(rowcount=1)
+    cache.upsert(db, 'update', 'insert')
+    assert db.queries == ['update']
+
+
+def test_check():
+    data, cache = make_cache()
+    db = MockDB(['a', 'b'])
+    cache.load(db)
+    assert cache.check(db)
+    assert cache.mismatches == 0
+
+    data.append('c')
+    assert not cache.check(db)
+    assert cache.mismatches == 1
+    assert data == ['a', 'b']
+
+
+class LockCheckingDB(MockDB):
+    def __init__(self, lock):
+        super().__init__()
+        self.lock = lock
+
+    def execute(self, query):
+        assert not self.lock.locked()
+        return super().execute(query)
+
+    def commit(self):
+        assert not self.lock.locked()
+        super().commit()
+
+
+def test_lock_not_held_during_io():
+    data = []
+    lock = Lock()
+    def read(db):
+        assert not lock.locked()
+        return ['x']
+
+    def install(rows):
+        assert lock.locked()
+        data[:] = rows
+
+    cache = WriteThroughCache("test", read, install, lambda: list(data), lock)
+    db = LockCheckingDB(lock)
+    cache.load(db)
+    assert cache.check(db)
+    assert data == ['x']
+    del data[:]
+
+    def apply():
+        assert lock.locked()
+        data.append('a')
+
+    cache.write(db, 'insert', apply=apply)
+    cache.upsert(db, 'update', 'insert', apply=apply)
+    assert data == ['a', 'a']
+    assert db.commits == 2
+
+
+def test_check_skipped_during_write():
+    data, cache = make_cache()
+    db = MockDB(['a'])
+
+    def apply():
+        # a check running between the commit and the apply mustn't reload the cache
+        assert cache.check(db)
+        assert data == []
+        data.append('b')
+
+    cache.write(db, 'insert', apply=apply)
+    assert data == ['b']
+    assert cache.mismatches == 0
+
+
+def test_check_skipped_when_write_during_read():
+    data, cache = make_cache()
+    db = MockDB(['a'])
+    cache.load(db)
+
+    def read(_db):
+        # a write is made and applied while the table is being read, the rows read may not include it
+        cache.write(MockDB(), 'insert', apply=lambda: data.append('b'))
+        return ['a']
+
+    cache._read = read
+    assert cache.check(db)
+    assert data == ['a', 'b']
+    assert cache.mismatches == 0
+
+
+def test_load_retries():
+    data, cache = make_cache()
+    reads = []
+
+    def read(db):
+        reads.append(db)
+        if len(reads) == 1:
+            cache.write(MockDB(), 'insert')
+
+        return list(db.rows)
+
+    cache._read = read
+    cache.load(MockDB(['a']))
+    assert len(reads) == 2
+    assert data == ['a']
+
+    # a table that keeps changing is finally read under the lock
+    del reads[:]
+
+    def busy_read(db):
+        reads.append(db)
+        if len(reads) <= LOAD_ATTEMPTS:
+            cache.write(MockDB(), 'insert')
+
+        return list(db.rows)
+
+    cache._read = busy_read
+    cache.load(MockDB(['b']))
+    assert len(reads) == LOAD_ATTEMPTS + 1
+    assert data == ['b']
+
+
+def test_initial_check_delay():
+    delays = [initial_check_delay() for _ in range(100)]
+    assert all(CHECK_INTERVAL <= delay <= CHECK_INTERVAL * 2 for delay in delays)
+    assert len(set(delays)) > 1
@@ -0,0 +1,179 @@
+"""
+Write-through caching for plugins which keep an in-memory copy of a database table
+
+Instead of re-reading the whole table after every change, a plugin runs its write through `WriteThroughCache.write()`
+along with a function which applies the same change to its in-memory structure. A full reload only happens on load and
+in the periodic `check()`, which also reports whether the cache had drifted from the database.
+
+The lock is only held while applying a change to the cache, never while waiting on the database, as readers of the
+cache may be running in the event loop. Reloads read the table in to a new structure first, and only take the lock to
+swap it in.
+"""
+
+import logging
+import random
+from threading import RLock
+
+logger = logging.getLogger("cloudbot")
+
+# How often plugins should run check(), in seconds
+CHECK_INTERVAL = 600
+
+# How many times load() reads the table again when a write changed it during the read
+LOAD_ATTEMPTS = 3
+
+
+def initial_check_delay():
+    """
+    A random delay before a cache's first check(), so the checks of all the caches are spread over the interval instead
+    of all reading their tables at once
+    :rtype: float
+    """
+    return CHECK_INTERVAL + random.uniform(0, CHECK_INTERVAL)
+
+
+class WriteThroughCache:
+    """
+    :type name: str
+    :type lock: threading.RLock
+    :type mismatches: int
+    """
+
+    def __init__(self, name, read, install, snapshot, lock=None):
+        """
+        :param name: The name of the cache, used in log messages
+        :param read: A function which takes a database session and reads the whole table in to a new structure, without
+                     touching the current one
+        :param install: A function which replaces the in-memory structure with one returned by `read`
+        :param snapshot: A function which returns a comparable copy of the in-memory structure, used to detect drift
+        :param lock: The lock protecting the in-memory structure, a new RLock is used if not set
+        :type name: str
+        :type read: (sqlalchemy.orm.Session) -> object
+        :type install: (object) -> None
+        :type snapshot: () -> object
+        :type lock: threading.RLock
+        """
+        self.name = name
+        self._read = read
+        self._install = install
+        self._snapshot = snapshot
+        self.lock = lock if lock is not None else RLock()
+        self.mismatches = 0
+        # writes which have started but not yet been applied to the cache, see check()
+        self._writing = 0
+        # incremented when a write starts, so a reload can tell if its read may have missed one
+        self._version = 0
+
+    def _reload(self, db):
+        """
+        Reads the table and installs it, unless a write started during the read
+        :return: None if the read was discarded, otherwise whether the new data matched the cache
+        :rtype: bool | None
+        """
+        with self.lock:
+            if self._writing:
+                return None
+
+            version = self._version
+
+        data = self._read(db)
+
+        with self.lock:
+            if self._writing or self._version != version:
+                return None
+
+            before = self._snapshot()
+            self._install(data)
+            return before == self._snapshot()
+
+    def load(self, db):
+        """
+        Reloads the whole cache from the database
+        :type db: sqlalchemy.orm.Session
+        """
+        for _ in range(LOAD_ATTEMPTS):
+            if self._reload(db) is not None:
+                return
+
+        # writes keep changing the table, read it under the lock so none can be missed
+        logger.debug("Loading cache %s under its lock, writes interrupted %d reads", self.name, LOAD_ATTEMPTS)
+        with self.lock:
+            self._install(self._read(db))
+
+    def write(self, db, *queries, apply=None):
+        """
+        Runs and commits some queries, then applies the same change to the cache
+        :param db: The database session to use
+        :param queries: The statements to run, in order
+        :param apply: A function, called with no arguments after the commit, which updates the in-memory structure
+        :return: The result of the last query
+        :type db: sqlalchemy.orm.Session
+        :type apply: () -> None
+        """
+        with self.lock:
+            self._writing += 1
+            self._version += 1
+
+        try:
+            res = None
+            for query in queries:
+                res = db.execute(query)
+
+            db.commit()
+            if apply is not None:
+                with self.lock:
+                    apply()
+        finally:
+            with self.lock:
+                self._writing -= 1
+
+        return res
+
+    def upsert(self, db, update, insert, apply=None):
+        """
+        Runs an update, or an insert if the update didn't match any rows, then applies the change to the cache
+        :param db: The database session to use
+        :param update: The update statement
+        :param insert: The insert statement
+        :param apply: A function, called with no arguments after the commit, which updates the in-memory structure
+        :type db: sqlalchemy.orm.Session
+        :type apply: () -> None
+        """
+        with self.lock:
+            self._writing += 1
+            self._version += 1
+
+        try:
+            res = db.execute(update)
+            if not res.rowcount:
+                db.execute(insert)
+
+            db.commit()
+            if apply is not None:
+                with self.lock:
+                    apply()
+        finally:
+            with self.lock:
+                self._writing -= 1
+
+    def check(self, db):
+        """
+        Reloads the cache from the database, logging a warning if it was out of sync
+
+        The check is skipped if a write is in progress or starts while the table is read, as the database may already
+        have a change the cache hasn't.
+        :type db: sqlalchemy.orm.Session
+        :return: Whether the cache matched the database
+        :rtype: bool
+        """
+        matched = self._reload(db)
+        if matched is None:
+            logger.debug("Skipping check of cache %s, a write is in progress", self.name)
+            return True
+
+        if not matched:
+            self.mismatches += 1
+            logger.warning("Cache %s was out of sync with the database and has been reloaded", self.name)
+            return False
+
+        return True
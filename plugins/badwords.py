@@ -6,6 +6,7 @@ from sqlalchemy import Table, Column, String, PrimaryKeyConstraint, select
 from cloudbot import hook
 from cloudbot.event import EventType
 from cloudbot.util import database
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 table = Table(
     'badwords',
@@ -19,20 +20,45 @@ table = Table(
 badcache = defaultdict(list)
 
 
+def _compile_badwords():
+    global badword_re
+    words = [word for words in badcache.values() for word in words]
+    badword_re = re.compile(
+        r'(\s|^|[^\w\s])({0})(\s|$|[^\w\s])'.format('|'.join(words)), re.IGNORECASE
+    )
+
+
+def _read_bad(db):
+    new_cache = defaultdict(list)
+    for chan, word in db.execute(select([table.c.chan, table.c.word])):
+        new_cache[chan.casefold()].append(word)
+
+    return new_cache
+
+
+def _install_bad(new_cache):
+    badcache.clear()
+    badcache.update(new_cache)
+    _compile_badwords()
+
+
+def _snapshot():
+    return {chan: sorted(words) for chan, words in badcache.items() if words}
+
+
+cache = WriteThroughCache("badwords", _read_bad, _install_bad, _snapshot)
+
+
 @hook.on_start()
 @hook.command("loadbad", permissions=["badwords"], autohelp=False)
 def load_bad(db):
     """- Should run on start of bot to load the existing words into the regex"""
-    global badword_re
-    badcache.clear()
-    words = []
-    for chan, word in db.execute(select([table.c.chan, table.c.word])):
-        badcache[chan.casefold()].append(word)
-        words.append(word)
+    cache.load(db)
 
-    badword_re = re.compile(
-        r'(\s|^|[^\w\s])({0})(\s|$|[^\w\s])'.format('|'.join(words)), re.IGNORECASE
-    )
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
 
 
 @hook.command("addbad", permissions=["badwords"])
@@ -55,9 +81,11 @@ def add_bad(text, nick, db):
             channel
         )
 
-    db.execute(table.insert().values(word=word, nick=nick, chan=channel))
-    db.commit()
-    load_bad(db)
+    def apply():
+        badcache[channel.casefold()].append(word)
+        _compile_badwords()
+
+    cache.write(db, table.insert().values(word=word, nick=nick, chan=channel), apply=apply)
     wordlist = list_bad(channel)
     return "Current badwords: {}".format(wordlist)
 
@@ -70,10 +98,14 @@ def del_bad(text, db):
     if not channel.startswith('#'):
         return "Please specify a valid channel name after the bad word."
 
-    db.execute(table.delete().where(table.c.word == word).where(table.c.chan == channel))
-    db.commit()
+    def apply():
+        words = badcache[channel.casefold()]
+        if word in words:
+            words.remove(word)
+            _compile_badwords()
+
     newlist = list_bad(channel)
-    load_bad(db)
+    cache.write(db, table.delete().where(table.c.word == word).where(table.c.chan == channel), apply=apply)
     return "Removing {} new bad word list for {} is: {}".format(
         word, channel, newlist
     )
@@ -1,7 +1,6 @@
 """brainfuck interpreter adapted from (public domain) code at
 http://brainfuck.sourceforge.net/brain.py"""
 
-import asyncio
 import random
 import re
 
@@ -11,8 +10,7 @@ BUFFER_SIZE = 5000
 MAX_STEPS = 1000000
 
 
-@hook.command("brainfuck", "bf")
-@asyncio.coroutine
+@hook.command("brainfuck", "bf", executor="cpu")
 def bf(text):
     """<prog> - executes <prog> as Brainfuck code
     :type text: str
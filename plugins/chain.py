@@ -125,8 +125,18 @@ def is_hook_allowed(_hook):
     return bool(allow_cache.get(name))
 
 
+class ChainEvent(CommandEvent):
+    """
+    A command event whose output methods are replaced, so the output can be passed to the next command in the chain
+    """
+
+    __slots__ = ('message', 'reply', 'action')
+
+
 def wrap_event(_hook, event, cmd, args):
-    cmd_event = CommandEvent(base_event=event, text=args.strip(), triggered_command=cmd, hook=_hook)
+    cmd_event = ChainEvent(
+        base_event=event, text=args.strip(), triggered_command=cmd, hook=_hook, cmd_prefix=event.triggered_prefix
+    )
     return cmd_event
 
 
@@ -5,6 +5,7 @@ from functools import partial
 from cloudbot import hook
 from cloudbot.event import CapEvent
 from cloudbot.util import async_util
+from cloudbot.util.executors import DEFAULT_POOL
 from cloudbot.util.parsers.irc import CapList
 
 
@@ -61,7 +62,9 @@ def _launch_handler(subcmd, event, **kwargs):
     except LookupError:
         return
 
-    yield from async_util.run_func_with_args(event.loop, handler, ChainMap(event, kwargs))
+    yield from async_util.run_func_with_args(
+        event.loop, handler, ChainMap(event, kwargs), executor=event.bot.executors.get(DEFAULT_POOL)
+    )
 
 
 @_subcmd_handler("LS")
@@ -1,9 +1,13 @@
+import logging
 import traceback
 
 from requests.exceptions import RequestException
 
 from cloudbot import hook
 from cloudbot.util import web
+from cloudbot.util.executors import DEFAULT_POOL
+
+logger = logging.getLogger("cloudbot")
 
 
 def _dump_attrs(obj):
@@ -12,55 +16,73 @@ def _dump_attrs(obj):
             yield name, getattr(obj, name, None)
 
 
-@hook.post_hook
-def on_hook_end(bot, error, launched_hook, launched_event, admin_log):
-    should_broadcast = True
+@hook.post_hook(inline=True)
+def on_hook_end(bot, error, launched_hook, launched_event):
     if error is not None:
-        paste = bot.config.get("paste_exceptions", False)
-        messages = [
-            "Error occurred in {}.{}".format(launched_hook.plugin.title, launched_hook.function_name)
-        ]
+        # Formatting and pasting the error can be slow, so don't do it in the event loop
+        executor = bot.executors.get(DEFAULT_POOL)
+        future = bot.loop.run_in_executor(executor, log_error, bot, error, launched_hook, launched_event)
+        future.add_done_callback(_check_log_error)
 
-        try:
-            lines = traceback.format_exception(*error)
-            last_line = lines[-1]
-            messages.append(last_line.strip())
-        except Exception as e:
-            messages.append("Error occurred while formatting error {}: {}".format(type(e), e))
-        else:
-            if paste:
-                try:
-                    url = web.paste('\n'.join(lines))
-                    messages.append("Traceback: " + url)
-                except Exception as e:
-                    messages.append("Error occurred while gathering traceback {}: {}".format(type(e), e))
 
+def _check_log_error(future):
+    # Nothing waits for log_error(), so make sure its errors are still logged
+    if future.cancelled():
+        return
+
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Error while reporting hook error", exc_info=(type(exc), exc, exc.__traceback__))
+
+
+def log_error(bot, error, launched_hook, launched_event):
+    should_broadcast = True
+    admin_log = launched_event.admin_log
+    paste = bot.config.get("paste_exceptions", False)
+    messages = [
+        "Error occurred in {}.{}".format(launched_hook.plugin.title, launched_hook.function_name)
+    ]
+
+    try:
+        lines = traceback.format_exception(*error)
+        last_line = lines[-1]
+        messages.append(last_line.strip())
+    except Exception as e:
+        messages.append("Error occurred while formatting error {}: {}".format(type(e), e))
+    else:
         if paste:
             try:
-                lines = ["{} = {}".format(k, v) for k, v in _dump_attrs(launched_event)]
-                exc_type, exc, exc_tb = error
-
-                lines.append("")
-                lines.append("Error data:")
-                lines.extend("{} = {}".format(k, v) for k, v in _dump_attrs(exc))
-
-                if isinstance(exc, RequestException):
-                    if exc.request is not None:
-                        req = exc.request
-                        lines.append("")
-                        lines.append("Request Info:")
-                        lines.extend("{} = {}".format(k, v) for k, v in _dump_attrs(req))
-
-                    if exc.response is not None:
-                        response = exc.response
-                        lines.append("")
-                        lines.append("Response Info:")
-                        lines.extend("{} = {}".format(k, v) for k, v in _dump_attrs(response))
-
                 url = web.paste('\n'.join(lines))
-                messages.append("Event: " + url)
+                messages.append("Traceback: " + url)
             except Exception as e:
-                messages.append("Error occurred while gathering error data {}: {}".format(type(e), e))
+                messages.append("Error occurred while gathering traceback {}: {}".format(type(e), e))
+
+    if paste:
+        try:
+            lines = ["{} = {}".format(k, v) for k, v in _dump_attrs(launched_event)]
+            exc_type, exc, exc_tb = error
+
+            lines.append("")
+            lines.append("Error data:")
+            lines.extend("{} = {}".format(k, v) for k, v in _dump_attrs(exc))
+
+            if isinstance(exc, RequestException):
+                if exc.request is not None:
+                    req = exc.request
+                    lines.append("")
+                    lines.append("Request Info:")
+                    lines.extend("{} = {}".format(k, v) for k, v in _dump_attrs(req))
+
+                if exc.response is not None:
+                    response = exc.response
+                    lines.append("")
+                    lines.append("Response Info:")
+                    lines.extend("{} = {}".format(k, v) for k, v in _dump_attrs(response))
+
+            url = web.paste('\n'.join(lines))
+            messages.append("Event: " + url)
+        except Exception as e:
+            messages.append("Error occurred while gathering error data {}: {}".format(type(e), e))
 
-        for message in messages:
-            admin_log(message, should_broadcast)
+    for message in messages:
+        admin_log(message, should_broadcast)
@@ -2,7 +2,7 @@ from cloudbot import hook
 from cloudbot.hook import Priority
 
 
-@hook.sieve(priority=Priority.LOWEST)
+@hook.sieve(priority=Priority.LOWEST, inline=True)
 def cmd_autohelp(bot, event, _hook):
     if _hook.type == "command" and _hook.auto_help and not event.text and _hook.doc is not None:
         event.notice_doc()
@@ -11,7 +11,7 @@ def cmd_autohelp(bot, event, _hook):
     return event
 
 
-@hook.post_hook(priority=Priority.LOWEST)
+@hook.post_hook(priority=Priority.LOWEST, inline=True)
 def do_reply(result, error, launched_event, launched_hook):
     if launched_hook.type in ("sieve", "on_start", "on_stop"):
         return
@@ -1,60 +1,41 @@
 import asyncio
 import logging
-from time import time
 
 from cloudbot import hook
-from cloudbot.util.tokenbucket import TokenBucket
+from cloudbot.util.ratelimit import LEVELS, RateLimiter
 
-ready = False
-buckets = {}
+limiter = RateLimiter()
 logger = logging.getLogger("cloudbot")
 
 
-def task_clear(loop):
-    global buckets
-    for uid, _bucket in buckets.copy().items():
-        if (time() - _bucket.timestamp) > 600:
-            del buckets[uid]
-    loop.call_later(600, task_clear, loop)
+def _limit_keys(conn, chan, nick, _hook):
+    """
+    :type conn: cloudbot.client.Client
+    :type chan: str
+    :type nick: str
+    :type _hook: cloudbot.plugin.Hook
+    """
+    return {
+        "user": "!".join([conn.name, chan, nick]).lower(),
+        "channel": "!".join([conn.name, chan]).lower(),
+        "network": conn.name.lower(),
+        "hook": "!".join([conn.name.lower(), _hook.description]),
+    }
 
 
-@hook.irc_raw('004')
-@asyncio.coroutine
-def init_tasks(loop, conn):
-    global ready
-    if ready:
-        # tasks already started
-        return
-
-    logger.info("[{}|sieve] Bot is starting ratelimiter cleanup task.".format(conn.name))
-    loop.call_later(600, task_clear, loop)
-    ready = True
-
-
-@hook.sieve(priority=100)
+@hook.sieve(priority=100, inline=True)
 @asyncio.coroutine
 def sieve_suite(bot, event, _hook):
-    global buckets
-
     conn = event.conn
+    policy = conn.sieve_policy
 
     # check acls
-    acl = conn.config.get('acls', {}).get(_hook.function_name)
-    if acl:
-        if 'deny-except' in acl:
-            allowed_channels = list(map(str.lower, acl['deny-except']))
-            if event.chan.lower() not in allowed_channels:
-                return None
-        if 'allow-except' in acl:
-            denied_channels = list(map(str.lower, acl['allow-except']))
-            if event.chan.lower() in denied_channels:
-                return None
+    if not policy.is_allowed_in(_hook.function_name, event.chan):
+        return None
 
     # check disabled_commands
-    if _hook.type == "command":
-        disabled_commands = conn.config.get('disabled_commands', [])
-        if event.triggered_command in disabled_commands:
-            return None
+    if _hook.type == "command" and event.triggered_command in policy.disabled_commands:
+        return None
 
     # check permissions
     allowed_permissions = _hook.permissions
@@ -71,29 +52,37 @@ def sieve_suite(bot, event, _hook):
 
     # check command spam tokens
     if _hook.type == "command":
-        uid = "!".join([conn.name, event.chan, event.nick]).lower()
-
-        tokens = conn.config.get('ratelimit', {}).get('tokens', 17.5)
-        restore_rate = conn.config.get('ratelimit', {}).get('restore_rate', 2.5)
-        message_cost = conn.config.get('ratelimit', {}).get('message_cost', 5)
-        strict = conn.config.get('ratelimit', {}).get('strict', True)
-
-        if uid not in buckets:
-            bucket = TokenBucket(tokens, restore_rate)
-            bucket.consume(message_cost)
-            buckets[uid] = bucket
-            return event
-
-        bucket = buckets[uid]
-        if bucket.consume(message_cost):
-            pass
-        else:
+        keys = _limit_keys(conn, event.chan, event.nick, _hook)
+        refused = limiter.consume((level, keys[level], limit) for level, limit in policy.limits)
+        if refused is not None:
             bot.logger.info("[{}|sieve] Refused command from {}. "
-                            "Entity had {} tokens, needed {}.".format(conn.name, uid, bucket.tokens,
-                                                                      message_cost))
-            if strict:
+                            "Ratelimit for {} {} exceeded.".format(conn.name, keys["user"], refused, keys[refused]))
+            if policy.ratelimit.strict and refused == "user":
                 # bad person loses all tokens
-                bucket.empty()
+                limiter.empty("user", keys["user"])
             return None
 
     return event
+
+
+@hook.command("ratelimits", "ratelimit", autohelp=False, permissions=["botcontrol"])
+@asyncio.coroutine
+def ratelimits(text, conn, chan, nick):
+    """[nick] - Shows how many rate limit buckets are being tracked, and the tokens [nick] has left in this channel"""
+    limiter.expire()
+    counts = limiter.stats()
+    out = "Tracking {} buckets ({}). {} expired, {} refused.".format(
+        sum(counts.values()), ", ".join("{}: {}".format(level, counts[level]) for level in LEVELS),
+        limiter.expired, sum(limiter.refused.values())
+    )
+
+    target = text.strip() or nick
+    key = "!".join([conn.name, chan, target]).lower()
+    limit = conn.sieve_policy.limits[0][1]
+    tokens = limiter.get_tokens("user", key, limit)
+    if tokens is None:
+        out += " {} has a full bucket.".format(target)
+    else:
+        out += " {} has {:.1f}/{} tokens.".format(target, tokens, limit.capacity)
+
+    return out
@@ -77,10 +77,7 @@ def cmdinfo(text, bot, reply):
     if cmd in bot.plugin_manager.commands:
         cmd_hook = bot.plugin_manager.commands[cmd]
     else:
-        potentials = []
-        for potential_match, plugin in bot.plugin_manager.commands.items():
-            if potential_match.startswith(cmd):
-                potentials.append((potential_match, plugin))
+        potentials = bot.plugin_manager.find_commands(cmd)
 
         if potentials:
             if len(potentials) == 1:
@@ -2,9 +2,10 @@
 Bot wide hook opt-out for channels
 """
 import asyncio
+import fnmatch
+import re
 from collections import defaultdict
-from fnmatch import fnmatch
-from functools import total_ordering
+from functools import total_ordering, partial, lru_cache
 from threading import RLock
 
 from sqlalchemy import Table, Column, String, Boolean, PrimaryKeyConstraint, and_
@@ -13,6 +14,7 @@ from cloudbot import hook
 from cloudbot.hook import Priority
 from cloudbot.util import database, web
 from cloudbot.util.formatting import gen_markdown_table
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 optout_table = Table(
     'optout',
@@ -29,12 +31,18 @@ optout_cache = defaultdict(list)
 cache_lock = RLock()
 
 
+# Incremented whenever the rules change, so cached decisions from older rules are never used
+rules_version = 0
+
+
 @total_ordering
 class OptOut:
     def __init__(self, channel, hook_pattern, allow):
         self.channel = channel.casefold()
         self.hook = hook_pattern.casefold()
         self.allow = allow
+        self._channel_re = re.compile(fnmatch.translate(self.channel))
+        self._hook_re = re.compile(fnmatch.translate(self.hook))
 
     def __lt__(self, other):
         if isinstance(other, OptOut):
@@ -53,10 +61,35 @@ class OptOut:
         return "{}({}, {}, {})".format(self.__class__.__name__, self.channel, self.hook, self.allow)
 
     def match(self, channel, hook_name):
-        return self.match_chan(channel) and fnmatch(hook_name.casefold(), self.hook)
+        return self.match_chan(channel) and self._hook_re.match(hook_name.casefold()) is not None
 
     def match_chan(self, channel):
-        return fnmatch(channel.casefold(), self.channel)
+        return self._channel_re.match(channel.casefold()) is not None
+
+
+def _rules_changed():
+    global rules_version
+    rules_version += 1
+    _get_decision.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def _get_decision(conn_name, chan_cf, hook_name_cf, version):
+    with cache_lock:
+        for _optout in optout_cache.get(conn_name, ()):
+            if _optout.match(chan_cf, hook_name_cf):
+                return _optout.allow
+
+    return None
+
+
+def get_decision(conn_name, chan, hook_name):
+    """
+    Finds whether a hook is allowed in a channel by the optout rules
+    :return: The allow value of the most specific matching rule, or None if no rules match
+    :rtype: bool | None
+    """
+    return _get_decision(conn_name, chan.casefold(), hook_name.casefold(), rules_version)
 
 
 @asyncio.coroutine
@@ -86,12 +119,33 @@ def set_optout(db, conn, chan, pattern, allowed):
     chan_cf = chan.casefold()
     pattern_cf = pattern.casefold()
     clause = and_(optout_table.c.network == conn_cf, optout_table.c.chan == chan_cf, optout_table.c.hook == pattern_cf)
-    res = db.execute(optout_table.update().values(allow=allowed).where(clause))
-    if not res.rowcount:
-        db.execute(optout_table.insert().values(network=conn_cf, chan=chan_cf, hook=pattern_cf, allow=allowed))
 
-    db.commit()
-    load_cache(db)
+    def apply():
+        opts = optout_cache[conn_cf]
+        for opt in opts:
+            if opt.channel == chan_cf and opt.hook == pattern_cf:
+                opt.allow = allowed
+                break
+        else:
+            opts.append(OptOut(chan_cf, pattern_cf, allowed))
+            opts.sort(reverse=True)
+
+        _rules_changed()
+
+    cache.upsert(
+        db, optout_table.update().values(allow=allowed).where(clause),
+        optout_table.insert().values(network=conn_cf, chan=chan_cf, hook=pattern_cf, allow=allowed),
+        apply=apply
+    )
+
+
+def _remove_optouts(conn_cf, chan_cf=None, pattern_cf=None):
+    opts = optout_cache[conn_cf]
+    opts[:] = [
+        opt for opt in opts
+        if not ((chan_cf is None or opt.channel == chan_cf) and (pattern_cf is None or opt.hook == pattern_cf))
+    ]
+    _rules_changed()
 
 
 def del_optout(db, conn, chan, pattern):
@@ -99,10 +153,9 @@ def del_optout(db, conn, chan, pattern):
     chan_cf = chan.casefold()
     pattern_cf = pattern.casefold()
     clause = and_(optout_table.c.network == conn_cf, optout_table.c.chan == chan_cf, optout_table.c.hook == pattern_cf)
-    res = db.execute(optout_table.delete().where(clause))
-
-    db.commit()
-    load_cache(db)
+    res = cache.write(
+        db, optout_table.delete().where(clause), apply=partial(_remove_optouts, conn_cf, chan_cf, pattern_cf)
+    )
 
     return res.rowcount > 0
 
@@ -113,11 +166,10 @@ def clear_optout(db, conn, chan=None):
         chan_cf = chan.casefold()
         clause = and_(optout_table.c.network == conn_cf, optout_table.c.chan == chan_cf)
     else:
+        chan_cf = None
         clause = optout_table.c.network == conn_cf
 
-    res = db.execute(optout_table.delete().where(clause))
-    db.commit()
-    load_cache(db)
+    res = cache.write(db, optout_table.delete().where(clause), apply=partial(_remove_optouts, conn_cf, chan_cf))
 
     return res.rowcount
 
@@ -136,35 +188,56 @@ _STR_TO_BOOL = {
 }
 
 
+def _read_cache(db):
+    new_cache = defaultdict(list)
+    for row in db.execute(optout_table.select()):
+        new_cache[row["network"]].append(OptOut(row["chan"], row["hook"], row["allow"]))
+
+    for opts in new_cache.values():
+        opts.sort(reverse=True)
+
+    return new_cache
+
+
+def _install_cache(new_cache):
+    optout_cache.clear()
+    optout_cache.update(new_cache)
+    _rules_changed()
+
+
+def _snapshot():
+    return {
+        network: sorted((opt.channel, opt.hook, opt.allow) for opt in opts)
+        for network, opts in optout_cache.items() if opts
+    }
+
+
+cache = WriteThroughCache("optout", _read_cache, _install_cache, _snapshot, cache_lock)
+
+
 @hook.onload
 def load_cache(db):
-    with cache_lock:
-        optout_cache.clear()
-        for row in db.execute(optout_table.select()):
-            optout_cache[row["network"]].append(OptOut(row["chan"], row["hook"], row["allow"]))
+    cache.load(db)
 
-        for opts in optout_cache.values():
-            opts.sort(reverse=True)
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
 
 
 # noinspection PyUnusedLocal
-@hook.sieve(priority=Priority.HIGHEST)
+@hook.sieve(priority=Priority.HIGHEST, inline=True)
 def optout_sieve(bot, event, _hook):
     if not event.chan or not event.conn:
         return event
 
     hook_name = _hook.plugin.title + "." + _hook.function_name
-    with cache_lock:
-        optouts = optout_cache[event.conn.name]
-        for _optout in optouts:
-            if _optout.match(event.chan, hook_name):
-                if not _optout.allow:
-                    if _hook.type == "command":
-                        event.notice("Sorry, that command is disabled in this channel.")
+    allow = get_decision(event.conn.name, event.chan, hook_name)
+    if allow is not None and not allow:
+        if _hook.type == "command":
+            event.notice("Sorry, that command is disabled in this channel.")
 
-                    return None
-
-                break
+        return None
 
     return event
 
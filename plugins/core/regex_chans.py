@@ -5,6 +5,7 @@ from sqlalchemy import Table, Column, UniqueConstraint, String
 
 from cloudbot import hook, event
 from cloudbot.util import database
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 
 table = Table(
@@ -27,18 +28,39 @@ events = {}
 plugin_whitelist = ["factoids"]
 
 
+status_cache = {}
+
+
+def _read_cache(db):
+    new_cache = {}
+    for row in db.execute(table.select()):
+        conn = row["connection"]
+        chan = row["channel"]
+        status = row["status"]
+        new_cache[(conn, chan)] = status
+
+    return new_cache
+
+
+def _install_cache(new_cache):
+    global status_cache
+    status_cache = new_cache
+
+
+cache = WriteThroughCache("regex_chans", _read_cache, _install_cache, lambda: dict(status_cache))
+
+
 @hook.on_start()
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
     """
-    global status_cache
-    status_cache = {}
-    for row in db.execute(table.select()):
-        conn = row["connection"]
-        chan = row["channel"]
-        status = row["status"]
-        status_cache[(conn, chan)] = status
+    cache.load(db)
+
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
 
 
 def set_status(db, conn, chan, status):
@@ -50,19 +72,22 @@ def set_status(db, conn, chan, status):
     """
     if (conn, chan) in status_cache:
         # if we have a set value, update
-        db.execute(
-            table.update().values(status=status).where(table.c.connection == conn).where(table.c.channel == chan))
+        query = table.update().values(status=status).where(table.c.connection == conn).where(table.c.channel == chan)
     else:
         # otherwise, insert
-        db.execute(table.insert().values(connection=conn, channel=chan, status=status))
-    db.commit()
-    load_cache(db)
+        query = table.insert().values(connection=conn, channel=chan, status=status)
+
+    def apply():
+        status_cache[(conn, chan)] = status
+
+    cache.write(db, query, apply=apply)
 
 
 def delete_status(db, conn, chan):
-    db.execute(table.delete().where(table.c.connection == conn).where(table.c.channel == chan))
-    db.commit()
-    load_cache(db)
+    def apply():
+        status_cache.pop((conn, chan), None)
+
+    cache.write(db, table.delete().where(table.c.connection == conn).where(table.c.channel == chan), apply=apply)
 
 
 def store_event(event):
@@ -112,7 +137,7 @@ def solicit(bot, conn, text, chan, nick, user, host, mask):
             asyncio.async(bot.process(e), loop=bot.loop)
 
 
-@hook.sieve()
+@hook.sieve(inline=True)
 def sieve_regex(bot, event, _hook):
     prefix = event.conn.config.get("command_prefix")
 
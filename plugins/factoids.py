@@ -7,6 +7,7 @@ from sqlalchemy import Table, Column, String, PrimaryKeyConstraint
 from cloudbot import hook
 from cloudbot.util import database, colors, web
 from cloudbot.util.formatting import gen_markdown_table
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 # below is the default factoid in every channel you can modify it however you like
 default_dict = {}
@@ -26,24 +27,47 @@ table = Table(
 )
 
 
-@hook.on_start()
-def load_cache(db):
-    """
-    :type db: sqlalchemy.orm.Session
-    """
-    global factoid_cache
-    factoid_cache = defaultdict(lambda: default_dict)
+def _read_cache(db):
+    new_cache = defaultdict(lambda: default_dict)
     for row in db.execute(table.select()):
         # assign variables
         chan = row["chan"]
         word = row["word"]
         data = row["data"]
-        if chan not in factoid_cache:
-            factoid_cache.update({chan: {word: data}})
-        elif word not in factoid_cache[chan]:
-            factoid_cache[chan].update({word: data})
+        if chan not in new_cache:
+            new_cache.update({chan: {word: data}})
+        elif word not in new_cache[chan]:
+            new_cache[chan].update({word: data})
         else:
-            factoid_cache[chan][word] = data
+            new_cache[chan][word] = data
+
+    return new_cache
+
+
+def _install_cache(new_cache):
+    global factoid_cache
+    factoid_cache = new_cache
+
+
+def _snapshot():
+    return {chan: dict(words) for chan, words in factoid_cache.items() if words}
+
+
+factoid_cache = defaultdict(lambda: default_dict)
+cache = WriteThroughCache("factoids", _read_cache, _install_cache, _snapshot)
+
+
+@hook.on_start()
+def load_cache(db):
+    """
+    :type db: sqlalchemy.orm.Session
+    """
+    cache.load(db)
+
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
 
 
 def add_factoid(db, word, chan, data, nick):
@@ -53,16 +77,23 @@ def add_factoid(db, word, chan, data, nick):
     :type data: str
     :type nick: str
     """
+    def apply():
+        chan_factoids = factoid_cache.get(chan)
+        if chan_factoids is None or chan_factoids is default_dict:
+            # don't modify the shared default
+            factoid_cache[chan] = chan_factoids = {}
+
+        chan_factoids[word] = data
+
     if word in factoid_cache[chan]:
         # if we have a set value, update
-        db.execute(table.update().values(data=data, nick=nick, chan=chan).where(table.c.chan == chan).where(
-            table.c.word == word))
-        db.commit()
+        query = table.update().values(data=data, nick=nick, chan=chan).where(table.c.chan == chan).where(
+            table.c.word == word)
     else:
         # otherwise, insert
-        db.execute(table.insert().values(word=word, data=data, nick=nick, chan=chan))
-        db.commit()
-    load_cache(db)
+        query = table.insert().values(word=word, data=data, nick=nick, chan=chan)
+
+    cache.write(db, query, apply=apply)
 
 
 def del_factoid(db, chan, word):
@@ -70,9 +101,12 @@ def del_factoid(db, chan, word):
     :type db: sqlalchemy.orm.Session
     :type word: str
     """
-    db.execute(table.delete().where(table.c.word == word).where(table.c.chan == chan))
-    db.commit()
-    load_cache(db)
+    def apply():
+        chan_factoids = factoid_cache.get(chan)
+        if chan_factoids and chan_factoids is not default_dict:
+            chan_factoids.pop(word, None)
+
+    cache.write(db, table.delete().where(table.c.word == word).where(table.c.chan == chan), apply=apply)
 
 
 @hook.command("r", "remember", permissions=["op", "chanop"])
@@ -2,11 +2,13 @@ import random
 import re
 import time
 from collections import defaultdict
+from functools import partial
 
 from sqlalchemy import Table, Column, String, PrimaryKeyConstraint
 
 from cloudbot import hook
 from cloudbot.util import database
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 delay = 10
 floodcheck = {}
@@ -23,11 +25,38 @@ table = Table(
 herald_cache = defaultdict(dict)
 
 
+def _read_cache(db):
+    new_cache = defaultdict(dict)
+    for row in db.execute(table.select()):
+        new_cache[row["chan"]][row["name"]] = row["quote"]
+
+    return new_cache
+
+
+def _install_cache(new_cache):
+    herald_cache.clear()
+    herald_cache.update(new_cache)
+
+
+def _snapshot():
+    return {chan: dict(heralds) for chan, heralds in herald_cache.items() if heralds}
+
+
+cache = WriteThroughCache("herald", _read_cache, _install_cache, _snapshot)
+
+
 @hook.on_start
 def load_cache(db):
-    herald_cache.clear()
-    for row in db.execute(table.select()):
-        herald_cache[row["chan"]][row["name"]] = row["quote"]
+    cache.load(db)
+
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
+
+
+def _remove_herald(chan, nick):
+    herald_cache[chan].pop(nick, None)
 
 
 @hook.command()
@@ -45,24 +74,21 @@ def herald(text, nick, chan, db, reply):
             return "no herald set, unable to delete."
 
         query = table.delete().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower())
-        db.execute(query)
-        db.commit()
+        cache.write(db, query, apply=partial(_remove_herald, chan.lower(), nick.lower()))
 
         reply("greeting \'{}\' for {} has been removed".format(greeting, nick))
-
-        load_cache(db)
     else:
-        res = db.execute(
-            table.update().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower()).values(quote=text)
+        def apply():
+            herald_cache[chan.lower()][nick.lower()] = text
+
+        cache.upsert(
+            db,
+            table.update().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower()).values(quote=text),
+            table.insert().values(name=nick.lower(), chan=chan.lower(), quote=text),
+            apply=apply
         )
-        if res.rowcount == 0:
-            db.execute(table.insert().values(name=nick.lower(), chan=chan.lower(), quote=text))
-
-        db.commit()
         reply("greeting successfully added")
 
-        load_cache(db)
-
 
 @hook.command(permissions=["botcontrol", "snoonetstaff"])
 def deleteherald(text, chan, db, reply):
@@ -70,19 +96,16 @@ def deleteherald(text, chan, db, reply):
 
     nick = text.strip()
 
-    res = db.execute(
-        table.delete().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower())
+    res = cache.write(
+        db, table.delete().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower()),
+        apply=partial(_remove_herald, chan.lower(), nick.lower())
     )
 
-    db.commit()
-
     if res.rowcount > 0:
         reply("greeting for {} has been removed".format(text.lower()))
     else:
         reply("{} does not have a herald".format(text.lower()))
 
-    load_cache(db)
-
 
 @hook.irc_raw("JOIN", singlethread=True)
 def welcome(nick, message, bot, chan):
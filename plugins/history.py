@@ -1,5 +1,6 @@
 import asyncio
 import re
+import threading
 import time
 from collections import deque
 
@@ -7,6 +8,7 @@ from sqlalchemy import Table, Column, String, PrimaryKeyConstraint, Float, selec
 
 from cloudbot import hook
 from cloudbot.event import EventType
+from cloudbot.hook import Overflow
 from cloudbot.util import timeformat, database
 
 table = Table(
@@ -21,6 +23,66 @@ table = Table(
 )
 
 
+# Seen updates are buffered in memory and written in a single transaction, rather than committing every message
+FLUSH_INTERVAL = 15
+FLUSH_SIZE = 500
+
+# (name, chan) -> (time, quote, host) for updates which haven't been written yet
+seen_buffer = {}
+# updates which are currently being written by flush_seen()
+seen_flushing = {}
+seen_lock = threading.Lock()
+flush_lock = threading.Lock()
+
+
+def flush_seen(db):
+    """ Writes all buffered seen updates to the database
+    :type db: sqlalchemy.orm.Session
+    """
+    global seen_buffer, seen_flushing
+    with flush_lock:
+        with seen_lock:
+            if not seen_buffer:
+                return
+
+            seen_flushing, seen_buffer = seen_buffer, {}
+
+        try:
+            for (name, chan), (seen_time, quote, host) in seen_flushing.items():
+                res = db.execute(
+                    table.update().values(time=seen_time, quote=quote, host=host)
+                        .where(table.c.name == name).where(table.c.chan == chan)
+                )
+                if res.rowcount == 0:
+                    db.execute(
+                        table.insert().values(name=name, time=seen_time, quote=quote, chan=chan, host=host)
+                    )
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            # put back the updates which haven't been replaced by newer ones, so they are retried on the next flush
+            with seen_lock:
+                for key, value in seen_flushing.items():
+                    seen_buffer.setdefault(key, value)
+
+            raise
+        finally:
+            with seen_lock:
+                seen_flushing = {}
+
+
+def get_buffered_seen(name, chan):
+    """ Gets a seen update which hasn't been written to the database yet
+    :type name: str
+    :type chan: str
+    :rtype: (float, str, str) | None
+    """
+    key = (name, chan)
+    with seen_lock:
+        return seen_buffer.get(key) or seen_flushing.get(key)
+
+
 def track_seen(event, db):
     """ Tracks messages for the .seen command
     :type event: cloudbot.event.Event
@@ -29,18 +91,12 @@ def track_seen(event, db):
     # keep private messages private
     now = time.time()
     if event.chan[:1] == "#" and not re.findall('^s/.*/.*/$', event.content.lower()):
-        res = db.execute(
-            table.update().values(time=now, quote=event.content, host=str(event.mask))
-                .where(table.c.name == event.nick.lower()).where(table.c.chan == event.chan)
-        )
-        if res.rowcount == 0:
-            db.execute(
-                table.insert().values(
-                    name=event.nick.lower(), time=now, quote=event.content, chan=event.chan, host=str(event.mask)
-                )
-            )
+        with seen_lock:
+            seen_buffer[(event.nick.lower(), event.chan)] = (now, event.content, str(event.mask))
+            buffer_full = len(seen_buffer) >= FLUSH_SIZE
 
-        db.commit()
+        if buffer_full:
+            flush_seen(db)
 
 
 def track_history(event, message_time, conn):
@@ -60,7 +116,7 @@ def track_history(event, message_time, conn):
     history.append(data)
 
 
-@hook.event([EventType.message, EventType.action], singlethread=True)
+@hook.event([EventType.message, EventType.action], singlethread=True, max_queue=500, overflow=Overflow.DROP_OLDEST)
 def chat_tracker(event, db, conn):
     """
     :type db: sqlalchemy.orm.Session
@@ -75,6 +131,16 @@ def chat_tracker(event, db, conn):
     track_history(event, message_time, conn)
 
 
+@hook.periodic(FLUSH_INTERVAL, initial_interval=FLUSH_INTERVAL)
+def flush_seen_periodic(db):
+    flush_seen(db)
+
+
+@hook.on_stop
+def flush_seen_on_stop(db):
+    flush_seen(db)
+
+
 @hook.command(autohelp=False, permissions=["botcontrol"])
 @asyncio.coroutine
 def resethistory(event, conn):
@@ -106,10 +172,14 @@ def seen(text, nick, chan, db, event, is_nick_valid):
     if not is_nick_valid(text):
         return "I can't look up that name, its impossible to use!"
 
-    last_seen = db.execute(
-        select([table.c.name, table.c.time, table.c.quote])
-            .where(table.c.name == text.lower()).where(table.c.chan == chan)
-    ).fetchone()
+    buffered = get_buffered_seen(text.lower(), chan)
+    if buffered:
+        last_seen = (text.lower(),) + buffered[:2]
+    else:
+        last_seen = db.execute(
+            select([table.c.name, table.c.time, table.c.quote])
+                .where(table.c.name == text.lower()).where(table.c.chan == chan)
+        ).fetchone()
 
     if last_seen:
         reltime = timeformat.time_since(last_seen[1], simple=True)
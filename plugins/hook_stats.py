@@ -37,7 +37,7 @@ def get_stats(bot):
     return stats
 
 
-@hook.post_hook(priority=Priority.HIGHEST)
+@hook.post_hook(priority=Priority.HIGHEST, inline=True)
 def stats_sieve(launched_event, error, bot, launched_hook):
     chan = launched_event.chan
     conn = launched_event.conn
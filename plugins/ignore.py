@@ -1,10 +1,13 @@
 import asyncio
-from fnmatch import fnmatch
+import fnmatch
+import re
+from collections import Counter
 
 from sqlalchemy import Table, Column, UniqueConstraint, PrimaryKeyConstraint, String, Boolean
 
 from cloudbot import hook
 from cloudbot.util import database
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 table = Table(
     "ignored",
@@ -18,55 +21,210 @@ table = Table(
 )
 
 
-@hook.on_start
-def load_cache(db):
+ignore_cache = []
+
+# A mask with only a literal nick, eg. "nick!*@*"
+nick_mask_re = re.compile(r'^([^*?\[!@]+)!\*@\*$')
+# A mask with only a literal host, eg. "*!*@host.example.com"
+host_mask_re = re.compile(r'^\*!\*@([^*?\[@]+)$')
+wildcard_chars = frozenset('*?[')
+
+
+def _translate(mask):
+    regex = fnmatch.translate(mask)
+    if regex.endswith('(?ms)'):
+        # Python < 3.6 puts the flags at the end, which can't be combined with other patterns
+        regex = regex[:-5]
+
+    return regex
+
+
+class IgnoreBucket:
     """
-    :type db: sqlalchemy.orm.Session
+    The casefolded ignore masks for a single channel, or for the global ignores
+
+    Literal masks are checked with hash lookups, and all other masks with a single combined regex.
+    """
+
+    def __init__(self):
+        self.exact = Counter()
+        self.nicks = Counter()
+        self.hosts = Counter()
+        self.wildcards = Counter()
+        self.wildcard_re = None
+
+    def _category(self, mask_cf):
+        match = nick_mask_re.match(mask_cf)
+        if match:
+            return self.nicks, match.group(1)
+
+        match = host_mask_re.match(mask_cf)
+        if match:
+            return self.hosts, match.group(1)
+
+        if wildcard_chars.isdisjoint(mask_cf):
+            return self.exact, mask_cf
+
+        return self.wildcards, mask_cf
+
+    def _compile(self):
+        if self.wildcards:
+            self.wildcard_re = re.compile(
+                '|'.join('(?:{})'.format(_translate(mask)) for mask in self.wildcards), re.DOTALL
+            )
+        else:
+            self.wildcard_re = None
+
+    def add(self, mask_cf):
+        counter, key = self._category(mask_cf)
+        counter[key] += 1
+        if counter is self.wildcards:
+            self._compile()
+
+    def remove(self, mask_cf):
+        counter, key = self._category(mask_cf)
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+        if counter is self.wildcards:
+            self._compile()
+
+    def __bool__(self):
+        return bool(self.exact or self.nicks or self.hosts or self.wildcards)
+
+    def matches(self, mask_cf):
+        """
+        Checks a casefolded mask against this bucket, equivalent to fnmatch() against each stored mask
+        :type mask_cf: str
+        :rtype: bool
+        """
+        if mask_cf in self.exact:
+            return True
+
+        nick_end = mask_cf.find('!')
+        if nick_end >= 0 and mask_cf[:nick_end] in self.nicks and '@' in mask_cf[nick_end + 1:]:
+            return True
+
+        host_start = mask_cf.rfind('@')
+        if host_start >= 0 and mask_cf[host_start + 1:] in self.hosts and '!' in mask_cf[:host_start]:
+            return True
+
+        wildcard_re = self.wildcard_re
+        return wildcard_re is not None and wildcard_re.match(mask_cf) is not None
+
+
+class IgnoreIndex:
+    """
+    Ignore masks indexed by (conn, chan), with global ignores in their own bucket
     """
-    global ignore_cache
-    ignore_cache = []
+
+    def __init__(self):
+        self.buckets = {}
+
+    @staticmethod
+    def _key(conn, chan):
+        # global ignores apply to every connection
+        return "*" if chan == "*" else (conn, chan)
+
+    def add(self, conn, chan, mask):
+        key = self._key(conn, chan)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = IgnoreBucket()
+
+        bucket.add(mask.casefold())
+
+    def remove(self, conn, chan, mask):
+        key = self._key(conn, chan)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+
+        bucket.remove(mask.casefold())
+        if not bucket:
+            del self.buckets[key]
+
+    def matches(self, conn, chan, mask):
+        mask_cf = mask.casefold()
+        for key in ("*", (conn, chan)):
+            bucket = self.buckets.get(key)
+            if bucket is not None and bucket.matches(mask_cf):
+                return True
+
+        return False
+
+
+ignore_index = IgnoreIndex()
+
+
+def _read_cache(db):
+    new_cache = []
+    new_index = IgnoreIndex()
     for row in db.execute(table.select()):
         conn = row["connection"]
         chan = row["channel"]
         mask = row["mask"]
-        ignore_cache.append((conn, chan, mask))
+        new_cache.append((conn, chan, mask))
+        new_index.add(conn, chan, mask)
+
+    return new_cache, new_index
+
+
+def _install_cache(data):
+    global ignore_cache, ignore_index
+    ignore_cache, ignore_index = data
+
+
+cache = WriteThroughCache("ignore", _read_cache, _install_cache, lambda: sorted(ignore_cache))
+
+
+@hook.on_start
+def load_cache(db):
+    """
+    :type db: sqlalchemy.orm.Session
+    """
+    cache.load(db)
+
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
 
 
 def add_ignore(db, conn, chan, mask):
-    if (conn, chan) in ignore_cache:
-        pass
-    else:
-        db.execute(table.insert().values(connection=conn, channel=chan, mask=mask))
+    entry = (conn, chan, mask)
+    if entry in ignore_cache:
+        return
 
-    db.commit()
-    load_cache(db)
+    def apply():
+        ignore_cache.append(entry)
+        ignore_index.add(conn, chan, mask)
+
+    cache.write(db, table.insert().values(connection=conn, channel=chan, mask=mask), apply=apply)
 
 
 def remove_ignore(db, conn, chan, mask):
-    db.execute(table.delete().where(table.c.connection == conn).where(table.c.channel == chan)
-               .where(table.c.mask == mask))
-    db.commit()
-    load_cache(db)
+    entry = (conn, chan, mask)
+
+    def apply():
+        if entry in ignore_cache:
+            ignore_cache.remove(entry)
+            ignore_index.remove(conn, chan, mask)
+
+    cache.write(
+        db, table.delete().where(table.c.connection == conn).where(table.c.channel == chan)
+            .where(table.c.mask == mask),
+        apply=apply
+    )
 
 
 def is_ignored(conn, chan, mask):
-    mask_cf = mask.casefold()
-    for _conn, _chan, _mask in ignore_cache:
-        _mask_cf = _mask.casefold()
-        if _chan == "*":
-            # this is a global ignore
-            if fnmatch(mask_cf, _mask_cf):
-                return True
-        else:
-            # this is a channel-specific ignore
-            if not (conn, chan) == (_conn, _chan):
-                continue
-            if fnmatch(mask_cf, _mask_cf):
-                return True
+    return ignore_index.matches(conn, chan, mask)
 
 
 # noinspection PyUnusedLocal
-@hook.sieve(priority=50)
+@hook.sieve(priority=50, inline=True)
 @asyncio.coroutine
 def ignore_sieve(bot, event, _hook):
     """
@@ -86,7 +244,14 @@ def ignore_sieve(bot, event, _hook):
         # this is a server message, we don't need to check it
         return event
 
-    if is_ignored(event.conn.name, event.chan, event.mask):
+    # The ignore status is the same for every hook triggered by this line
+    line_cache = event.line_cache
+    try:
+        ignored = line_cache["ignore.is_ignored"]
+    except KeyError:
+        ignored = line_cache["ignore.is_ignored"] = is_ignored(event.conn.name, event.chan, event.mask)
+
+    if ignored:
         return None
 
     return event
@@ -3,7 +3,7 @@ import re
 from collections import defaultdict
 
 import sqlalchemy
-from sqlalchemy import Table, String, Column, Integer, PrimaryKeyConstraint, select, and_
+from sqlalchemy import Table, String, Column, Integer, PrimaryKeyConstraint, Index, select, and_
 
 from cloudbot import hook
 from cloudbot.util import database
@@ -18,7 +18,9 @@ karma_table = Table(
     Column('chan', String),
     Column('thing', String),
     Column('score', Integer),
-    PrimaryKeyConstraint('name', 'chan', 'thing')
+    PrimaryKeyConstraint('name', 'chan', 'thing'),
+    Index('karma_thing_chan', 'thing', 'chan'),
+    Index('karma_chan_score', 'chan', 'score')
 )
 
 
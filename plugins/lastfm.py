@@ -184,7 +184,7 @@ def _topartists(bot, text, nick, period=None, limit=10):
     return out
 
 
-@hook.command("lastfm", "last", "np", "l", autohelp=False)
+@hook.command("lastfm", "last", "np", "l", autohelp=False, executor="web")
 def lastfm(event, db, text, nick, bot):
     """[user] [dontsave] - displays the now playing (or last played) track of LastFM user [user]"""
     api_key = bot.config.get("api_keys", {}).get("lastfm")
@@ -273,7 +273,7 @@ def lastfm(event, db, text, nick, bot):
     return out
 
 
-@hook.command("plays")
+@hook.command("plays", executor="web")
 def getuserartistplaycount(event, bot, text, nick):
     """[artist] - displays the current user's playcount for [artist]. You must have your username saved."""
     api_key = bot.config.get("api_keys", {}).get("lastfm")
@@ -300,7 +300,7 @@ def getuserartistplaycount(event, bot, text, nick):
     return out
 
 
-@hook.command("band", "la")
+@hook.command("band", "la", executor="web")
 def displaybandinfo(bot, text):
     """[artist] - displays information about [artist]."""
     api_key = bot.config.get("api_keys", {}).get("lastfm")
@@ -323,7 +323,7 @@ def displaybandinfo(bot, text):
     return out
 
 
-@hook.command("lastfmcompare", "compare", "lc")
+@hook.command("lastfmcompare", "compare", "lc", executor="web")
 def lastfmcompare(bot, text, nick):
     """<user1> [user2] - displays the now playing (or last played) track of LastFM user [user]"""
     api_key = bot.config.get("api_keys", {}).get("lastfm")
@@ -387,7 +387,7 @@ def lastfmcompare(bot, text, nick):
     )
 
 
-@hook.command("ltop", "ltt", autohelp=False)
+@hook.command("ltop", "ltt", autohelp=False, executor="web")
 def toptrack(bot, text, nick):
     """[username] - Grabs a list of the top tracks for a last.fm username"""
     api_key = bot.config.get("api_keys", {}).get("lastfm")
@@ -417,25 +417,25 @@ def toptrack(bot, text, nick):
     return out
 
 
-@hook.command("lta", "topartist", autohelp=False)
+@hook.command("lta", "topartist", autohelp=False, executor="web")
 def topartists(bot, text, nick):
     """[username] - Grabs a list of the top artists for a last.fm username. You can set your lastfm username with .l username"""
     return _topartists(bot, text, nick)
 
 
-@hook.command("ltw", "topweek", autohelp=False)
+@hook.command("ltw", "topweek", autohelp=False, executor="web")
 def topweek(bot, text, nick):
     """[username] - Grabs a list of the top artists in the last week for a last.fm username. You can set your lastfm username with .l username"""
     return _topartists(bot, text, nick, '7day')
 
 
-@hook.command("ltm", "topmonth", autohelp=False)
+@hook.command("ltm", "topmonth", autohelp=False, executor="web")
 def topmonth(bot, text, nick):
     """[username] - Grabs a list of the top artists in the last month for a last.fm username. You can set your lastfm username with .l username"""
     return _topartists(bot, text, nick, '1month')
 
 
-@hook.command("lty", "topyear", autohelp=False)
+@hook.command("lty", "topyear", autohelp=False, executor="web")
 def topall(bot, text, nick):
     """[username] - Grabs a list of the top artists in the last year for a last.fm username. You can set your lastfm username with .l username"""
     return _topartists(bot, text, nick, '1year')
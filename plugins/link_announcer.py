@@ -5,7 +5,7 @@ import requests
 from bs4 import BeautifulSoup
 
 from cloudbot import hook
-from cloudbot.hook import Priority, Action
+from cloudbot.hook import Priority, Action, Overflow
 from cloudbot.util import filesize
 
 
@@ -61,7 +61,7 @@ HEADERS = {
 MAX_RECV = 1000000
 
 
-@hook.command("title", "t", autohelp=False)
+@hook.command("title", "t", autohelp=False, executor="web")
 def title(text, chan, conn):
     """[URL] - Gets the HTML title of [URL], or of the most recent URL in chat history"""
     url = None
@@ -76,7 +76,8 @@ def title(text, chan, conn):
     return get_title(url)
 
 
-@hook.regex(url_re, priority=Priority.LOW, action=Action.HALTTYPE, only_no_match=True)
+@hook.regex(url_re, priority=Priority.LOW, action=Action.HALTTYPE, only_no_match=True, max_concurrency=4, max_queue=8,
+            overflow=Overflow.DROP_OLDEST, executor="web")
 def title_re(match):
     return get_title(match.group())
 
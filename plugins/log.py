@@ -1,6 +1,8 @@
 import asyncio
 import codecs
+import logging
 import os
+import threading
 import time
 
 import cloudbot
@@ -11,6 +13,8 @@ from cloudbot.event import EventType
 # +---------+
 from cloudbot.util.formatting import strip_colors
 
+logger = logging.getLogger("cloudbot")
+
 base_formats = {
     EventType.message: "[{server}:{channel}] <{nick}> {content}",
     EventType.notice: "[{server}:{channel}] -{nick}- {content}",
@@ -136,10 +140,26 @@ raw_file_format = "{server}_%Y%m%d.log"
 
 folder_format = "%Y"
 
-# Stream cache, (server, chan) -> (file_name, stream)
+# Lines are buffered and written in one go when there are enough of them, or they've waited long enough
+FLUSH_LINES = 100
+FLUSH_INTERVAL = 5
+# The most events passed to log() or log_raw() at once
+LOG_BATCH = 50
+# How many lines are kept for a file which couldn't be written to, the oldest are dropped past this
+MAX_RETAINED_LINES = 1000
+
+# Held while using any of the buffers, caches or streams below, as the hooks using them run on different threads
+buffer_lock = threading.RLock()
+# Buffered lines, file name -> list of lines
+buffers = {}
+buffered_lines = 0
+last_flush = time.time()
+# Log file name cache, (server, chan) -> file name, raw logs use a chan of None
+filename_cache = {}
+# When the cached file names are no longer valid
+rotate_at = 0
+# Open log files, file name -> stream
 stream_cache = {}
-# Raw stream cache, server -> (file_name, stream)
-raw_cache = {}
 
 
 def get_log_filename(server, chan):
@@ -149,87 +169,160 @@ def get_log_filename(server, chan):
     return os.path.join(cloudbot.logging_dir, folder_name, file_name)
 
 
-def get_log_stream(server, chan):
-    new_filename = get_log_filename(server, chan)
-    cache_key = (server, chan)
-    old_filename, log_stream = stream_cache.get(cache_key, (None, None))
+def get_raw_log_filename(server):
+    current_time = time.gmtime()
+    folder_name = time.strftime(folder_format, current_time)
+    file_name = time.strftime(raw_file_format.format(server=server), current_time).lower()
+    return os.path.join(cloudbot.logging_dir, "raw", folder_name, file_name)
+
+
+def check_rotation(now):
+    """
+    Flushes the buffers and drops the cached file names and streams if the date has changed since they were created
+    """
+    global rotate_at
+    if now < rotate_at:
+        return
+
+    flush_buffers()
+    close_streams()
+    filename_cache.clear()
+    # The file and folder names only contain the UTC date, so they can only change at midnight UTC
+    rotate_at = (now // 86400 + 1) * 86400
+
+
+def get_cached_filename(server, chan):
+    key = (server, chan)
+    file_name = filename_cache.get(key)
+    if file_name is None:
+        if chan is None:
+            file_name = get_raw_log_filename(server)
+        else:
+            # a dumb hack to bypass the fact windows does not allow * in file names
+            file_name = get_log_filename(server, chan).replace("*", "server")
+
+        filename_cache[key] = file_name
+
+    return file_name
 
-    # If the filename has changed since we opened the stream, we should re-open
-    if new_filename != old_filename:
-        # If we had a stream open before, we should close it
-        if log_stream is not None:
-            log_stream.flush()
-            log_stream.close()
 
-        logging_dir = os.path.dirname(new_filename)
-        os.makedirs(logging_dir, exist_ok=True)
+def buffer_line(file_name, line):
+    global buffered_lines
+    buffers.setdefault(file_name, []).append(line)
+    buffered_lines += 1
 
-        # a dumb hack to bypass the fact windows does not allow * in file names
-        new_filename = new_filename.replace("*", "server")
 
-        log_stream = codecs.open(new_filename, mode="a", encoding="utf-8", buffering=1)
-        stream_cache[cache_key] = (new_filename, log_stream)
+def get_log_stream(file_name):
+    log_stream = stream_cache.get(file_name)
+    if log_stream is None:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        log_stream = codecs.open(file_name, mode="a", encoding="utf-8")
+        stream_cache[file_name] = log_stream
 
     return log_stream
 
 
-def get_raw_log_filename(server):
-    current_time = time.gmtime()
-    folder_name = time.strftime(folder_format, current_time)
-    file_name = time.strftime(raw_file_format.format(server=server), current_time).lower()
-    return os.path.join(cloudbot.logging_dir, "raw", folder_name, file_name)
+def close_stream(file_name):
+    stream = stream_cache.pop(file_name, None)
+    if stream is not None:
+        try:
+            stream.close()
+        except Exception:
+            logger.exception("Error closing log file %s", file_name)
 
 
-def get_raw_log_stream(server):
-    new_filename = get_raw_log_filename(server)
-    old_filename, log_stream = stream_cache.get(server, (None, None))
+def flush_buffers():
+    """
+    Writes all buffered lines to their files
+
+    Lines for a file which can't be written are kept for the next flush, so one bad file doesn't lose the others' lines
+    """
+    global buffered_lines, last_flush
+    with buffer_lock:
+        for file_name in list(buffers):
+            lines = buffers[file_name]
+            try:
+                stream = get_log_stream(file_name)
+                stream.write(os.linesep.join(lines) + os.linesep)
+                stream.flush()
+            except Exception:
+                logger.exception("Unable to write %d lines to %s, keeping them for the next flush",
+                                 len(lines), file_name)
+                # the stream may be broken, open it again next time
+                close_stream(file_name)
+                del lines[:-MAX_RETAINED_LINES]
+            else:
+                del buffers[file_name]
 
-    # If the filename has changed since we opened the stream, we should re-open
-    if new_filename != old_filename:
-        # If we had a stream open before, we should close it
-        if log_stream is not None:
-            log_stream.flush()
-            log_stream.close()
+        # kept lines don't count, so they're retried on the next interval instead of with every batch
+        buffered_lines = 0
+        last_flush = time.time()
 
-        logging_dir = os.path.dirname(new_filename)
-        os.makedirs(logging_dir, exist_ok=True)
 
-        log_stream = codecs.open(new_filename, mode="a", encoding="utf-8", buffering=1)
-        stream_cache[server] = (new_filename, log_stream)
+def close_streams():
+    with buffer_lock:
+        for file_name in list(stream_cache):
+            close_stream(file_name)
 
-    return log_stream
+
+def maybe_flush(logging_config, now):
+    flush_lines = logging_config.get("flush_lines", FLUSH_LINES)
+    flush_interval = logging_config.get("flush_interval", FLUSH_INTERVAL)
+    if buffered_lines >= flush_lines or (buffers and now - last_flush >= flush_interval):
+        flush_buffers()
 
 
-@hook.irc_raw("*", singlethread=True)
-def log_raw(event):
+@hook.irc_raw("*", singlethread=True, batch=LOG_BATCH)
+def log_raw(bot, events):
     """
-    :type event: cloudbot.event.Event
+    :type bot: cloudbot.bot.CloudBot
+    :type events: list[cloudbot.event.Event]
     """
-    logging_config = event.bot.config.get("logging", {})
+    logging_config = bot.config.get("logging", {})
     if not logging_config.get("raw_file_log", False):
         return
 
-    stream = get_raw_log_stream(event.conn.name)
-    stream.write(event.irc_raw + os.linesep)
-    stream.flush()
+    now = time.time()
+    with buffer_lock:
+        check_rotation(now)
+        for event in events:
+            buffer_line(get_cached_filename(event.conn.name, None), event.irc_raw)
 
+        maybe_flush(logging_config, now)
 
-@hook.irc_raw("*", singlethread=True)
-def log(event):
+
+@hook.irc_raw("*", singlethread=True, batch=LOG_BATCH)
+def log(bot, events):
     """
-    :type event: cloudbot.event.Event
+    :type bot: cloudbot.bot.CloudBot
+    :type events: list[cloudbot.event.Event]
     """
-    logging_config = event.bot.config.get("logging", {})
+    logging_config = bot.config.get("logging", {})
     if not logging_config.get("file_log", False):
         return
 
-    text = format_event(event)
+    now = time.time()
+    with buffer_lock:
+        check_rotation(now)
+        for event in events:
+            if event.irc_command not in ["PRIVMSG", "PART", "JOIN", "MODE", "TOPIC", "QUIT", "NOTICE"] \
+                    or not event.chan:
+                continue
 
-    if text is not None:
-        if event.irc_command in ["PRIVMSG", "PART", "JOIN", "MODE", "TOPIC", "QUIT", "NOTICE"] and event.chan:
-            stream = get_log_stream(event.conn.name, event.chan)
-            stream.write(text + os.linesep)
-            stream.flush()
+            text = format_event(event)
+            if text is not None:
+                buffer_line(get_cached_filename(event.conn.name, event.chan), text)
+
+        maybe_flush(logging_config, now)
+
+
+@hook.periodic(FLUSH_INTERVAL, initial_interval=FLUSH_INTERVAL)
+def flush_periodic(bot):
+    """
+    :type bot: cloudbot.bot.CloudBot
+    """
+    with buffer_lock:
+        maybe_flush(bot.config.get("logging", {}), time.time())
 
 
 # Log console separately to prevent lag
@@ -247,18 +340,11 @@ def console_log(bot, event):
 
 @hook.command("flushlog", permissions=["botcontrol"])
 def flush_log():
-    for name, stream in stream_cache.values():
-        stream.flush()
-    for name, stream in raw_cache.values():
-        stream.flush()
+    flush_buffers()
 
 
 @hook.on_stop
 def close_logs():
-    for name, stream in stream_cache.values():
-        stream.flush()
-        stream.close()
-
-    for name, stream in raw_cache.values():
-        stream.flush()
-        stream.close()
+    with buffer_lock:
+        flush_buffers()
+        close_streams()
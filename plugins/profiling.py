@@ -70,6 +70,25 @@ def threaddump_command():
     return get_thread_dump()
 
 
+def format_executor_stats(stats):
+    """
+    :type stats: dict[str, dict]
+    :rtype: str
+    """
+    return "; ".join(
+        "{}: {running}/{size} running, {queue_length} queued, {completed} done, "
+        "wait {avg_wait:.2f}s avg {max_wait:.2f}s max, run {avg_run:.2f}s avg".format(name, **pool)
+        for name, pool in sorted(stats.items())
+    )
+
+
+@hook.command("executors", autohelp=False, permissions=["botcontrol"])
+@asyncio.coroutine
+def executors_command(bot):
+    """- Shows how busy each thread pool for threaded hooks is"""
+    return format_executor_stats(bot.executors.stats())
+
+
 @hook.command("objtypes", autohelp=False, permissions=["botcontrol"])
 def show_types():
     if objgraph is None:
@@ -8,6 +8,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from cloudbot import hook
 from cloudbot.util import database
 from cloudbot.util.pager import paginated_list
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 search_pages = defaultdict(dict)
 
@@ -28,18 +29,40 @@ grab_locks_lock = RLock()
 cache_lock = RLock()
 
 
+def _read_cache(db):
+    new_cache = {}
+    for row in db.execute(table.select().order_by(table.c.time)):
+        name = row["name"].lower()
+        quote = row["quote"]
+        chan = row["chan"]
+        new_cache.setdefault(chan, {}).setdefault(name, []).append(quote)
+
+    return new_cache
+
+
+def _install_cache(new_cache):
+    grab_cache.clear()
+    grab_cache.update(new_cache)
+
+
+def _snapshot():
+    return {chan: {name: list(quotes) for name, quotes in names.items()} for chan, names in grab_cache.items()}
+
+
+cache = WriteThroughCache("quote", _read_cache, _install_cache, _snapshot, cache_lock)
+
+
 @hook.on_start()
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
     """
-    with cache_lock:
-        grab_cache.clear()
-        for row in db.execute(table.select().order_by(table.c.time)):
-            name = row["name"].lower()
-            quote = row["quote"]
-            chan = row["chan"]
-            grab_cache.setdefault(chan, {}).setdefault(name, []).append(quote)
+    cache.load(db)
+
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
 
 
 @hook.command("morequote", "qm", "moregrab", autohelp=False)
@@ -80,9 +103,10 @@ def check_grabs(name, quote, chan):
 
 def grab_add(nick, time, msg, chan, db):
     # Adds a quote to the grab table
-    db.execute(table.insert().values(name=nick, time=time, quote=msg, chan=chan))
-    db.commit()
-    load_cache(db)
+    def apply():
+        grab_cache.setdefault(chan, {}).setdefault(nick.lower(), []).append(msg)
+
+    cache.write(db, table.insert().values(name=nick, time=time, quote=msg, chan=chan), apply=apply)
 
 
 def get_latest_line(conn, chan, nick):
@@ -35,12 +35,27 @@ table = Table(
 )
 
 
-@asyncio.coroutine
-def delete_reminder(async_call, db, network, remind_time, user):
-    query = table.delete() \
+def _delete_reminder_query(network, remind_time, user):
+    return table.delete() \
         .where(table.c.network == network.lower()) \
         .where(table.c.remind_time == remind_time) \
         .where(table.c.added_user == user.lower())
+
+
+def _add_reminder_query(network, added_user, added_chan, message, remind_time, added_time):
+    return table.insert().values(
+        network=network.lower(),
+        added_user=added_user.lower(),
+        added_time=added_time,
+        added_chan=added_chan.lower(),
+        message=message,
+        remind_time=remind_time
+    )
+
+
+@asyncio.coroutine
+def delete_reminder(async_call, db, network, remind_time, user):
+    query = _delete_reminder_query(network, remind_time, user)
     yield from async_call(db.execute, query)
     yield from async_call(db.commit)
 
@@ -56,14 +71,7 @@ def delete_all(async_call, db, network, user):
 
 @asyncio.coroutine
 def add_reminder(async_call, db, network, added_user, added_chan, message, remind_time, added_time):
-    query = table.insert().values(
-        network=network.lower(),
-        added_user=added_user.lower(),
-        added_time=added_time,
-        added_chan=added_chan.lower(),
-        message=message,
-        remind_time=remind_time
-    )
+    query = _add_reminder_query(network, added_user, added_chan, message, remind_time, added_time)
     yield from async_call(db.execute, query)
     yield from async_call(db.commit)
 
@@ -80,12 +88,26 @@ def load_cache(async_call, db):
 
 def _load_cache_db(db):
     query = db.execute(table.select())
-    return [(row["network"], row["added_user"], row["added_time"], row["added_chan"], row["message"], row["remind_time"]) for row in query]
+    return _cache_rows(query)
+
+
+def _cache_rows(rows):
+    return [(row["network"], row["added_user"], row["added_time"], row["added_chan"], row["message"], row["remind_time"]) for row in rows]
+
+
+@asyncio.coroutine
+def reload_cache(async_db):
+    """
+    :type async_db: cloudbot.util.async_db.AsyncDatabase
+    """
+    global reminder_cache
+    reminder_cache = _cache_rows((yield from async_db.fetch(table.select())))
 
 
 @hook.periodic(30, initial_interval=30)
 @asyncio.coroutine
-def check_reminders(bot, async_call, db):
+def check_reminders(bot):
+    async_db = bot.async_db
     current_time = datetime.now()
 
     for reminder in reminder_cache:
@@ -93,8 +115,10 @@ def check_reminders(bot, async_call, db):
         if remind_time <= current_time:
             if network not in bot.connections:
                 # connection is invalid
-                yield from add_reminder(async_call, db, network, user, added_chan, message, remind_time, added_time)
-                yield from load_cache(async_call, db)
+                yield from async_db.execute(
+                    _add_reminder_query(network, user, added_chan, message, remind_time, added_time)
+                )
+                yield from reload_cache(async_db)
                 continue
 
             conn = bot.connections[network]
@@ -115,8 +139,8 @@ def check_reminders(bot, async_call, db):
                        " it seems I was unable to deliver it on time)".format(late_time)
                 conn.message(user, late)
 
-            yield from delete_reminder(async_call, db, network, remind_time, user)
-            yield from load_cache(async_call, db)
+            yield from async_db.execute(_delete_reminder_query(network, remind_time, user))
+            yield from reload_cache(async_db)
 
 
 @hook.command('remind', 'reminder', 'in')
@@ -1,11 +1,14 @@
+from collections import Counter
 from datetime import datetime
+from functools import partial
 
-from sqlalchemy import Table, Column, String, Boolean, DateTime
+from sqlalchemy import Table, Column, String, Boolean, DateTime, Index
 from sqlalchemy.sql import select
 
 from cloudbot import hook
 from cloudbot.event import EventType
 from cloudbot.util import timeformat, database
+from cloudbot.util.write_through import WriteThroughCache, CHECK_INTERVAL, initial_check_delay
 
 table = Table(
     'tells',
@@ -16,21 +19,53 @@ table = Table(
     Column('message', String(500)),
     Column('is_read', Boolean),
     Column('time_sent', DateTime),
-    Column('time_read', DateTime)
+    Column('time_read', DateTime),
+    Index('tells_target', 'connection', 'target', 'is_read')
 )
 
 
+# (connection, target) -> number of unread tells, both lower-case as stored in the table
+pending_tells = Counter()
+
+
+def _read_cache(db):
+    new_cache = Counter()
+    for row in db.execute(select([table.c.connection, table.c.target]).where(table.c.is_read == 0)):
+        new_cache[(row["connection"], row["target"])] += 1
+
+    return new_cache
+
+
+def _install_cache(new_cache):
+    pending_tells.clear()
+    pending_tells.update(new_cache)
+
+
+cache = WriteThroughCache("tell", _read_cache, _install_cache, lambda: dict(pending_tells))
+
+
 @hook.on_start
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
     """
-    global tell_cache
-    tell_cache = []
-    for row in db.execute(table.select().where(table.c.is_read == 0)):
-        conn = row["connection"]
-        target = row["target"]
-        tell_cache.append((conn, target))
+    cache.load(db)
+
+
+@hook.periodic(CHECK_INTERVAL, initial_interval=initial_check_delay())
+def check_cache(db):
+    cache.check(db)
+
+
+def _set_unread(server, target, count):
+    """
+    Sets the number of cached unread tells for a target
+    """
+    key = (server.lower(), target.lower())
+    if count:
+        pending_tells[key] = count
+    else:
+        pending_tells.pop(key, None)
 
 
 def get_unread(db, server, target):
@@ -58,9 +93,7 @@ def read_all_tells(db, server, target):
         .where(table.c.target == target.lower()) \
         .where(table.c.is_read == 0) \
         .values(is_read=1)
-    db.execute(query)
-    db.commit()
-    load_cache(db)
+    cache.write(db, query, apply=partial(_set_unread, server, target, 0))
 
 
 def read_tell(db, server, target, message):
@@ -69,9 +102,13 @@ def read_tell(db, server, target, message):
         .where(table.c.target == target.lower()) \
         .where(table.c.message == message) \
         .values(is_read=1)
-    db.execute(query)
-    db.commit()
-    load_cache(db)
+
+    cache.write(db, query)
+    # more than one unread tell may have had the same message, so count the rest. This is done before taking the lock,
+    # to keep database reads out of it.
+    count = count_unread(db, server, target)
+    with cache.lock:
+        _set_unread(server, target, count)
 
 
 def add_tell(db, server, sender, target, message):
@@ -83,49 +120,60 @@ def add_tell(db, server, sender, target, message):
         is_read=False,
         time_sent=datetime.today()
     )
-    db.execute(query)
-    db.commit()
-    load_cache(db)
+
+    def apply():
+        pending_tells[(server.lower(), target.lower())] += 1
+
+    cache.write(db, query, apply=apply)
 
 
 def tell_check(conn, nick):
-    for _conn, _target in tell_cache:
-        if (conn, nick.lower()) == (_conn, _target):
-            return True
-        else:
-            continue
+    return (conn.lower(), nick.lower()) in pending_tells
 
 
 @hook.event(EventType.message, singlethread=True)
-def tellinput(event, conn, db, nick, notice):
+def tellinput(event, conn, bot, nick, notice):
     """
     :type event: cloudbot.event.Event
     :type conn: cloudbot.client.Client
-    :type db: sqlalchemy.orm.Session
+    :type bot: cloudbot.bot.CloudBot
     """
+    if not tell_check(conn.name, nick):
+        return
+
     if 'showtells' in event.content.lower():
         return
 
-    if tell_check(conn.name, nick):
-        tells = get_unread(db, conn.name, nick)
-    else:
+    # only open a session once we know there's something to deliver
+    db = bot.db_session()
+    try:
+        deliver_tells(db, conn, nick, notice)
+    finally:
+        db.close()
+
+
+def deliver_tells(db, conn, nick, notice):
+    tells = get_unread(db, conn.name, nick)
+    if not tells:
+        # the index was out of date, don't keep opening sessions for this nick
+        with cache.lock:
+            _set_unread(conn.name, nick, 0)
         return
 
-    if tells:
-        user_from, message, time_sent = tells[0]
-        reltime = timeformat.time_since(time_sent)
+    user_from, message, time_sent = tells[0]
+    reltime = timeformat.time_since(time_sent)
 
-        if reltime == 0:
-            reltime_formatted = "just a moment"
-        else:
-            reltime_formatted = reltime
+    if reltime == 0:
+        reltime_formatted = "just a moment"
+    else:
+        reltime_formatted = reltime
 
-        reply = "{} sent you a message {} ago: {}".format(user_from, reltime_formatted, message)
-        if len(tells) > 1:
-            reply += " (+{} more, {}showtells to view)".format(len(tells) - 1, conn.config["command_prefix"][0])
+    reply = "{} sent you a message {} ago: {}".format(user_from, reltime_formatted, message)
+    if len(tells) > 1:
+        reply += " (+{} more, {}showtells to view)".format(len(tells) - 1, conn.config["command_prefix"][0])
 
-        read_tell(db, conn.name, nick, message)
-        notice(reply)
+    read_tell(db, conn.name, nick, message)
+    notice(reply)
 
 
 @hook.command(autohelp=False)
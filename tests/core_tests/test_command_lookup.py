@@ -0,0 +1,144 @@
+import asyncio
+from bisect import insort
+from types import ModuleType
+
+from cloudbot import hook
+from cloudbot.bot import CloudBot
+from cloudbot.event import Event, EventType
+from cloudbot.plugin import PluginManager, Plugin
+from cloudbot.util.executors import ExecutorRegistry
+
+OPS = {"op"}
+
+
+class MockBot:
+    def __init__(self, loop):
+        self.loop = loop
+        self.config = {}
+        self.executors = ExecutorRegistry()
+
+
+class MockPermissions:
+    def has_perm_mask(self, mask, perm, notice=True):
+        return False
+
+
+class MockConn:
+    name = "testconn"
+    nick = "bot"
+    type = "irc"
+
+    def __init__(self):
+        self.config = {"command_prefix": "."}
+        self.permissions = MockPermissions()
+        self.messages = []
+
+    def message(self, target, *messages):
+        self.messages.extend((target, message) for message in messages)
+
+
+def make_plugin():
+    ran = []
+
+    @hook.command("chanopcmd", "chanopalias", permissions=["chanop"])
+    def chanop_cmd():
+        ran.append("chanopcmd")
+
+    @hook.command("chanother")
+    def other_cmd():
+        ran.append("chanother")
+
+    @hook.command("unrelated")
+    def unrelated_cmd():
+        ran.append("unrelated")
+
+    @hook.permission("chanop")
+    def perm_check(event, nick):
+        # permission hooks are prepared like any other hook, which needs event.hook
+        assert event.hook is not None
+        return nick in OPS
+
+    module = ModuleType("plugins.test_commands")
+    for func in (chanop_cmd, other_cmd, unrelated_cmd, perm_check):
+        setattr(module, func.__name__, func)
+
+    return Plugin("/plugins/test_commands.py", "test_commands.py", "test_commands", module), ran
+
+
+def make_bot(loop):
+    mock_bot = MockBot(loop)
+    manager = PluginManager(mock_bot)
+    mock_bot.plugin_manager = manager
+    plugin, ran = make_plugin()
+
+    # register the hooks the same way load_plugin() does
+    for command_hook in plugin.hooks["command"]:
+        for alias in command_hook.aliases:
+            manager.commands[alias] = command_hook
+            insort(manager._command_aliases, alias)
+
+    for perm_hook in plugin.hooks["perm_check"]:
+        for perm in perm_hook.perms:
+            manager.perm_hooks[perm].append(perm_hook)
+
+    bot = CloudBot.__new__(CloudBot)
+    bot.loop = loop
+    bot.plugin_manager = manager
+    bot._command_matchers = {}
+    mock_bot.get_command_matcher = bot.get_command_matcher
+    return bot, mock_bot, ran
+
+
+def test_find_commands():
+    loop = asyncio.new_event_loop()
+    try:
+        bot, _, _ = make_bot(loop)
+        manager = bot.plugin_manager
+        assert [alias for alias, _ in manager.find_commands("chan")] == ["chanopalias", "chanopcmd", "chanother"]
+        assert [alias for alias, _ in manager.find_commands("chano")] == ["chanopalias", "chanopcmd", "chanother"]
+        assert [alias for alias, _ in manager.find_commands("chanop")] == ["chanopalias", "chanopcmd"]
+        assert [alias for alias, _ in manager.find_commands("u")] == ["unrelated"]
+        assert manager.find_commands("z") == []
+        assert manager.find_commands("unrelatedx") == []
+        assert len(manager.find_commands("")) == 4
+        assert all(manager.commands[alias] is _hook for alias, _hook in manager.find_commands("c"))
+    finally:
+        loop.close()
+
+
+def _process(loop, bot, mock_bot, nick, content):
+    conn = MockConn()
+    event = Event(
+        bot=mock_bot, conn=conn, event_type=EventType.message, content=content, channel="#chan", nick=nick,
+        user="user", host="host", mask=nick + "!user@host", irc_command="PRIVMSG"
+    )
+    loop.run_until_complete(bot.process(event))
+    return conn.messages
+
+
+def test_partial_command_permissions():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        bot, mock_bot, ran = make_bot(loop)
+
+        # a chanop is offered both commands
+        assert _process(loop, bot, mock_bot, "op", ".chan") == [
+            ("#chan", "(op) Possible matches: chanopalias/chanopcmd, chanother")
+        ]
+        assert ran == []
+
+        # everyone else only matches the unrestricted one, which is run
+        assert _process(loop, bot, mock_bot, "someone", ".chan") == []
+        assert ran == ["chanother"]
+
+        del ran[:]
+        assert _process(loop, bot, mock_bot, "op", ".chanop") == []
+        assert ran == ["chanopcmd"]
+
+        del ran[:]
+        assert _process(loop, bot, mock_bot, "someone", ".chanop") == []
+        assert ran == []
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
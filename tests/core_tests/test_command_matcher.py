@@ -0,0 +1,104 @@
+import re
+
+from cloudbot.bot import CommandMatcher
+
+PREFIXES = (".", ".!", "c", "cC", "^$", "-")
+NICKS = ("CloudBot", "bot", "c")
+
+CONTENTS = (
+    "",
+    ".foo",
+    ".foo bar baz",
+    "!foo",
+    "foo",
+    "Cfoo",
+    "cfoo",
+    "cfoo bar",
+    "c foo",
+    "..foo",
+    "text ..foo bar",
+    "text CCfoo bar",
+    "text ccfoo",
+    "text .foo",
+    "^foo",
+    "$$foo",
+    "-foo",
+    "--foo",
+    "cloudbot: foo bar",
+    "CloudBot, foo",
+    "CLOUDBOT; foo",
+    "cloudbot foo",
+    "bot: foo",
+    "c: foo",
+    "C: foo",
+    "nothing to see here",
+    ". foo",
+    ".",
+)
+
+
+def old_match(prefix, nick, content, is_pm):
+    """
+    The regexes as they were compiled for every message before CommandMatcher
+    """
+    command_prefix = re.escape(prefix)
+    conn_nick = re.escape(nick)
+    match = re.search(
+        r"""
+        ^
+        # Prefix or nick
+        (?:
+            (?P<prefix>[""" + command_prefix + r"""])""" + ('?' if is_pm else '') + r"""
+            |
+            """ + conn_nick + r"""[,;:]+\s+
+        )
+        (?P<command>\w+)  # Command
+        (?:$|\s+)
+        (?P<text>.*)     # Text
+        """,
+        content,
+        re.IGNORECASE | re.VERBOSE
+    )
+    if not match:
+        match = re.search(
+            r"""
+            (?:^|\s+)
+            (?P<prefix>[""" + command_prefix + r"""]){2}
+            (?P<command>\w+)
+            (?:$|\s+)
+            (?P<text>.*)
+            """,
+            content,
+            re.IGNORECASE | re.VERBOSE
+        )
+    return match
+
+
+def _result(match):
+    if match is None:
+        return None
+
+    return match.span(), match.groupdict()
+
+
+def test_matches_old_regexes():
+    for prefix in PREFIXES:
+        for nick in NICKS:
+            matcher = CommandMatcher(prefix, nick)
+            for content in CONTENTS:
+                for is_pm in (False, True):
+                    expected = _result(old_match(prefix, nick, content, is_pm)) if content else None
+                    assert _result(matcher.match(content, is_pm)) == expected, (prefix, nick, content, is_pm)
+
+
+def test_letter_prefix_ignores_case():
+    matcher = CommandMatcher("c", "bot")
+    assert matcher.match("Cfoo bar").group("command") == "foo"
+    assert matcher.match("text CCfoo").group("command") == "foo"
+
+
+def test_is_current():
+    matcher = CommandMatcher(".", "bot")
+    assert matcher.is_current(".", "bot")
+    assert not matcher.is_current("!", "bot")
+    assert not matcher.is_current(".", "bot2")
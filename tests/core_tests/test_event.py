@@ -0,0 +1,94 @@
+from cloudbot.event import Event, CommandEvent, EventType
+
+
+class MockHook:
+    doc = None
+
+
+def make_event():
+    return Event(
+        event_type=EventType.message, content="hello", channel="#chan", nick="nick", user="user", host="host",
+        mask="nick!user@host", irc_command="PRIVMSG", irc_paramlist=["#chan", "hello"]
+    )
+
+
+def test_derived_events_share_data():
+    base = make_event()
+    derived = Event(base_event=base)
+    command = CommandEvent(base_event=base, hook=MockHook(), text="", triggered_command="foo", cmd_prefix=".")
+
+    assert derived._data is base._data
+    assert command._data is base._data
+    assert derived.content == "hello"
+    assert command.chan == "#chan"
+
+
+def test_derived_event_copies_on_write():
+    base = make_event()
+    derived = Event(base_event=base)
+    other = Event(base_event=base)
+
+    derived.content = "changed"
+
+    assert derived.content == "changed"
+    assert derived._data is not base._data
+    assert base.content == "hello"
+    assert other.content == "hello"
+    assert other._data is base._data
+
+    # further writes go to the event's own copy
+    shared = derived._data
+    derived.chan = "#other"
+    assert derived._data is shared
+    assert base.chan == "#chan"
+
+
+def test_base_event_copies_on_write():
+    base = make_event()
+    derived = Event(base_event=base)
+
+    base.nick = "newnick"
+
+    assert base.nick == "newnick"
+    assert derived.nick == "nick"
+
+
+def test_event_without_derived_events_writes_in_place():
+    event = make_event()
+    data = event._data
+
+    event.content = "changed"
+
+    assert event._data is data
+    assert event.content == "changed"
+
+
+def test_getitem():
+    event = make_event()
+    assert event["nick"] == "nick"
+    assert event["irc_paramlist"] == ["#chan", "hello"]
+
+
+def test_line_cache_shared():
+    base = make_event()
+    derived = Event(base_event=base)
+    other = Event(base_event=base)
+
+    # created lazily by whichever event asks first, and still shared
+    derived.line_cache["key"] = "value"
+    assert base.line_cache == {"key": "value"}
+    assert other.line_cache is derived.line_cache
+
+
+def test_line_cache_reset_on_write():
+    base = make_event()
+    base.line_cache["ignore.is_ignored"] = False
+    derived = Event(base_event=base)
+
+    # a result cached for the original channel mustn't be used for the rewritten one
+    derived.chan = "#other"
+    assert derived.line_cache == {}
+    assert base.line_cache == {"ignore.is_ignored": False}
+
+    derived.line_cache["ignore.is_ignored"] = True
+    assert base.line_cache == {"ignore.is_ignored": False}
@@ -0,0 +1,83 @@
+import asyncio
+
+from cloudbot.clients.irc import _IrcProtocol
+
+
+class MockConn:
+    name = "testconn"
+    bot = None
+
+    def __init__(self, loop):
+        self.loop = loop
+
+
+class RecordingProtocol(_IrcProtocol):
+    def __init__(self, conn):
+        super().__init__(conn)
+        self.lines = []
+
+    def _handle_line(self, line_data):
+        self.lines.append(bytes(line_data))
+
+
+def make_protocol():
+    loop = asyncio.new_event_loop()
+    return RecordingProtocol(MockConn(loop)), loop
+
+
+def feed(chunks):
+    proto, loop = make_protocol()
+    try:
+        for chunk in chunks:
+            proto.data_received(chunk)
+    finally:
+        loop.close()
+
+    return proto
+
+
+def test_crlf_lines():
+    proto = feed([b"PING :a\r\nPING :b\r\n"])
+    assert proto.lines == [b"PING :a", b"PING :b"]
+    assert proto._input_buffer == b""
+
+
+def test_bare_lf_lines():
+    proto = feed([b"PING :a\nPING :b\r\nPING :c\n"])
+    assert proto.lines == [b"PING :a", b"PING :b", b"PING :c"]
+
+
+def test_partial_line_kept():
+    proto = feed([b"PING :a\r\nPING :b"])
+    assert proto.lines == [b"PING :a"]
+    assert proto._input_buffer == b"PING :b"
+
+    proto.data_received(b"c\r\n")
+    assert proto.lines == [b"PING :a", b"PING :bc"]
+    assert proto._input_buffer == b""
+
+
+def test_split_chunks():
+    data = b":nick!user@host PRIVMSG #chan :hello\r\n:server 001 bot :Welcome\nPING :x\r\n"
+    expected = [b":nick!user@host PRIVMSG #chan :hello", b":server 001 bot :Welcome", b"PING :x"]
+    for size in range(1, len(data) + 1):
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        proto = feed(chunks)
+        assert proto.lines == expected, size
+        assert proto._input_buffer == b""
+
+
+def test_cr_split_from_lf():
+    proto = feed([b"PING :a\r", b"\nPING :b\r", b"\n"])
+    assert proto.lines == [b"PING :a", b"PING :b"]
+
+
+def test_empty_lines():
+    proto = feed([b"\r\n\nPING :a\r\n"])
+    assert proto.lines == [b"", b"", b"PING :a"]
+
+
+def test_lone_cr_kept():
+    # only a CR right before the LF is part of the terminator
+    proto = feed([b"PING :a\rb\r\n"])
+    assert proto.lines == [b"PING :a\rb"]
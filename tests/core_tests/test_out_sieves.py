@@ -0,0 +1,155 @@
+from operator import attrgetter
+from types import ModuleType
+
+from cloudbot import hook
+from cloudbot.hook import Priority
+from cloudbot.plugin import PluginManager, Plugin
+from cloudbot.util.parsers.irc import Message
+
+
+class MockBot:
+    loop = None
+    config = {}
+
+
+class MockConn:
+    name = "testconn"
+
+    def __init__(self, config=None):
+        self.config = config or {}
+
+
+def make_hooks(*funcs):
+    module = ModuleType("plugins.test_out")
+    for func in funcs:
+        setattr(module, func.__name__, func)
+
+    plugin = Plugin("/plugins/test_out.py", "test_out.py", "test_out", module)
+    return tuple(sorted(plugin.hooks["irc_out"], key=attrgetter("priority")))
+
+
+def run(hooks, line, conn=None):
+    manager = PluginManager(MockBot())
+    return manager.run_inline_out_sieves(hooks, conn or MockConn(), line)
+
+
+def test_runs_in_order():
+    @hook.irc_out(priority=Priority.HIGH)
+    def first(line):
+        return line + " a"
+
+    @hook.irc_out(priority=Priority.LOW)
+    def second(line):
+        return line + " b"
+
+    hooks = make_hooks(second, first)
+    assert all(_hook.inline for _hook in hooks)
+    assert run(hooks, "PRIVMSG #chan :x") == (True, "PRIVMSG #chan :x a b")
+
+
+def test_empty_line_stops():
+    called = []
+
+    @hook.irc_out(priority=Priority.HIGH)
+    def drop(line):
+        return ""
+
+    @hook.irc_out(priority=Priority.LOW)
+    def after(line):
+        called.append(line)
+        return line
+
+    assert run(make_hooks(drop, after), "PRIVMSG #chan :x") == (True, "")
+    assert called == []
+
+
+def test_error():
+    @hook.irc_out(priority=Priority.HIGH)
+    def change(line):
+        return line + " a"
+
+    @hook.irc_out(priority=Priority.LOW)
+    def broken(line):
+        raise ValueError()
+
+    # the line as it was before the failing hook
+    assert run(make_hooks(change, broken), "PRIVMSG #chan :x") == (False, "PRIVMSG #chan :x a")
+
+
+def test_parsed_line_shared(monkeypatch):
+    parsed = []
+    parse = Message.parse
+
+    def counting_parse(line):
+        parsed.append(line)
+        return parse(line)
+
+    monkeypatch.setattr(Message, "parse", staticmethod(counting_parse))
+
+    seen = []
+
+    @hook.irc_out(priority=Priority.HIGHEST)
+    def look(parsed_line, line):
+        seen.append(parsed_line)
+        return line
+
+    @hook.irc_out(priority=Priority.HIGH)
+    def modify(parsed_line):
+        seen.append(parsed_line)
+        parsed_line.parameters[-1] = "changed"
+        return parsed_line
+
+    @hook.irc_out(priority=Priority.NORMAL)
+    def look_again(parsed_line, line):
+        seen.append(parsed_line)
+        return line
+
+    @hook.irc_out(priority=Priority.LOW)
+    def rewrite(line):
+        return line + " more"
+
+    @hook.irc_out(priority=Priority.LOWEST)
+    def look_last(parsed_line, line):
+        seen.append(parsed_line)
+        return line
+
+    ok, line = run(make_hooks(look, modify, look_again, rewrite, look_last), "PRIVMSG #chan :x")
+
+    assert ok
+    assert line == "PRIVMSG #chan :changed more"
+    # parsed once for the first three hooks, and again after the line was rewritten
+    assert parsed == ["PRIVMSG #chan :x", "PRIVMSG #chan :changed more"]
+    assert seen[0] is seen[1] is seen[2]
+    assert seen[3] is not seen[0]
+    assert seen[3].parameters[-1] == "changed more"
+
+
+def test_unparseable_line(monkeypatch):
+    def broken_parse(line):
+        raise ValueError(line)
+
+    monkeypatch.setattr(Message, "parse", staticmethod(broken_parse))
+    seen = []
+
+    @hook.irc_out
+    def look(parsed_line, line):
+        seen.append(parsed_line)
+        return line
+
+    assert run(make_hooks(look), "PRIVMSG #chan :x") == (True, "PRIVMSG #chan :x")
+    assert seen == [None]
+
+
+def test_core_out():
+    from plugins.core import core_out
+    plugin = Plugin("/plugins/core/core_out.py", "core_out.py", "core.core_out", core_out)
+    hooks = tuple(sorted(plugin.hooks["irc_out"], key=attrgetter("priority")))
+    assert all(_hook.inline for _hook in hooks)
+
+    assert run(hooks, "PRIVMSG #chan :hi\r\nQUIT") == (True, b"PRIVMSG #chan :hiQUIT\r\n")
+    ok, line = run(hooks, "PRIVMSG #chan :.cmd")
+    assert ok
+    assert line.endswith(b"[!!]\x0f .cmd\r\n")
+    assert run(hooks, "PRIVMSG #chan :" + "a" * 600, MockConn({"max_line_length": 20})) == (
+        True, b"PRIVMSG #chan :aaaaa\r\n"
+    )
@@ -0,0 +1,73 @@
+from copy import deepcopy
+from fnmatch import fnmatch
+
+from cloudbot.permissions import PermissionManager, MaskMatcher
+
+
+class MockConn:
+    name = "testconn"
+
+    def __init__(self, permissions):
+        self.config = {"permissions": deepcopy(permissions)}
+
+
+PERMISSIONS = {
+    "admins": {
+        "perms": ["botcontrol", "op"],
+        "users": ["Admin!user@host", "*!*@staff.example.com"]
+    },
+    "moderators": {
+        "perms": ["op"],
+        "users": ["mod?!*@*", "*!*@[ab]*.example.org"]
+    },
+}
+
+USERS = (
+    "admin!user@host",
+    "Admin!User@Host",
+    "someone!u@staff.example.com",
+    "mod1!u@h",
+    "mod12!u@h",
+    "x!u@a1.example.org",
+    "x!u@c1.example.org",
+)
+
+
+def test_mask_matcher():
+    masks = ["exact!user@host", "*!*@host", "n?ck!*@*", "[ab]*!*@*"]
+    matcher = MaskMatcher(masks)
+    for user in ("exact!user@host", "x!y@host", "nick!a@b", "nicks!a@b", "a!b@c", "c!b@a"):
+        assert matcher.matches(user) == any(fnmatch(user, mask) for mask in masks), user
+
+
+def test_has_perm_mask():
+    manager = PermissionManager(MockConn(PERMISSIONS))
+    assert manager.has_perm_mask("Admin!User@Host", "BotControl")
+    assert manager.has_perm_mask("someone!u@staff.example.com", "op")
+    assert manager.has_perm_mask("mod1!u@h", "op")
+    assert not manager.has_perm_mask("mod12!u@h", "op")
+    assert not manager.has_perm_mask("mod1!u@h", "botcontrol")
+    assert not manager.has_perm_mask("admin!user@host", "unknown")
+
+
+def test_user_lookups():
+    manager = PermissionManager(MockConn(PERMISSIONS))
+    assert manager.get_user_permissions("x!u@a1.example.org") == {"op"}
+    assert manager.get_user_permissions("admin!user@host") == {"botcontrol", "op"}
+    assert manager.get_user_groups("admin!user@host") == ["admins"]
+    assert manager.user_in_group("mod1!u@h", "Moderators")
+    assert not manager.user_in_group("mod1!u@h", "admins")
+
+
+def test_reload_clears_cache():
+    conn = MockConn(PERMISSIONS)
+    manager = PermissionManager(conn)
+    assert not manager.has_perm_mask("new!user@host", "op")
+    assert manager.stats()["cache_size"] == 1
+
+    manager.add_user_to_group("new!user@host", "moderators")
+    manager.reload()
+    assert manager.stats()["cache_size"] == 0
+    assert manager.has_perm_mask("new!user@host", "op")
+    assert manager.stats()["checks"] == 2
+    assert manager.stats()["allowed"] == 1
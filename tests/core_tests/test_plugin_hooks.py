@@ -10,10 +10,11 @@ from pathlib import Path
 
 from sqlalchemy import MetaData
 
-from cloudbot.event import Event, CommandEvent, RegexEvent, CapEvent, PostHookEvent, IrcOutEvent
-from cloudbot.hook import Action
-from cloudbot.plugin import Plugin, Hook
+from cloudbot.event import Event, BatchEvent, CommandEvent, RegexEvent, CapEvent, PostHookEvent, IrcOutEvent
+from cloudbot.hook import Action, Overflow
+from cloudbot.plugin import Plugin, Hook, HookResult
 from cloudbot.util import database
+from cloudbot.util.executors import DEFAULT_SIZES
 
 database.metadata = MetaData()
 Hook.original_init = Hook.__init__
@@ -86,6 +87,15 @@ HOOK_ATTR_TYPES = {
     'run_on_cmd': bool,
     'only_no_match': bool,
 
+    'inline': bool,
+
+    'executor': str,
+
+    'max_concurrency': (int, type(None)),
+    'max_queue': (int, type(None)),
+    'overflow': Overflow,
+    'batch': (int, type(None)),
+
     'interval': Number,
     'initial_interval': Number,
 }
@@ -107,6 +117,11 @@ def test_hook_kwargs(hook):
                 "Unexpected type '{}' for hook attribute '{}'".format(type(attr).__name__, name)
 
 
+def test_hook_executor(hook):
+    assert hook.executor in DEFAULT_SIZES, \
+        "Unknown executor '{}' for hook '{}'".format(hook.executor, hook.function_name)
+
+
 def test_hook_doc(hook):
     if hook.type == "command" and hook.doc:
         assert DOC_RE.match(hook.doc), \
@@ -117,7 +132,9 @@ def test_hook_args(hook):
     assert 'async' not in hook.required_args, "Use of deprecated function Event.async"
 
     bot = MockBot()
-    if hook.type in ("irc_raw", "perm_check", "periodic", "on_start", "on_stop", "event", "on_connect"):
+    if hook.batch:
+        event = BatchEvent(bot=bot, events=[])
+    elif hook.type in ("irc_raw", "perm_check", "periodic", "on_start", "on_stop", "event", "on_connect"):
         event = Event(bot=bot)
     elif hook.type == "command":
         event = CommandEvent(bot=bot, hook=hook, text="", triggered_command="")
@@ -125,6 +142,8 @@ def test_hook_args(hook):
         event = RegexEvent(bot=bot, hook=hook, match=None)
     elif hook.type.startswith("on_cap"):
         event = CapEvent(bot=bot, cap="")
+    elif hook.type == "post_hook" and hook.inline:
+        event = HookResult(bot=bot, conn=None, launched_hook=None, launched_event=None, result=None, error=None)
     elif hook.type == "post_hook":
         event = PostHookEvent(bot=bot)
     elif hook.type == "irc_out":
@@ -0,0 +1,51 @@
+from cloudbot.policy import SievePolicy
+
+
+class MockConn:
+    name = "testconn"
+
+    def __init__(self, config):
+        self.config = config
+
+
+def test_acls():
+    conn = MockConn({
+        "acls": {
+            "only_here": {"deny-except": ["#Allowed"]},
+            "not_here": {"allow-except": ["#denied"]},
+            "empty": {},
+        }
+    })
+    policy = SievePolicy(conn)
+    assert policy.is_allowed_in("only_here", "#allowed")
+    assert not policy.is_allowed_in("only_here", "#other")
+    assert not policy.is_allowed_in("not_here", "#DENIED")
+    assert policy.is_allowed_in("not_here", "#other")
+    assert policy.is_allowed_in("empty", "#other")
+    assert policy.is_allowed_in("unknown", "#other")
+
+
+def test_reload():
+    conn = MockConn({"disabled_commands": ["foo"]})
+    policy = SievePolicy(conn)
+    assert policy.disabled_commands == {"foo"}
+    assert policy.ratelimit.tokens == 17.5
+    assert policy.ratelimit.strict
+
+    conn.config["disabled_commands"] = ["bar"]
+    conn.config["ratelimit"] = {"tokens": 10, "strict": False}
+    assert policy.disabled_commands == {"foo"}
+
+    policy.reload()
+    assert policy.disabled_commands == {"bar"}
+    assert policy.ratelimit.tokens == 10
+    assert policy.ratelimit.restore_rate == 2.5
+    assert not policy.ratelimit.strict
+
+
+def test_limits():
+    conn = MockConn({"ratelimit": {"tokens": 10, "channel": {"tokens": 50}}})
+    policy = SievePolicy(conn)
+    assert [level for level, _ in policy.limits] == ["user", "channel"]
+    assert policy.limits[0][1] == (10, 2.5, 5)
+    assert policy.limits[1][1] == (50, 2.5, 5)
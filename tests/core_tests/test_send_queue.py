@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+from cloudbot.clients.irc import SendQueue
+
+
+class MockProtocol:
+    def __init__(self):
+        self.sent = []
+
+    @asyncio.coroutine
+    def send(self, line, log=True):
+        self.sent.append(line)
+        yield from asyncio.sleep(0)
+
+
+class MockConn:
+    name = "testconn"
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._protocol = MockProtocol()
+
+
+def make_queue(**config):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    conn = MockConn(loop)
+    return SendQueue(conn, config), conn
+
+
+def drain(queue):
+    loop = queue.conn.loop
+
+    @asyncio.coroutine
+    def wait():
+        # let the direct writes run, then wait for the queue task
+        yield from asyncio.sleep(0)
+        if queue._task is not None:
+            yield from queue._task
+
+        yield from asyncio.sleep(0)
+
+    loop.run_until_complete(wait())
+
+
+def close(queue):
+    queue.conn.loop.close()
+    asyncio.set_event_loop(None)
+
+
+def test_immediate_commands():
+    queue, conn = make_queue(burst=1, rate=100)
+    try:
+        queue.put("PRIVMSG #chan :a")
+        queue.put("PRIVMSG #chan :b")
+        assert queue.depth == 1
+
+        for line in ("PONG :server", "CAP END", "NICK bot"):
+            queue.put(line)
+
+        # immediate lines never go in the queue
+        assert queue.depth == 1
+        drain(queue)
+    finally:
+        close(queue)
+
+    assert conn._protocol.sent == ["PRIVMSG #chan :a", "PONG :server", "CAP END", "NICK bot", "PRIVMSG #chan :b"]
+
+
+def test_lane_order():
+    queue, conn = make_queue(burst=1, rate=100)
+    try:
+        queue.put("PRIVMSG #chan :a")
+        queue.put("PRIVMSG #chan :b")
+        queue.put("NOTICE nick :c")
+        queue.put("JOIN #other")
+        queue.put("MODE #chan +o nick")
+        drain(queue)
+    finally:
+        close(queue)
+
+    assert conn._protocol.sent == [
+        "PRIVMSG #chan :a", "JOIN #other", "MODE #chan +o nick", "PRIVMSG #chan :b", "NOTICE nick :c",
+    ]
+
+
+def test_pacing():
+    queue, conn = make_queue(burst=2, rate=50)
+    try:
+        start = time.time()
+        for i in range(6):
+            queue.put("PRIVMSG #chan :{}".format(i))
+
+        # the burst is sent straight away, the rest wait for tokens
+        assert queue.depth == 4
+        drain(queue)
+        elapsed = time.time() - start
+    finally:
+        close(queue)
+
+    assert conn._protocol.sent == ["PRIVMSG #chan :{}".format(i) for i in range(6)]
+    # 4 queued lines at 50 per second
+    assert elapsed >= 0.07
+    assert queue.stats()["sent"] == 6
+    assert queue.stats()["max_wait"] > 0
+
+
+def test_coalescing():
+    queue, conn = make_queue(burst=1, rate=100)
+    try:
+        queue.put("PRIVMSG #chan :a")
+        queue.put("WHO #chan")
+        queue.put("WHO #chan")
+        assert queue.depth == 1
+        assert queue.coalesced_count == 1
+
+        drain(queue)
+        # once sent, the line is no longer pending and can be queued again
+        assert not queue._pending
+        queue.put("WHO #chan")
+        drain(queue)
+    finally:
+        close(queue)
+
+    assert conn._protocol.sent == ["PRIVMSG #chan :a", "WHO #chan", "WHO #chan"]
+    assert queue.coalesced_count == 1
+
+
+def test_repeated_messages_not_coalesced():
+    queue, conn = make_queue(burst=1, rate=100)
+    try:
+        # the same answer to two different users is two lines
+        for _ in range(3):
+            queue.put("PRIVMSG #chan :same answer")
+
+        queue.put("JOIN #a")
+        queue.put("PART #a")
+        queue.put("JOIN #a")
+        assert queue.depth == 5
+        assert not queue._pending
+        drain(queue)
+    finally:
+        close(queue)
+
+    assert conn._protocol.sent == [
+        "PRIVMSG #chan :same answer", "JOIN #a", "PART #a", "JOIN #a", "PRIVMSG #chan :same answer",
+        "PRIVMSG #chan :same answer"
+    ]
+    assert queue.coalesced_count == 0
+
+
+def test_disabled():
+    queue, conn = make_queue(enabled=False, burst=1, rate=1)
+    try:
+        for i in range(3):
+            queue.put("PRIVMSG #chan :a")
+
+        assert queue.depth == 0
+        drain(queue)
+    finally:
+        close(queue)
+
+    assert conn._protocol.sent == ["PRIVMSG #chan :a"] * 3
@@ -0,0 +1,67 @@
+import asyncio
+from types import ModuleType
+
+from cloudbot import hook
+from cloudbot.event import Event, EventType
+from cloudbot.plugin import PluginManager, Plugin, DEFAULT_SINGLETHREAD_QUEUE
+
+
+class MockBot:
+    def __init__(self, loop):
+        self.loop = loop
+        self.config = {}
+
+
+def make_hook(**kwargs):
+    @hook.event(EventType.message, singlethread=True, **kwargs)
+    def handler(event):
+        pass
+
+    module = ModuleType("plugins.test_worker")
+    module.handler = handler
+    plugin = Plugin("/plugins/test_worker.py", "test_worker.py", "test_worker", module)
+    return plugin.hooks["event"][0]
+
+
+def fill_worker(_hook, count):
+    loop = asyncio.new_event_loop()
+    manager = PluginManager(MockBot(loop))
+    handled = []
+
+    @asyncio.coroutine
+    def run_queued(_hook, event):
+        handled.append(event)
+
+    manager._run_queued = run_queued
+
+    @asyncio.coroutine
+    def fill():
+        worker = manager._get_hook_worker(_hook)
+        # nothing is handled until the worker gets to run
+        accepted = sum(worker.submit(Event(hook=_hook, event_type=EventType.message)) for _ in range(count))
+        yield from worker.stop()
+        return worker, accepted
+
+    try:
+        worker, accepted = loop.run_until_complete(fill())
+    finally:
+        loop.close()
+
+    return worker, accepted, handled
+
+
+def test_default_bound():
+    _hook = make_hook()
+    assert _hook.max_queue is None
+
+    worker, accepted, handled = fill_worker(_hook, DEFAULT_SINGLETHREAD_QUEUE + 10)
+    assert worker.max_queue == DEFAULT_SINGLETHREAD_QUEUE
+    assert accepted == len(handled) == DEFAULT_SINGLETHREAD_QUEUE
+    assert worker.shed_newest == 10
+
+
+def test_hook_bound():
+    worker, accepted, handled = fill_worker(make_hook(max_queue=5), 8)
+    assert worker.max_queue == 5
+    assert accepted == len(handled) == 5
+    assert worker.shed_newest == 3
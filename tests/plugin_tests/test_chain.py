@@ -0,0 +1,31 @@
+from sqlalchemy import MetaData
+
+from cloudbot.event import CommandEvent, EventType
+from cloudbot.util import database
+
+if database.metadata is None:
+    database.metadata = MetaData()
+
+from plugins.chain import wrap_event
+
+
+class MockHook:
+    doc = None
+
+
+def test_wrap_event_output():
+    event = CommandEvent(
+        hook=MockHook(), text="foo | bar", triggered_command="chain", cmd_prefix="!", event_type=EventType.message,
+        channel="#chan", nick="nick"
+    )
+    cmd_event = wrap_event(MockHook(), event, "foo", "args ")
+    output = []
+    cmd_event.message = output.append
+    cmd_event.reply = output.append
+    cmd_event.action = output.append
+
+    cmd_event.reply("hi")
+    assert output == ["hi"]
+    assert cmd_event.text == "args"
+    assert cmd_event.triggered_prefix == "!"
+    assert cmd_event.chan == "#chan"
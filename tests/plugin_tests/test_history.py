@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from cloudbot.event import Event, EventType
+from cloudbot.util import database
+
+if database.metadata is None:
+    database.metadata = MetaData()
+
+from plugins import history
+
+
+@pytest.fixture
+def db():
+    history.seen_buffer.clear()
+    history.seen_flushing.clear()
+    engine = create_engine("sqlite://")
+    history.table.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    history.seen_buffer.clear()
+
+
+def make_event(nick, chan, content):
+    return Event(
+        event_type=EventType.message, content=content, channel=chan, nick=nick, user="user", host="host",
+        mask=nick + "!user@host"
+    )
+
+
+def get_rows(db):
+    return sorted(
+        (row["name"], row["chan"], row["quote"]) for row in db.execute(history.table.select()).fetchall()
+    )
+
+
+def test_track_seen_buffers(db):
+    history.track_seen(make_event("Nick", "#chan", "hello"), db)
+    history.track_seen(make_event("nick", "#chan", "again"), db)
+    history.track_seen(make_event("other", "#chan", "hi"), db)
+
+    # nothing is written until a flush
+    assert get_rows(db) == []
+    assert history.get_buffered_seen("nick", "#chan")[1:] == ("again", "nick!user@host")
+    assert history.get_buffered_seen("nick", "#other") is None
+    assert len(history.seen_buffer) == 2
+
+
+def test_private_messages_not_tracked(db):
+    history.track_seen(make_event("nick", "nick", "secret"), db)
+    history.track_seen(make_event("nick", "#chan", "s/a/b/"), db)
+    assert not history.seen_buffer
+
+
+def test_flush(db):
+    history.track_seen(make_event("nick", "#chan", "hello"), db)
+    history.track_seen(make_event("other", "#chan", "hi"), db)
+    history.flush_seen(db)
+
+    assert get_rows(db) == [("nick", "#chan", "hello"), ("other", "#chan", "hi")]
+    assert not history.seen_buffer
+    assert history.get_buffered_seen("nick", "#chan") is None
+
+    # later updates replace the stored rows
+    history.track_seen(make_event("nick", "#chan", "bye"), db)
+    history.flush_seen(db)
+    assert get_rows(db) == [("nick", "#chan", "bye"), ("other", "#chan", "hi")]
+
+    # flushing an empty buffer does nothing
+    history.flush_seen(db)
+    assert get_rows(db) == [("nick", "#chan", "bye"), ("other", "#chan", "hi")]
+
+
+def test_flush_when_full(db, monkeypatch):
+    monkeypatch.setattr(history, "FLUSH_SIZE", 3)
+    for nick in ("a", "b"):
+        history.track_seen(make_event(nick, "#chan", "hi"), db)
+
+    assert get_rows(db) == []
+
+    history.track_seen(make_event("c", "#chan", "hi"), db)
+    assert [row[0] for row in get_rows(db)] == ["a", "b", "c"]
+    assert not history.seen_buffer
+
+
+class FailingDB:
+    def __init__(self):
+        self.rolled_back = False
+
+    def execute(self, query):
+        # a newer message arrives while the flush is running
+        history.track_seen(make_event("nick", "#chan", "newer"), None)
+        raise ValueError()
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_failed_flush_keeps_updates(db):
+    history.track_seen(make_event("nick", "#chan", "older"), db)
+    history.track_seen(make_event("other", "#chan", "hi"), db)
+
+    failing = FailingDB()
+    with pytest.raises(ValueError):
+        history.flush_seen(failing)
+
+    assert failing.rolled_back
+    assert not history.seen_flushing
+    # the failed updates are kept, without replacing newer ones
+    assert history.get_buffered_seen("nick", "#chan")[1] == "newer"
+    assert history.get_buffered_seen("other", "#chan")[1] == "hi"
+
+    history.flush_seen(db)
+    assert get_rows(db) == [("nick", "#chan", "newer"), ("other", "#chan", "hi")]
@@ -0,0 +1,73 @@
+from fnmatch import fnmatch
+
+from sqlalchemy import MetaData
+
+from cloudbot.util import database
+
+if database.metadata is None:
+    database.metadata = MetaData()
+
+from plugins.ignore import IgnoreIndex
+
+IGNORES = (
+    ("net", "#chan", "Nick!*@*"),
+    ("net", "#chan", "*!*@Host.example.com"),
+    ("net", "#chan", "exact!user@host"),
+    ("net", "#chan", "*!bad?user@*"),
+    ("net", "*", "global!*@*"),
+    ("net", "*", "*!*@[ab]*.example.org"),
+    ("other", "#chan", "other!*@*"),
+)
+
+MASKS = (
+    "nick!user@host",
+    "NICK!x@y",
+    "nickname!user@host",
+    "someone!user@host.example.com",
+    "someone!user@sub.host.example.com",
+    "exact!user@host",
+    "exact!user@host2",
+    "x!baduuser@host",
+    "x!bad_user@host",
+    "global!u@h",
+    "x!u@a.example.org",
+    "x!u@c.example.org",
+    "other!u@h",
+    "nick",
+    "nick!user",
+)
+
+
+def fnmatch_ignored(conn, chan, mask):
+    mask_cf = mask.casefold()
+    for _conn, _chan, _mask in IGNORES:
+        if (_chan == "*" or (conn, chan) == (_conn, _chan)) and fnmatch(mask_cf, _mask.casefold()):
+            return True
+
+    return False
+
+
+def test_matches_fnmatch():
+    index = IgnoreIndex()
+    for conn, chan, mask in IGNORES:
+        index.add(conn, chan, mask)
+
+    for conn, chan in (("net", "#chan"), ("net", "#other"), ("other", "#chan")):
+        for mask in MASKS:
+            assert index.matches(conn, chan, mask) == fnmatch_ignored(conn, chan, mask), (conn, chan, mask)
+
+
+def test_remove():
+    index = IgnoreIndex()
+    index.add("net", "#chan", "nick!*@*")
+    index.add("net", "#chan", "*!*@*.example.com")
+    assert index.matches("net", "#chan", "nick!u@h")
+    assert index.matches("net", "#chan", "x!u@host.example.com")
+
+    index.remove("net", "#chan", "nick!*@*")
+    assert not index.matches("net", "#chan", "nick!u@h")
+    assert index.matches("net", "#chan", "x!u@host.example.com")
+
+    index.remove("net", "#chan", "*!*@*.example.com")
+    assert not index.matches("net", "#chan", "x!u@host.example.com")
+    assert not index.buckets
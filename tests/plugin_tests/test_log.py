@@ -0,0 +1,90 @@
+import os
+import time
+
+import pytest
+
+import cloudbot
+from plugins import log
+
+# 2017-03-04 00:00:00 UTC
+MIDNIGHT = 1488585600
+
+
+@pytest.fixture
+def logs(tmpdir, monkeypatch):
+    monkeypatch.setattr(cloudbot, "logging_dir", str(tmpdir), raising=False)
+    clock = [MIDNIGHT - 1]
+    gmtime = time.gmtime
+    monkeypatch.setattr(time, "gmtime", lambda secs=None: gmtime(clock[0] if secs is None else secs))
+    log.buffers.clear()
+    log.filename_cache.clear()
+    log.buffered_lines = 0
+    log.rotate_at = 0
+    yield clock
+    log.close_logs()
+    log.buffers.clear()
+    log.filename_cache.clear()
+    log.buffered_lines = 0
+    log.rotate_at = 0
+
+
+def read(file_name):
+    with open(file_name, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_rotation_at_midnight(logs):
+    log.check_rotation(logs[0])
+    assert log.rotate_at == MIDNIGHT
+
+    before = log.get_cached_filename("net", "#chan")
+    assert before.endswith("net_#chan_20170303.log")
+    log.buffer_line(before, "before")
+    log.flush_buffers()
+    log.buffer_line(before, "still before")
+    assert before in log.stream_cache
+
+    # nothing changes until midnight
+    log.check_rotation(MIDNIGHT - 0.5)
+    assert log.get_cached_filename("net", "#chan") == before
+    assert log.buffers[before] == ["still before"]
+
+    logs[0] = MIDNIGHT
+    log.check_rotation(logs[0])
+    assert log.rotate_at == MIDNIGHT + 86400
+    # the old day's lines are written, and its file closed, before the names change
+    assert not log.buffers
+    assert not log.stream_cache
+    assert read(before) == ["before", "still before"]
+
+    after = log.get_cached_filename("net", "#chan")
+    assert after.endswith("net_#chan_20170304.log")
+    assert log.get_cached_filename("net", None).endswith(os.path.join("raw", "2017", "net_20170304.log"))
+
+
+def test_failed_flush_keeps_lines(logs, tmpdir, monkeypatch):
+    monkeypatch.setattr(log, "MAX_RETAINED_LINES", 3)
+    # a directory can't be opened as a log file
+    bad = str(tmpdir.mkdir("bad.log"))
+    good = str(tmpdir.join("good.log"))
+
+    for i in range(5):
+        log.buffer_line(bad, "bad {}".format(i))
+
+    log.buffer_line(good, "good")
+    log.flush_buffers()
+
+    # the other file is still written, and only the newest lines are kept for the failing one
+    assert read(good) == ["good"]
+    assert log.buffers == {bad: ["bad 2", "bad 3", "bad 4"]}
+    assert bad not in log.stream_cache
+    assert log.buffered_lines == 0
+
+    # kept lines are retried once the interval has passed
+    os.rmdir(bad)
+    log.maybe_flush({}, log.last_flush + 1)
+    assert log.buffers == {bad: ["bad 2", "bad 3", "bad 4"]}
+
+    log.maybe_flush({"flush_interval": 1}, log.last_flush + 1)
+    assert not log.buffers
+    assert read(bad) == ["bad 2", "bad 3", "bad 4"]
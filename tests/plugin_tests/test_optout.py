@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from cloudbot.util import database
+
+if database.metadata is None:
+    database.metadata = MetaData()
+
+from plugins.core import optout
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    optout.optout_table.create(engine)
+    session = sessionmaker(bind=engine)()
+    optout.cache.load(session)
+    yield session
+    session.close()
+    optout.optout_cache.clear()
+    optout._rules_changed()
+
+
+def test_set_invalidates(db):
+    assert optout.get_decision("net", "#chan", "plugin.hook") is None
+
+    optout.set_optout(db, "net", "#chan", "plugin.*", False)
+    assert optout.get_decision("net", "#Chan", "plugin.hook") is False
+    assert optout.get_decision("net", "#other", "plugin.hook") is None
+    assert optout.get_decision("other", "#chan", "plugin.hook") is None
+
+    # changing an existing rule replaces the cached decision
+    optout.set_optout(db, "net", "#chan", "plugin.*", True)
+    assert optout.get_decision("net", "#chan", "plugin.hook") is True
+
+    # a more specific rule wins
+    optout.set_optout(db, "net", "#chan", "plugin.hook", False)
+    assert optout.get_decision("net", "#chan", "plugin.hook") is False
+    assert optout.get_decision("net", "#chan", "plugin.other") is True
+
+
+def test_del_invalidates(db):
+    optout.set_optout(db, "net", "#chan", "plugin.*", False)
+    assert optout.get_decision("net", "#chan", "plugin.hook") is False
+
+    assert optout.del_optout(db, "net", "#chan", "plugin.*")
+    assert optout.get_decision("net", "#chan", "plugin.hook") is None
+    assert not optout.del_optout(db, "net", "#chan", "plugin.*")
+
+
+def test_clear_invalidates(db):
+    optout.set_optout(db, "net", "#chan", "plugin.*", False)
+    optout.set_optout(db, "net", "#other", "plugin.*", False)
+    assert optout.get_decision("net", "#chan", "plugin.hook") is False
+    assert optout.get_decision("net", "#other", "plugin.hook") is False
+
+    assert optout.clear_optout(db, "net", "#chan") == 1
+    assert optout.get_decision("net", "#chan", "plugin.hook") is None
+    assert optout.get_decision("net", "#other", "plugin.hook") is False
+
+    assert optout.clear_optout(db, "net") == 1
+    assert optout.get_decision("net", "#other", "plugin.hook") is None
+
+
+def test_reload_invalidates(db):
+    assert optout.get_decision("net", "#chan", "plugin.hook") is None
+
+    # a change made directly in the database is picked up by the next check
+    db.execute(optout.optout_table.insert().values(network="net", chan="#chan", hook="plugin.*", allow=False))
+    db.commit()
+    assert not optout.cache.check(db)
+    assert optout.get_decision("net", "#chan", "plugin.hook") is False
+
+
+class MockPlugin:
+    title = "plugin"
+
+
+class MockHook:
+    plugin = MockPlugin()
+    function_name = "hook"
+    type = "command"
+
+
+class MockConn:
+    name = "net"
+
+
+class MockEvent:
+    chan = "#chan"
+    conn = MockConn()
+
+    def __init__(self):
+        self.notices = []
+
+    def notice(self, message):
+        self.notices.append(message)
+
+
+@pytest.mark.parametrize("allow", [0, False])
+def test_sieve_blocks(db, allow):
+    event = MockEvent()
+    assert optout.optout_sieve(None, event, MockHook()) is event
+
+    optout.set_optout(db, "net", "#chan", "plugin.hook", False)
+    # the stored value may come back as any falsy value
+    optout.optout_cache["net"][0].allow = allow
+    optout._rules_changed()
+
+    assert optout.optout_sieve(None, event, MockHook()) is None
+    assert event.notices == ["Sorry, that command is disabled in this channel."]
+
+    optout.set_optout(db, "net", "#chan", "plugin.hook", True)
+    assert optout.optout_sieve(None, event, MockHook()) is event
@@ -0,0 +1,18 @@
+from plugins import profiling
+
+
+def test_format_executor_stats():
+    stats = {
+        "web": {
+            'size': 8, 'queue_length': 3, 'running': 8, 'completed': 10, 'avg_wait': 1.5, 'max_wait': 4.25,
+            'avg_run': 2.0,
+        },
+        "io": {
+            'size': 16, 'queue_length': 0, 'running': 1, 'completed': 2, 'avg_wait': 0.0, 'max_wait': 0.0,
+            'avg_run': 0.125,
+        },
+    }
+    assert profiling.format_executor_stats(stats) == (
+        "io: 1/16 running, 0 queued, 2 done, wait 0.00s avg 0.00s max, run 0.12s avg; "
+        "web: 8/8 running, 3 queued, 10 done, wait 1.50s avg 4.25s max, run 2.00s avg"
+    )
@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from cloudbot.util import database
+
+if database.metadata is None:
+    database.metadata = MetaData()
+
+from plugins import tell
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tell.table.create(engine)
+    session = sessionmaker(bind=engine)()
+    tell.cache.load(session)
+    yield session
+    session.close()
+    tell.pending_tells.clear()
+
+
+class MockConn:
+    name = "Net"
+    config = {"command_prefix": "."}
+
+
+def test_add_tell(db):
+    assert not tell.tell_check("net", "target")
+
+    tell.add_tell(db, "Net", "sender", "Target", "one")
+    tell.add_tell(db, "Net", "other", "target", "two")
+
+    assert tell.tell_check("net", "TARGET")
+    assert not tell.tell_check("other", "target")
+    assert tell.pending_tells[("net", "target")] == 2
+    assert tell.cache.check(db)
+
+
+def test_read_tell(db):
+    tell.add_tell(db, "net", "sender", "target", "one")
+    tell.add_tell(db, "net", "sender", "target", "two")
+
+    tell.read_tell(db, "net", "target", "one")
+    assert tell.pending_tells[("net", "target")] == 1
+
+    tell.read_tell(db, "net", "target", "two")
+    assert not tell.tell_check("net", "target")
+    assert ("net", "target") not in tell.pending_tells
+    assert tell.cache.check(db)
+
+
+def test_read_all_tells(db):
+    for message in ("one", "two", "three"):
+        tell.add_tell(db, "net", "sender", "target", message)
+
+    tell.add_tell(db, "net", "sender", "other", "four")
+    tell.read_all_tells(db, "net", "Target")
+
+    assert not tell.tell_check("net", "target")
+    assert tell.tell_check("net", "other")
+    assert tell.cache.check(db)
+
+
+def test_deliver_tells(db):
+    tell.add_tell(db, "net", "sender", "target", "one")
+    tell.add_tell(db, "net", "sender", "target", "two")
+    notices = []
+
+    tell.deliver_tells(db, MockConn(), "Target", notices.append)
+    assert len(notices) == 1
+    assert "sender sent you a message" in notices[0]
+    assert notices[0].endswith(": one (+1 more, .showtells to view)")
+    assert tell.pending_tells[("net", "target")] == 1
+
+    tell.deliver_tells(db, MockConn(), "target", notices.append)
+    assert notices[1].endswith(": two")
+    assert not tell.tell_check("net", "target")
+
+
+def test_stale_index(db):
+    tell.pending_tells[("net", "target")] = 1
+    notices = []
+
+    tell.deliver_tells(db, MockConn(), "target", notices.append)
+
+    # nothing to deliver, the stale entry is dropped so no more sessions are opened for it
+    assert notices == []
+    assert not tell.tell_check("net", "target")
+
+
+def test_load(db):
+    tell.add_tell(db, "net", "sender", "target", "one")
+    tell.add_tell(db, "net", "sender", "other", "two")
+    tell.read_tell(db, "net", "other", "two")
+    tell.pending_tells.clear()
+
+    tell.cache.load(db)
+    assert dict(tell.pending_tells) == {("net", "target"): 1}